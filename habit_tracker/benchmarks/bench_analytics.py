@@ -0,0 +1,81 @@
+"""
+habits.analytics against a pure-Python baseline computing the same metrics,
+on synthetic data: 500 habits x 5 years of days, no database involved.
+"""
+import datetime
+import math
+
+import numpy as np
+import pytest
+
+from habits.analytics import CONSISTENCY_HALF_LIFE, RATE_WINDOWS, TREND_WEEKS, UserArrays, habit_metrics
+
+HABITS = 500
+DAYS = 5 * 365
+END = datetime.date(2025, 12, 31)
+
+
+@pytest.fixture(scope="module")
+def arrays():
+    rng = np.random.default_rng(0)
+    start = END - datetime.timedelta(days=DAYS - 1)
+    created = datetime.datetime.combine(start, datetime.time(12), tzinfo=datetime.timezone.utc)
+    arrays = UserArrays([(i + 1, f"Habit {i}", created) for i in range(HABITS)], start, END)
+    arrays.active_from = rng.integers(0, DAYS // 2, HABITS)
+    rates = rng.uniform(0.1, 0.9, (HABITS, 1))
+    arrays.completed = (rng.random((HABITS, DAYS)) < rates) & (np.arange(DAYS) >= arrays.active_from[:, None])
+    arrays.minutes = np.where(arrays.completed, rng.integers(5, 90, (HABITS, DAYS)), 0)
+    return arrays
+
+
+def python_metrics(habits, days):
+    """ The baseline: per-habit loops over dates, as the views do today. """
+    results = []
+    weights = [0.5 ** ((days - 1 - day) / CONSISTENCY_HALF_LIFE) for day in range(days)]
+    for active_from, done_days, minutes in habits:
+        rates = {}
+        for window in RATE_WINDOWS:
+            first = max(days - window, active_from)
+            rates[window] = sum(1 for day in done_days if day >= first) / (days - first) if days > first else 0.0
+
+        longest = current = run = 0
+        previous = None
+        for day in sorted(done_days):
+            run = run + 1 if previous == day - 1 else 1
+            longest = max(longest, run)
+            previous = day
+        if previous is not None and previous >= days - 2:
+            current = run
+
+        weighted_days = sum(weights[active_from:])
+        consistency = sum(weights[day] for day in done_days) / weighted_days if weighted_days else 0.0
+
+        weeks = min(TREND_WEEKS, days // 7)
+        weekly = [sum(minutes.get(day, 0) for day in range(days - (weeks - w) * 7, days - (weeks - w - 1) * 7)) for w in range(weeks)]
+        mean = sum(weekly) / weeks
+        xs = [w - (weeks - 1) / 2 for w in range(weeks)]
+        slope = sum(x * (y - mean) for x, y in zip(xs, weekly)) / sum(x * x for x in xs)
+        results.append((rates, current, longest, consistency, sum(minutes.values()), mean, slope))
+    return results
+
+
+@pytest.fixture(scope="module")
+def python_input(arrays):
+    return [
+        (int(active_from), set(np.flatnonzero(done).tolist()), {int(day): int(row[day]) for day in np.flatnonzero(row)})
+        for active_from, done, row in zip(arrays.active_from, arrays.completed, arrays.minutes)
+    ]
+
+
+def bench_habit_metrics_numpy(benchmark, arrays, python_input):
+    metrics = benchmark(habit_metrics, arrays)
+    # Spot-check agreement with the baseline
+    for i, (rates, current, longest, consistency, total, mean, slope) in enumerate(python_metrics(python_input[:20], DAYS)):
+        assert all(math.isclose(metrics["rates"][w][i], rates[w]) for w in RATE_WINDOWS)
+        assert (metrics["current_streak"][i], metrics["longest_streak"][i], metrics["total_minutes"][i]) == (current, longest, total)
+        assert math.isclose(metrics["consistency"][i], consistency)
+        assert math.isclose(metrics["weekly_minutes"][i], mean) and math.isclose(metrics["weekly_minutes_trend"][i], slope, abs_tol=1e-9)
+
+
+def bench_habit_metrics_python(benchmark, python_input):
+    benchmark.pedantic(python_metrics, args=(python_input, DAYS), rounds=3)
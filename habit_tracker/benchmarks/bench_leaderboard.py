@@ -0,0 +1,77 @@
+"""
+Leaderboard rank queries on 1M synthetic users, no database involved: the
+ScoreIndex (Fenwick tree over streak values) against sorting every user's
+streak per request, and against a sorted list kept up to date with insort.
+"""
+import bisect
+import random
+from collections import Counter
+
+import pytest
+
+from habits.leaderboard import ScoreIndex
+
+USERS = 1_000_000
+OPERATIONS = 1_000
+
+
+@pytest.fixture(scope="module")
+def streaks():
+    rng = random.Random(0)
+    # Mostly short streaks with a long tail, like real ones
+    return [min(int(rng.expovariate(1 / 12)), 2000) for _ in range(USERS)]
+
+
+@pytest.fixture(scope="module")
+def operations(streaks):
+    """ (user, new streak) updates, each followed by a rank query in the benchmarks (setup is not timed). """
+    rng = random.Random(1)
+    return [(rng.randrange(USERS), rng.randrange(120)) for _ in range(OPERATIONS)]
+
+
+def bench_score_index_build(benchmark, streaks):
+    counts = Counter(streaks)
+    index = benchmark(ScoreIndex, counts)
+    assert index.total == USERS
+
+
+def bench_score_index_update_and_rank(benchmark, streaks, operations):
+    def setup():
+        return (ScoreIndex(Counter(streaks)), list(streaks)), {}
+
+    def run(index, current):
+        for user, streak in operations:
+            index.add(current[user], -1)
+            index.add(streak)
+            current[user] = streak
+            index.rank(streak)
+            index.percentile(streak)
+        return index
+
+    index = benchmark.pedantic(run, setup=setup, rounds=10)
+    assert index.total == USERS
+
+
+def bench_sort_per_request_baseline(benchmark, streaks):
+    """ What serving one rank without a precomputed ranking costs: sort everyone, then bisect. """
+    def rank(streak):
+        ordered = sorted(streaks)
+        return 1 + len(ordered) - bisect.bisect_right(ordered, streak)
+
+    benchmark.pedantic(rank, args=(30,), rounds=3)
+
+
+def bench_sorted_list_update_and_rank_baseline(benchmark, streaks, operations):
+    """ A plain sorted list: O(log n) ranks, but O(n) inserts and removals. """
+    def setup():
+        return (sorted(streaks), list(streaks)), {}
+
+    def run(ordered, current):
+        for user, streak in operations:
+            del ordered[bisect.bisect_left(ordered, current[user])]
+            bisect.insort(ordered, streak)
+            current[user] = streak
+            1 + len(ordered) - bisect.bisect_right(ordered, streak)
+        return ordered
+
+    benchmark.pedantic(run, setup=setup, rounds=3)
@@ -0,0 +1,39 @@
+import datetime
+
+import pytest
+
+from habits.models import Habit
+
+pytestmark = pytest.mark.django_db
+
+
+@pytest.fixture
+def habit():
+    # The habit with the longest seeded completion history
+    return Habit.objects.exclude(last_completed=None).order_by("-progress", "id").first()
+
+
+def bench_habit_save_completion(measure, habit):
+    """ Completing a habit on the next day: the streak update plus the history row. """
+    def complete_next_day():
+        habit.completed = True
+        habit.completed_at = habit.last_completed + datetime.timedelta(days=1)
+        habit.save()
+
+    measure(complete_next_day)
+
+
+def bench_habit_save_unchanged(measure, habit):
+    """ Saving an already-counted completion (e.g. a goal edit). """
+    habit.goal = "30 min"
+    measure(habit.save)
+
+
+def bench_calculate_streak(measure, habit):
+    measure(habit.calculate_streak)
+
+
+def bench_with_streaks(measure, habit):
+    """ Streaks for every completed habit of one user in a single query. """
+    queryset = Habit.objects.filter(user=habit.user, completed=True)
+    measure(lambda: queryset.all().with_streaks())
@@ -0,0 +1,58 @@
+import pytest
+from django.contrib.auth.models import User
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from habits.management.commands import seed_benchmark_data
+
+pytestmark = pytest.mark.django_db
+
+# (url name, takes the habit pk, query string); GET endpoints only
+VIEWS = [
+    ("habit-list", False, ""),
+    ("habit-list", False, "?fields=id,name,completed"),
+    ("habit-detail", True, ""),
+    ("check-habit-completion", True, ""),
+    ("habit-streaks", False, ""),
+    ("habit-time-spent", True, ""),
+    ("habit-time-spent", True, "?granularity=week"),
+    ("habit-frequency-over-time", True, "?days=365&granularity=week"),
+    ("weekly-summary", False, ""),
+    ("weekly-summary", False, "?days=90"),
+    ("completion-report", False, ""),
+    ("habit-analytics", False, ""),
+    ("habit-analytics", False, "?days=1825"),
+    ("habit-progress-calendar", False, ""),
+    ("habit-milestone-rewards", False, ""),
+    ("leaderboard", False, ""),
+    ("habit-reinforce", True, ""),
+    ("habit-reminders", False, ""),
+    ("scale-habit-difficulty", False, ""),
+    ("suggest-personalized-habit", False, ""),
+    ("suggest-tracking-methods", False, "?preference=digital"),
+    ("export-habits", False, "?format=csv"),
+    ("export-time-logs", False, "?format=ndjson"),
+    ("profile-view", False, ""),
+]
+
+
+@pytest.fixture
+def client():
+    user = User.objects.get(username=seed_benchmark_data.bench_username(0))
+    client = APIClient()
+    client.force_authenticate(user)
+    client.habit = user.habit_set.order_by("id").first()
+    return client
+
+
+def get(client, url):
+    response = client.get(url)
+    body = b"".join(response.streaming_content) if response.streaming else response.content
+    assert response.status_code == 200, (url, response.status_code, body[:200])
+    return body
+
+
+@pytest.mark.parametrize("name, takes_pk, query", VIEWS, ids=[name + query for name, _, query in VIEWS])
+def bench_view(measure, client, name, takes_pk, query):
+    url = reverse(name, kwargs={"pk": client.habit.pk} if takes_pk else None) + query
+    measure(lambda: get(client, url))
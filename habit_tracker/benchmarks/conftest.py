@@ -0,0 +1,77 @@
+"""
+Performance suite; separate from `manage.py test`. Run from habit_tracker/:
+
+    pip install pytest-django pytest-benchmark locust
+    pytest -c benchmarks/pytest.ini                          # run and save a baseline in .benchmarks/
+    pytest -c benchmarks/pytest.ini --benchmark-compare      # compare with the last saved run
+    pytest -c benchmarks/pytest.ini --benchmark-compare=0003 --benchmark-compare-fail=median:10%
+
+The test database is seeded once per session with seed_benchmark_data; size
+it with BENCH_USERS, BENCH_HABITS and BENCH_DAYS. Each benchmark stores its
+queries per call and p50/p95/p99 latency in extra_info (saved with the run)
+and prints them in the terminal summary. See locustfile.py for the HTTP load
+scenario.
+"""
+import io
+import os
+import statistics
+
+import pytest
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+DATASET = {
+    "users": int(os.environ.get("BENCH_USERS", 5)),
+    "habits": int(os.environ.get("BENCH_HABITS", 20)),
+    "days": int(os.environ.get("BENCH_DAYS", 180)),
+}
+
+results = []
+
+
+@pytest.fixture(scope="session")
+def django_db_setup(django_db_setup, django_db_blocker):
+    with django_db_blocker.unblock():
+        call_command("seed_benchmark_data", seed=0, stdout=io.StringIO(), **DATASET)
+
+
+@pytest.fixture
+def measure(benchmark, request):
+    """
+    Benchmark `fn()` after recording how many queries one call issues. The
+    per-user response cache is cleared before every call so views always take
+    their query path.
+    """
+    def run(fn):
+        def call():
+            cache.clear()
+            return fn()
+
+        with CaptureQueriesContext(connection) as queries:
+            call()
+        query_count = len(queries)  # Read now; later requests reset the log it slices
+        result = benchmark(call)
+
+        info = {"queries": query_count}
+        if benchmark.stats is not None:  # None under --benchmark-disable
+            timings = benchmark.stats.stats.data
+            cuts = statistics.quantiles(timings, n=100) if len(timings) > 1 else timings * 99
+            info.update(p50_ms=round(cuts[49] * 1000, 3), p95_ms=round(cuts[94] * 1000, 3), p99_ms=round(cuts[98] * 1000, 3))
+        benchmark.extra_info.update(info)
+        results.append((request.node.name, info))
+        return result
+    return run
+
+
+def pytest_terminal_summary(terminalreporter):
+    if not results:
+        return
+    write = terminalreporter.write_line
+    terminalreporter.section("latency percentiles and queries per call")
+    width = max(len(name) for name, _ in results) + 2
+    write(f"{'benchmark':<{width}}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'queries':>9}")
+    for name, info in sorted(results):
+        latency = "".join(f"{info[key]:>10.3f}" if key in info else f"{'-':>10}" for key in ("p50_ms", "p95_ms", "p99_ms"))
+        write(f"{name:<{width}}{latency}{info['queries']:>9}")
@@ -0,0 +1,84 @@
+"""
+HTTP load scenario replaying a typical client's endpoint mix. Seed the target
+database first, then point Locust at runserver or gunicorn:
+
+    python manage.py seed_benchmark_data --users 100 --habits 20 --days 180 --clear
+    gunicorn habit_tracker.wsgi -w 4 -b :8000
+    mkdir -p .benchmarks
+    locust -f benchmarks/locustfile.py --host http://127.0.0.1:8000 --headless \
+        -u 200 -r 20 -t 2m --csv .benchmarks/locust-$(git rev-parse --short HEAD)
+
+Locust's *_stats.csv holds p50/p95/p99 per endpoint; keep one per commit and
+diff them to compare. BENCH_USERS must not exceed the seeded --users.
+"""
+import os
+import random
+
+from locust import HttpUser, between, task
+
+BENCH_USERS = int(os.environ.get("BENCH_USERS", 100))
+USERNAME_PREFIX = "bench_user_"  # As in seed_benchmark_data
+PASSWORD = "bench-password"
+
+
+class HabitTrackerUser(HttpUser):
+    wait_time = between(0.5, 2)
+
+    def on_start(self):
+        username = f"{USERNAME_PREFIX}{random.randrange(BENCH_USERS):05d}"
+        response = self.client.post("/login/", json={"username": username, "password": PASSWORD})
+        response.raise_for_status()
+        self.client.headers["Authorization"] = f"Token {response.json()['token']}"
+        habits = self.client.get("/habits/?fields=id&page_size=500", name="/habits/?fields").json()["results"]
+        self.habit_ids = [habit["id"] for habit in habits]
+
+    def habit_id(self):
+        return random.choice(self.habit_ids)
+
+    # Dashboard reads dominate; writes are the occasional check-in
+    @task(10)
+    def list_habits(self):
+        self.client.get("/habits/")
+
+    @task(5)
+    def streaks(self):
+        self.client.get("/habits/streaks/")
+
+    @task(5)
+    def weekly_summary(self):
+        self.client.get("/progress/weekly-summary/")
+
+    @task(4)
+    def daily_reminders(self):
+        self.client.get("/habits/daily-reminders/")
+
+    @task(3)
+    def progress_calendar(self):
+        self.client.get("/habits/progress-calendar/")
+
+    @task(3)
+    def habit_detail(self):
+        self.client.get(f"/habits/{self.habit_id()}/", name="/habits/[id]/")
+
+    @task(2)
+    def completion_report(self):
+        self.client.get("/progress/completion-report/")
+
+    @task(2)
+    def time_spent(self):
+        self.client.get(f"/habits/time-spent/{self.habit_id()}/?granularity=week", name="/habits/time-spent/[id]/")
+
+    @task(2)
+    def log_time(self):
+        self.client.post(
+            f"/habits/time-spent-log/{self.habit_id()}/", json={"time_spent": random.randint(5, 60)},
+            name="/habits/time-spent-log/[id]/",
+        )
+
+    @task(1)
+    def complete_habit(self):
+        self.client.patch(f"/habits/{self.habit_id()}/", json={"completed": True}, name="/habits/[id]/ (complete)")
+
+    @task(1)
+    def quote(self):
+        self.client.get("/motivation/quotes/")
@@ -10,8 +10,11 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.1/ref/settings/
 """
 
+import os
 from pathlib import Path
 
+from .database import database_from_url, env_flag, sqlite_database
+
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
@@ -45,8 +48,8 @@ INSTALLED_APPS = [
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
         'rest_framework.authentication.SessionAuthentication',
-        'rest_framework.authentication.TokenAuthentication',
-        'rest_framework.authentication.BasicAuthentication',
+        'habits.authentication.CachedTokenAuthentication',
+        'habits.authentication.CachedBasicAuthentication',
     ],
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.AllowAny',  # This is the default, override per view
@@ -54,7 +57,22 @@ REST_FRAMEWORK = {
     'EXCEPTION_HANDLER':'habits.views.custom_exception_handler',
 } 
 
+# Token authentication cache (habits.authentication.CachedTokenAuthentication)
+TOKEN_AUTH_CACHE = {
+    'TTL': 60,  # seconds
+    'MAX_SIZE': 10000,
+    'SHARED_CACHE': None,  # e.g. 'default' to share verified tokens between workers
+}
+
+# Basic authentication fast path (habits.authentication.CachedBasicAuthentication)
+BASIC_AUTH_CACHE = {
+    'TTL': 60,  # seconds a verified username/password pair skips password hashing
+    'MAX_SIZE': 10000,
+    'DISABLED_VIEWS': [],  # URL names where Basic auth is refused, e.g. ['weekly-summary']
+}
+
 MIDDLEWARE = [
+    'habits.metrics.MetricsMiddleware',  # first, so its latency covers every other middleware
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -87,14 +105,100 @@ WSGI_APPLICATION = 'habit_tracker.wsgi.application'
 
 # Database
 # https://docs.djangoproject.com/en/5.1/ref/settings/#databases
+# DATABASE_URL selects the backend (see habit_tracker.database); the SQLite file
+# below is used when it is unset.
+
+# SQLite tuning, run on every new connection: WAL lets readers proceed during a
+# write, NORMAL sync is safe under WAL, and writers wait for the lock instead of
+# failing with "database is locked". journal_mode=wal is persistent: the first
+# connection converts the file (including the dev db.sqlite3) for good, and it
+# keeps db.sqlite3-wal / -shm files beside it while open (see .gitignore).
+SQLITE_PRAGMAS = {
+    'journal_mode': 'wal',
+    'synchronous': 'normal',
+    'busy_timeout': 5000,  # ms
+    'mmap_size': 268435456,  # 256 MiB
+    'cache_size': -20000,  # negative = KiB, so ~20 MB per connection
+}
 
 DATABASES = {
+    'default': (
+        database_from_url(os.environ['DATABASE_URL'], SQLITE_PRAGMAS) if os.environ.get('DATABASE_URL')
+        else sqlite_database(BASE_DIR / 'db.sqlite3', SQLITE_PRAGMAS)
+    ),
+}
+
+# Optional separate read-only connection for the report views (habits.db.ReportReadRouter).
+# READ_DATABASE_URL points it at a replica; USE_READ_DATABASE alone opens the same
+# SQLite file with query_only.
+READ_DATABASE_URL = os.environ.get('READ_DATABASE_URL')
+USE_READ_DATABASE = bool(READ_DATABASE_URL) or env_flag('USE_READ_DATABASE')
+if READ_DATABASE_URL:
+    DATABASES['read'] = {**database_from_url(READ_DATABASE_URL, SQLITE_PRAGMAS), 'TEST': {'MIRROR': 'default'}}
+elif USE_READ_DATABASE and DATABASES['default']['ENGINE'] == 'django.db.backends.sqlite3':
+    DATABASES['read'] = {
+        **DATABASES['default'],
+        'OPTIONS': {
+            'init_command': DATABASES['default']['OPTIONS']['init_command'] + '; PRAGMA query_only=ON',
+        },
+        'TEST': {'MIRROR': 'default'},
+    }
+
+# A second backend for habits.tests.BackendParityTests, which checks that the streak
+# and summary queries agree across backends, e.g. a local Postgres while default is SQLite.
+if os.environ.get('PARITY_DATABASE_URL'):
+    DATABASES['parity'] = database_from_url(os.environ['PARITY_DATABASE_URL'], SQLITE_PRAGMAS)
+
+DATABASE_ROUTERS = ['habits.db.ReportReadRouter']
+
+
+# Generated PDF reports (habits.reports), content-addressed and reused across requests
+REPORTS_ROOT = BASE_DIR / 'reports'
+REPORT_WORKERS = 2  # background render threads per process; 0 renders inline
+REPORT_MAX_AGE = 7 * 24 * 3600  # seconds an unused report file or a finished job is kept (manage.py purge_reports)
+
+
+# Daily rollover at each user's local midnight (habits.rollover, run by `manage.py run_rollover`)
+ROLLOVER_WORKERS = 4  # threads per run; 0 rolls over inline
+ROLLOVER_CHUNK_SIZE = 500  # users per transaction
+
+
+# Webhooks (habits.webhooks) only reach public addresses; tests against a local
+# receiver turn this on
+WEBHOOK_ALLOW_PRIVATE_HOSTS = False
+
+# Cache
+# Per-user response caching (habits.cache.cache_per_user) and the auth caches'
+# credential versions keep their counters here, so every worker process must
+# see the same cache: set CACHE_URL (redis://...) when running several. The
+# process-local fallback only serves one process; habits refuses to start with
+# it when WORKER_PROCESSES > 1 (see habits.cache.check_version_cache).
+
+WORKER_PROCESSES = int(os.environ.get('WEB_CONCURRENCY', 1))  # gunicorn's default --workers
+
+CACHES = {
     'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': os.environ['CACHE_URL'],
+    } if os.environ.get('CACHE_URL') else {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
     }
 }
 
+RESPONSE_CACHE_TIMEOUT = 300  # seconds
+
+
+# Request metrics (habits.metrics), scraped by Prometheus at /metrics
+REQUEST_METRICS = {
+    'QUERY_BUDGET': 30,  # queries per request before a warning with a stack sample is logged
+    'QUERY_BUDGETS': {},  # per URL name, e.g. {'export-time-logs': None} to disable
+    # /metrics is served to staff users, to "Authorization: Bearer <TOKEN>" and to
+    # clients in INTERNAL_NETWORKS; PUBLIC = True serves it to anyone
+    'TOKEN': os.environ.get('METRICS_TOKEN'),
+    'INTERNAL_NETWORKS': (),  # e.g. ('10.0.0.0/8',) for an in-cluster Prometheus
+    'PUBLIC': False,
+}
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.1/ref/settings/#auth-password-validators
@@ -0,0 +1,155 @@
+"""
+Habit trend analytics over dense, day-indexed NumPy arrays.
+
+load_user_arrays() reads one user's completion days and time logs for a date
+window in a single query and lays them out as (habits x days) arrays;
+habit_metrics() then computes every metric for all habits at once with array
+operations, so the cost grows with the window, not with Python-level loops
+over habits and dates.
+"""
+from datetime import timedelta
+
+import numpy as np
+from django.db.models import IntegerField, Value
+from django.utils.timezone import localdate
+
+from .models import Habit, HabitCompletion, HabitTimeLog
+
+RATE_WINDOWS = (7, 30, 90)  # Days
+CONSISTENCY_HALF_LIFE = 14  # Days; a completion counts half as much two weeks later
+TREND_WEEKS = 12  # Time-spent average and trend look at this many recent weeks
+MAX_DAYS = 5 * 366
+
+
+class UserArrays:
+    """
+    One user's habits over [start, end]: `completed` (bool) and `minutes` (int)
+    are indexed [habit row, day offset from start]; `active_from` holds the
+    first day offset each habit existed or was completed.
+    """
+
+    def __init__(self, habits, start, end):
+        self.start = start
+        self.end = end
+        self.days = (end - start).days + 1
+        self.ids = np.array([habit_id for habit_id, _, _ in habits], dtype=np.int64)
+        self.names = [name for _, name, _ in habits]
+        self.completed = np.zeros((len(habits), self.days), dtype=bool)
+        self.minutes = np.zeros((len(habits), self.days), dtype=np.int64)
+        created = np.array([(localdate(created_at) - start).days for _, _, created_at in habits], dtype=np.int64)
+        self.active_from = np.clip(created, 0, self.days - 1)
+
+
+def load_user_arrays(user, start, end):
+    """ UserArrays for a user's habits, from one UNION ALL of completions and time logs. """
+    habits = list(Habit.objects.filter(user=user).order_by("id").values_list("id", "name", "created_at"))
+    arrays = UserArrays(habits, start, end)
+    if not habits:
+        return arrays
+
+    no_minutes = Value(None, output_field=IntegerField())  # Marks completion rows
+    completions = HabitCompletion.objects.filter(habit__user=user, date__range=(start, end)).values_list("habit_id", "date", no_minutes)
+    logs = HabitTimeLog.objects.filter(habit__user=user, date__range=(start, end)).values_list("habit_id", "date", "time_spent")
+    rows = list(completions.union(logs, all=True))
+    if not rows:
+        return arrays
+
+    habit_ids, dates, minutes = zip(*rows)
+    row = np.searchsorted(arrays.ids, np.array(habit_ids, dtype=np.int64))
+    day = np.fromiter((date.toordinal() for date in dates), dtype=np.int64, count=len(dates)) - start.toordinal()
+    is_log = np.array([value is not None for value in minutes])
+
+    arrays.completed[row[~is_log], day[~is_log]] = True
+    np.add.at(arrays.minutes, (row[is_log], day[is_log]), np.array([value for value in minutes if value is not None], dtype=np.int64))
+    # History imported before a habit row was created still counts as activity
+    first_done = np.where(arrays.completed.any(axis=1), arrays.completed.argmax(axis=1), arrays.days - 1)
+    arrays.active_from = np.minimum(arrays.active_from, first_done)
+    return arrays
+
+
+def run_lengths(completed):
+    """
+    (rows, starts, ends) of every run of consecutive True days, in row-major
+    order; `ends` is exclusive.
+    """
+    padded = np.zeros((completed.shape[0], completed.shape[1] + 2), dtype=np.int8)
+    padded[:, 1:-1] = completed
+    edges = np.diff(padded, axis=1)
+    start_rows, starts = np.nonzero(edges == 1)
+    _, ends = np.nonzero(edges == -1)
+    return start_rows, starts, ends
+
+
+def habit_metrics(arrays):
+    """ Per-habit metric arrays (one entry per row of `arrays`). """
+    completed, minutes, days = arrays.completed, arrays.minutes, arrays.days
+    count = len(arrays.ids)
+    active = np.arange(days)[None, :] >= arrays.active_from[:, None]
+
+    # Trailing-window completion rates over the days each habit was active
+    done_total = np.cumsum(completed, axis=1)
+    active_total = np.cumsum(active, axis=1)
+    rates = {}
+    for window in RATE_WINDOWS:
+        span = min(window, days)
+        done = done_total[:, -1] - (done_total[:, -span - 1] if span < days else 0)
+        active_days = active_total[:, -1] - (active_total[:, -span - 1] if span < days else 0)
+        rates[window] = np.divide(done, active_days, out=np.zeros(count), where=active_days > 0)
+
+    # Streaks from run boundaries; the current one may end today or yesterday
+    rows, starts, ends = run_lengths(completed)
+    lengths = ends - starts
+    longest = np.zeros(count, dtype=np.int64)
+    np.maximum.at(longest, rows, lengths)
+    current = np.zeros(count, dtype=np.int64)
+    ongoing = ends >= days - 1
+    np.maximum.at(current, rows[ongoing], lengths[ongoing])
+
+    # Exponentially weighted completion rate, normalized over the active days
+    weights = 0.5 ** (np.arange(days - 1, -1, -1) / CONSISTENCY_HALF_LIFE)
+    weighted_days = active @ weights
+    consistency = np.divide(completed @ weights, weighted_days, out=np.zeros(count), where=weighted_days > 0)
+
+    # Weekly minutes over the most recent whole weeks, and their least-squares slope
+    weeks = min(TREND_WEEKS, days // 7)
+    if weeks:
+        weekly = minutes[:, days - weeks * 7:].reshape(count, weeks, 7).sum(axis=2)
+        x = np.arange(weeks) - (weeks - 1) / 2
+        slope = (weekly - weekly.mean(axis=1, keepdims=True)) @ x / (x @ x) if weeks > 1 else np.zeros(count)
+        weekly_average = weekly.mean(axis=1)
+    else:
+        slope = weekly_average = np.zeros(count)
+
+    return {
+        "rates": rates,
+        "current_streak": current,
+        "longest_streak": longest,
+        "consistency": consistency,
+        "total_minutes": minutes.sum(axis=1),
+        "weekly_minutes": weekly_average,
+        "weekly_minutes_trend": slope,
+    }
+
+
+def user_analytics(user, days, today):
+    """ The /analytics/ payload for a user over the `days` days ending `today`. """
+    arrays = load_user_arrays(user, today - timedelta(days=days - 1), today)
+    metrics = habit_metrics(arrays)
+    habits = []
+    for i, (habit_id, name) in enumerate(zip(arrays.ids.tolist(), arrays.names)):
+        habits.append({
+            "id": habit_id,
+            "name": name,
+            "completion_rate": {
+                f"{window}d": round(float(rate[i]), 4) for window, rate in metrics["rates"].items() if window <= days
+            },
+            "current_streak": int(metrics["current_streak"][i]),
+            "longest_streak": int(metrics["longest_streak"][i]),
+            "consistency": round(float(metrics["consistency"][i]), 4),
+            "time_spent": {
+                "total_minutes": int(metrics["total_minutes"][i]),
+                "weekly_average": round(float(metrics["weekly_minutes"][i]), 2),
+                "weekly_trend": round(float(metrics["weekly_minutes_trend"][i]), 2),  # Minutes per week, per week
+            },
+        })
+    return {"from": str(arrays.start), "to": str(arrays.end), "days": days, "habits": habits}
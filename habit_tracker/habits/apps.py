@@ -4,3 +4,8 @@ from django.apps import AppConfig
 class HabitsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'habits'
+
+    def ready(self):
+        from . import signals  # noqa: F401  (registers signal receivers)
+        from .cache import check_version_cache
+        check_version_cache()
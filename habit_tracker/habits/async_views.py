@@ -0,0 +1,144 @@
+"""
+Native async variants of the read-only endpoints, mounted under /async/.
+
+They return the same payloads as their counterparts in views.py but query
+through Django's async ORM, so under ASGI a request waiting on the database
+or on a slow client does not pin a worker thread for its whole lifetime.
+Authentication runs DRF's configured classes once per request (cached token
+lookups make that cheap); everything else stays on the event loop.
+"""
+import json
+import random
+from functools import wraps
+
+from asgiref.sync import sync_to_async
+from django.http import JsonResponse, StreamingHttpResponse
+from django.utils.cache import get_conditional_response
+from django.utils.timezone import timedelta
+from rest_framework import exceptions
+from rest_framework.permissions import AllowAny, IsAuthenticated
+from rest_framework.request import Request
+from rest_framework.settings import api_settings
+
+from .cache import VALIDATOR_AGGREGATES, make_validators, set_validator_headers
+from .calendars import calendar_payload, calendar_range, calendar_rows
+from .models import Habit, ReminderDigest
+from .pagination import KeysetPagination
+from .reminders import user_digest
+from .timezones import auser_today, local_today
+from .views import MOTIVATIONAL_QUOTES, HabitListCreateView, WeeklySummaryView, api_guide_view
+
+
+def error_response(request, exc):
+    """ JSON error body and status as APIView.handle_exception() would send them. """
+    response = JsonResponse({"detail": exc.detail}, status=exc.status_code)
+    if isinstance(exc, (exceptions.NotAuthenticated, exceptions.AuthenticationFailed)):
+        header = request.authenticators[0].authenticate_header(request) if request.authenticators else None
+        if header:
+            response["WWW-Authenticate"] = header
+        else:
+            response.status_code = 403
+    return response
+
+
+def async_api_view(permission_class=IsAuthenticated):
+    """
+    Wrap an `async def view(request, ...)` taking a DRF Request: GET only,
+    authenticated with DEFAULT_AUTHENTICATION_CLASSES and checked against
+    `permission_class` the way APIView would.
+    """
+    def decorator(view):
+        @wraps(view)
+        async def wrapper(request, *args, **kwargs):
+            request = Request(request, authenticators=[auth() for auth in api_settings.DEFAULT_AUTHENTICATION_CLASSES])
+            if request.method not in ("GET", "HEAD"):
+                return error_response(request, exceptions.MethodNotAllowed(request.method))
+
+            try:
+                await sync_to_async(lambda: request.user)()
+                if not permission_class().has_permission(request, None):
+                    if request.successful_authenticator is None:
+                        raise exceptions.NotAuthenticated()
+                    raise exceptions.PermissionDenied()
+                return await view(request, *args, **kwargs)
+            except exceptions.APIException as exc:
+                return error_response(request, exc)
+        return wrapper
+    return decorator
+
+
+@async_api_view()
+async def habit_list(request):
+    # Reuse the sync view for ?fields= parsing and the (lazy) queryset
+    view = HabitListCreateView(request=request, args=(), kwargs={}, format_kwarg=None)
+    aggregate = await view.get_validator_queryset().aaggregate(**VALIDATOR_AGGREGATES)
+    etag, last_modified = make_validators("habit_list", request, {}, aggregate)
+    response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+    if response is None:
+        paginator = KeysetPagination()
+        rows = await paginator.apaginate_queryset(view.get_queryset(), request)
+        data = view.get_serializer(rows, many=True).data
+        response = JsonResponse({"next": paginator.get_next_link(), "results": data})
+    return set_validator_headers(response, etag, last_modified)
+
+
+@async_api_view()
+async def habit_streaks(request):
+    habits = await Habit.objects.filter(user=request.user).awith_streaks()
+    return JsonResponse({"habit_streaks": {habit.name: habit.current_streak for habit in habits}})
+
+
+@async_api_view()
+async def weekly_summary(request):
+    max_days = WeeklySummaryView.max_days
+    try:
+        days = int(request.query_params.get("days", 7))
+    except ValueError:
+        return JsonResponse({"error": "days must be a number."}, status=400)
+    if not (1 <= days <= max_days):
+        return JsonResponse({"error": f"days must be between 1 and {max_days}."}, status=400)
+
+    since = await auser_today(request.user.pk) - timedelta(days=days)
+    summary = Habit.objects.filter(user=request.user).completion_counts(since).order_by("id").values("name", "days_completed")
+
+    async def stream():
+        yield '{"weekly_summary": ['
+        first = True
+        async for row in summary.aiterator(chunk_size=500):
+            item = {"habit": row["name"], "days_completed": row["days_completed"]}
+            yield ("" if first else ",") + json.dumps(item, ensure_ascii=False)
+            first = False
+        yield "]}"
+
+    return StreamingHttpResponse(stream(), content_type="application/json")
+
+
+@async_api_view()
+async def progress_calendar(request):
+    try:
+        first, last, ranged = calendar_range(request.query_params, await auser_today(request.user.pk))
+    except ValueError as exc:
+        return JsonResponse({"error": str(exc)}, status=400)
+    rows = [row async for row in calendar_rows(request.user, first, last).aiterator()]
+    return JsonResponse(calendar_payload(rows, first, last, ranged))
+
+
+@async_api_view()
+async def daily_reminders(request):
+    digest = await ReminderDigest.objects.filter(user=request.user).afirst()
+    if digest is None or digest.date != local_today(digest.timezone):
+        digest = await sync_to_async(user_digest)(request.user)  # Rebuild with the sync ORM's bulk upsert
+
+    if not digest.reminders:
+        return JsonResponse({"message": "You have no habits added yet."})
+    return JsonResponse({"daily_reminders": digest.reminders})
+
+
+@async_api_view(permission_class=AllowAny)
+async def motivational_quote(request):
+    return JsonResponse({"motivational_quote": random.choice(MOTIVATIONAL_QUOTES)})
+
+
+async def api_guide(request):
+    # No database access; the sync view only builds a dict
+    return api_guide_view(request)
@@ -0,0 +1,172 @@
+import hashlib
+import hmac
+from copy import copy
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from rest_framework import exceptions
+from rest_framework.authentication import BasicAuthentication, TokenAuthentication
+
+from .cache import Counter, LRUCache, bump_version, get_version
+
+TOKEN_CACHE_SETTINGS = {
+    "TTL": 60,  # Seconds a verified token stays cached
+    "MAX_SIZE": 10000,
+    "SHARED_CACHE": None,  # Optional alias from CACHES shared between workers
+    **getattr(settings, "TOKEN_AUTH_CACHE", {}),
+}
+
+BASIC_AUTH_SETTINGS = {
+    "TTL": 60,  # Seconds a verified username/password pair stays cached
+    "MAX_SIZE": 10000,
+    "DISABLED_VIEWS": [],  # URL names that refuse Basic auth entirely
+    **getattr(settings, "BASIC_AUTH_CACHE", {}),
+}
+
+token_cache = LRUCache(max_size=TOKEN_CACHE_SETTINGS["MAX_SIZE"], ttl=TOKEN_CACHE_SETTINGS["TTL"])
+shared_token_hits = Counter()
+basic_auth_cache = LRUCache(max_size=BASIC_AUTH_SETTINGS["MAX_SIZE"], ttl=BASIC_AUTH_SETTINGS["TTL"])
+
+
+def credentials_version_key(user_id):
+    return f"habits:credentials-version:{user_id}"
+
+
+def credentials_version(user_id):
+    """
+    The user's credentials version, kept in the default cache so every worker
+    sees it. Cached verifications carry the version they were made under and
+    are only trusted while it is still current.
+    """
+    return get_version(credentials_version_key(user_id))
+
+
+def revoke_credentials(user_id):
+    """ Void the user's cached tokens and Basic-auth verifications, in every worker. """
+    if user_id is not None:
+        bump_version(credentials_version_key(user_id))
+
+
+def shared_token_cache():
+    alias = TOKEN_CACHE_SETTINGS["SHARED_CACHE"]
+    return caches[alias] if alias else None
+
+
+def shared_token_cache_key(key):
+    return f"habits:auth-token-entry:{key}"  # (token, credentials version)
+
+
+def invalidate_token(key):
+    """ Drop a token from this process's cache and the shared tier (other workers: see revoke_credentials()). """
+    token_cache.delete(key)
+    shared = shared_token_cache()
+    if shared is not None:
+        shared.delete(shared_token_cache_key(key))
+
+
+def credentials_cache_key(userid, password):
+    """ Keyed hash of the credentials; the plaintext password is never stored. """
+    message = f"{userid}\0{password}".encode()
+    return hmac.new(settings.SECRET_KEY.encode(), message, hashlib.sha256).digest()
+
+
+def token_cache_stats():
+    """ Hit/miss counters for the token cache (misses are database lookups). """
+    stats = token_cache.stats()
+    stats["shared_hits"] = shared_token_hits.value
+    stats["misses"] -= shared_token_hits.value
+    return stats
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """
+    TokenAuthentication that caches key -> token (with its user) in an
+    in-process LRU, backed by an optional shared Django cache, instead of
+    querying authtoken_token joined to auth_user on every request.
+
+    Each entry holds the user's credentials version from when it was read,
+    and a hit is only trusted while that version is current: deleting a token
+    or changing its user bumps the version (see signals.py), so every worker
+    drops its copy on the next request. A hit costs one cache read.
+    """
+
+    def authenticate_credentials(self, key):
+        entry = token_cache.get(key)
+        if entry is None or entry[1] != credentials_version(entry[0].user_id):
+            shared = shared_token_cache()
+            entry = shared.get(shared_token_cache_key(key)) if shared is not None else None
+            if entry is not None and entry[1] == credentials_version(entry[0].user_id):
+                shared_token_hits.increment()
+                token_cache.set(key, entry)
+            else:
+                entry = self.load_token(key)
+                if entry[1] == credentials_version(entry[0].user_id):  # Not revoked while loading
+                    if shared is not None:
+                        shared.set(shared_token_cache_key(key), entry, TOKEN_CACHE_SETTINGS["TTL"])
+                    token_cache.set(key, entry)
+
+        token = entry[0]
+
+        if not token.user.is_active:
+            raise exceptions.AuthenticationFailed("User inactive or deleted.")
+
+        # Hand each request its own copy so views can't mutate the cached user
+        return (copy(token.user), token)
+
+    def load_token(self, key):
+        """
+        (token, credentials version) from the database. The version is read
+        before the token, so a revocation landing during the read leaves the
+        entry stale instead of caching the old token as current.
+        """
+        model = self.get_model()
+        user_id = model.objects.filter(key=key).values_list("user_id", flat=True).first()
+        if user_id is None:
+            raise exceptions.AuthenticationFailed("Invalid token.")
+        version = credentials_version(user_id)
+        try:
+            return (model.objects.select_related("user").get(key=key), version)
+        except model.DoesNotExist:
+            raise exceptions.AuthenticationFailed("Invalid token.")
+
+
+class CachedBasicAuthentication(BasicAuthentication):
+    """
+    BasicAuthentication that skips the PBKDF2 check for credentials verified
+    within the last few seconds. Successful verifications are cached under an
+    HMAC of username + password, so a wrong password never matches a cached
+    entry. Failed attempts are never cached. Like cached tokens, an entry is
+    only trusted while the user's credentials version is the one it was
+    verified under, so a password change or deactivation applies to every
+    worker at once.
+
+    Views named in BASIC_AUTH_CACHE['DISABLED_VIEWS'] ignore Basic credentials,
+    so clients there must use a token or session.
+    """
+
+    def authenticate(self, request):
+        match = getattr(request._request, "resolver_match", None)
+        if match is not None and match.url_name in BASIC_AUTH_SETTINGS["DISABLED_VIEWS"]:
+            return None
+        return super().authenticate(request)
+
+    def authenticate_credentials(self, userid, password, request=None):
+        key = credentials_cache_key(userid, password)
+        entry = basic_auth_cache.get(key)
+        if entry is None or entry[1] != credentials_version(entry[0].pk):
+            # Read the version before the (slow) password check, so a change landing during it leaves the entry stale
+            user_id = entry[0].pk if entry else self.user_id(userid)
+            version = credentials_version(user_id) if user_id is not None else None
+            user, _ = super().authenticate_credentials(userid, password, request)
+            entry = (user, version)
+            if user.pk == user_id and version == credentials_version(user.pk):  # Not changed while verifying
+                basic_auth_cache.set(key, entry)
+        elif not entry[0].is_active:
+            raise exceptions.AuthenticationFailed("User inactive or deleted.")
+        return (copy(entry[0]), None)
+
+    def user_id(self, userid):
+        """ The id of the user named `userid`, or None. """
+        model = get_user_model()
+        return model._default_manager.filter(**{model.USERNAME_FIELD: userid}).values_list("pk", flat=True).first()
@@ -0,0 +1,152 @@
+from collections import defaultdict
+
+from django.db import transaction
+from django.utils.timezone import now
+
+from .cache import bump_user_version
+from .calendars import record_completions
+from .categories import categorize, categorize_all
+from .leaderboard import refresh_rankings
+from .models import Habit, HabitCompletion, HabitTimeLog, live_streak, streak_state
+from .reminders import drop_digest
+from .webhooks import completion_event, enqueue_events, habit_events, time_log_event
+from .rollups import record_time_logs
+from .serializers import BatchOperationSerializer
+from .timezones import user_today
+
+MAX_BATCH_OPERATIONS = 5000
+BATCH_CHUNK_SIZE = 500
+
+
+class BatchError(Exception):
+    """ Raised with a list of per-operation errors; nothing has been written. """
+    def __init__(self, errors):
+        super().__init__(errors)
+        self.errors = errors
+
+
+def resolve_habits(user, operations):
+    """
+    Validate habit references for the whole batch with one query. Returns
+    {reference: Habit or None}, None meaning "created by this batch".
+    """
+    refs = set()
+    errors = []
+    for index, op in enumerate(operations):
+        if op["op"] == BatchOperationSerializer.CREATE and op.get("ref"):
+            if op["ref"] in refs:
+                errors.append({"index": index, "ref": f"Duplicate ref '{op['ref']}'."})
+            refs.add(op["ref"])
+
+    ids = {int(op["habit"]) for op in operations if op.get("habit", "").isdigit() and op["habit"] not in refs}
+    owned = {str(habit.pk): habit for habit in Habit.objects.filter(user=user, id__in=ids)}
+
+    for index, op in enumerate(operations):
+        habit = op.get("habit")
+        if op["op"] != BatchOperationSerializer.CREATE and habit not in owned and habit not in refs:
+            errors.append({"index": index, "habit": f"Habit '{habit}' not found."})
+    if errors:
+        raise BatchError(errors)
+    return owned
+
+
+def apply_batch(user, payload):
+    """
+    Validate every operation in one pass, then write them in chunked bulk
+    queries inside a single transaction. Streaks are recomputed once per
+    affected habit rather than once per completion.
+    """
+    if len(payload) > MAX_BATCH_OPERATIONS:
+        raise BatchError([{"error": f"A batch can hold at most {MAX_BATCH_OPERATIONS} operations."}])
+
+    serializer = BatchOperationSerializer(data=payload, many=True)
+    if not serializer.is_valid():
+        errors = serializer.errors
+        # Newer DRF reports {index: errors}, older releases a list aligned with the payload
+        items = errors.items() if isinstance(errors, dict) else enumerate(errors)
+        raise BatchError([{"index": index, **error} for index, error in items if error])
+    operations = serializer.validated_data
+    habits = resolve_habits(user, operations)
+    today = user_today(user.pk)
+
+    with transaction.atomic():
+        creates = [op for op in operations if op["op"] == BatchOperationSerializer.CREATE]
+        new_habits = [
+            Habit(
+                user=user, name=op["name"],  # bulk_create() skips save(), which sets the categories
+                category=categorize(op["name"]), categories=list(categorize_all(op["name"])),
+                description=op.get("description"), goal=op.get("goal"), progress=op.get("progress", 0),
+            )
+            for op in creates
+        ]
+        Habit.objects.bulk_create(new_habits, batch_size=BATCH_CHUNK_SIZE)
+        created = []
+        for op, habit in zip(creates, new_habits):
+            if op.get("ref"):
+                habits[op["ref"]] = habit
+            created.append({"ref": op.get("ref"), "id": habit.pk})
+
+        completion_dates = defaultdict(set)
+        time_logs = []
+        for op in operations:
+            if op["op"] == BatchOperationSerializer.COMPLETE:
+                completion_dates[habits[op["habit"]]].add(op.get("date", today))
+            elif op["op"] == BatchOperationSerializer.LOG_TIME:
+                habit = habits[op["habit"]]
+                time_logs.append(HabitTimeLog(habit=habit, user=user, date=op.get("date", today), time_spent=op["time_spent"]))
+
+        completions = [HabitCompletion(habit=habit, user=user, date=date) for habit, dates in completion_dates.items() for date in dates]
+        HabitCompletion.objects.bulk_create(completions, batch_size=BATCH_CHUNK_SIZE, ignore_conflicts=True)
+        record_completions(completions)
+        update_streaks(completion_dates, today)
+        refresh_rankings(user.pk)  # bulk_update() skips the Habit signals
+        HabitTimeLog.objects.bulk_create(time_logs, batch_size=BATCH_CHUNK_SIZE)
+        record_time_logs(time_logs)
+        # bulk_create() skips HabitTimeLog.save() and Habit.save(), which queue these otherwise
+        events = [completion_event(habit, date) for habit, dates in completion_dates.items() for date in sorted(dates)]
+        events += [event for habit in completion_dates for event in habit_events(habit, None)]
+        events += [time_log_event(log) for log in time_logs]
+        enqueue_events(user.pk, events)
+        # Bulk writes skip model signals, so invalidate cached responses here
+        bump_user_version(user.pk)
+        drop_digest(user.pk)
+
+    return {
+        "created": created,
+        "completed": sum(len(dates) for dates in completion_dates.values()),
+        "time_logged": len(time_logs),
+    }
+
+
+def update_streaks(completion_dates, today):
+    """
+    Fold each habit's new completion days into its stored counters. Days
+    appended after the last known completion are folded in O(1) each; a
+    habit that received older days is recomputed from its history once, and
+    its run only counts while it reaches the user's `today` or yesterday.
+    """
+    rebuild = []
+    for habit, dates in completion_dates.items():
+        dates = sorted(dates)
+        if habit.last_completed is not None and dates[0] < habit.last_completed:
+            rebuild.append(habit)
+        else:
+            for date in dates:
+                habit.apply_completion(date)
+        habit.completed = True
+        habit.completed_at = max(dates[-1], habit.completed_at or dates[-1])
+        habit.updated_at = now()  # bulk_update() skips auto_now
+
+    if rebuild:
+        history = defaultdict(list)
+        for habit_id, date in HabitCompletion.objects.filter(habit__in=rebuild).order_by("habit_id", "-date").values_list("habit_id", "date"):
+            history[habit_id].append(date)
+        for habit in rebuild:
+            current, habit.longest_streak, habit.last_completed = streak_state(history[habit.pk])
+            habit.streak = live_streak(current, habit.last_completed, today)
+
+    Habit.objects.bulk_update(
+        list(completion_dates),
+        ["completed", "completed_at", "streak", "longest_streak", "last_completed", "updated_at"],
+        batch_size=BATCH_CHUNK_SIZE,
+    )
@@ -0,0 +1,256 @@
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from functools import wraps
+from urllib.parse import urlencode
+
+from django.conf import settings
+from django.core.cache import cache, caches
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.exceptions import ImproperlyConfigured
+from django.http import HttpResponseNotModified, StreamingHttpResponse
+from django.db.models import Count, Max
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, parse_etags
+from rest_framework.response import Response
+
+from .timezones import user_today
+
+
+class LRUCache:
+    """
+    Small thread-safe in-process LRU cache whose entries expire after `ttl`
+    seconds. Keeps hit/miss counters so callers can report effectiveness.
+    """
+
+    def __init__(self, max_size=1000, ttl=60):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None and entry[1] < time.monotonic():
+                del self._data[key]  # Expired
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return default
+            self._data.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def set(self, key, value):
+        with self._lock:
+            self._data[key] = (value, time.monotonic() + self.ttl)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_size:
+                self._data.popitem(last=False)  # Drop the least recently used entry
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self.hits = self.misses = 0
+
+    def stats(self):
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "size": len(self._data)}
+
+
+class Counter:
+    """ Thread-safe counter, for stats kept outside an LRUCache. """
+
+    def __init__(self):
+        self.value = 0
+        self._lock = threading.Lock()
+
+    def increment(self):
+        with self._lock:
+            self.value += 1
+
+    def reset(self):
+        with self._lock:
+            self.value = 0
+
+
+MAX_CACHED_STREAM_BYTES = 1024 * 1024
+
+
+def check_version_cache():
+    """
+    Version counters only invalidate across workers that share them: refuse a
+    process-local default cache when settings.WORKER_PROCESSES > 1.
+    """
+    if settings.WORKER_PROCESSES > 1 and isinstance(caches["default"], LocMemCache):
+        raise ImproperlyConfigured(
+            f"WORKER_PROCESSES is {settings.WORKER_PROCESSES} but the default cache is process-local (LocMemCache); "
+            "set CACHE_URL to a shared cache so cached responses and credentials are invalidated in every worker."
+        )
+
+
+def get_version(key):
+    """
+    Current value of the version counter at `key` in the default cache. A
+    missing counter (never set, or evicted) restarts from the clock, so an old
+    version is never reused.
+    """
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, time.time_ns(), timeout=None)
+        version = cache.get(key)
+    return version
+
+
+def bump_version(key):
+    try:
+        cache.incr(key)
+    except ValueError:  # Not set yet
+        cache.add(key, time.time_ns(), timeout=None)
+
+
+def user_version_key(user_id):
+    return f"habits:user-version:{user_id}"
+
+
+def get_user_version(user_id):
+    """ Current data version of a user's habits. """
+    return get_version(user_version_key(user_id))
+
+
+def bump_user_version(user_id):
+    """ Invalidate every cached response derived from this user's data. """
+    if user_id is None:
+        return
+    bump_version(user_version_key(user_id))
+
+
+def tee_to_cache(chunks, key, content_type, ttl):
+    """ Pass a streamed body through, caching it at the end unless it is too large. """
+    parts, size = [], 0
+    for chunk in chunks:
+        if parts is not None:
+            size += len(chunk)
+            if size > MAX_CACHED_STREAM_BYTES:
+                parts = None
+            else:
+                parts.append(chunk)
+        yield chunk
+    if parts is not None:
+        cache.set(key, ("raw", b"".join(parts), content_type), ttl)
+
+
+def cache_per_user(timeout=None):
+    """
+    Cache a view's GET response per user, view, URL arguments and query string.
+
+    Keys include the user's data version (see bump_user_version), so any change
+    to their habits or time logs invalidates everything at once. The key also
+    serves as the ETag: a matching If-None-Match gets a 304 without running the
+    view or touching the ORM.
+    """
+    def decorator(method):
+        @wraps(method)
+        def wrapper(self, request, *args, **kwargs):
+            version = get_user_version(request.user.pk)
+            query = urlencode(sorted(request.query_params.lists()), doseq=True)
+            # The user's local date is part of the key: several views answer relative to "today"
+            raw_key = f"{type(self).__name__}|{request.user.pk}|{version}|{user_today(request.user.pk)}|{sorted(kwargs.items())}|{query}"
+            digest = hashlib.sha256(raw_key.encode()).hexdigest()
+            etag = f'"{digest}"'
+
+            if etag in parse_etags(request.headers.get("If-None-Match", "")):
+                response = HttpResponseNotModified()
+                response["ETag"] = etag
+                return response
+
+            key = f"habits:response:{digest}"
+            ttl = timeout if timeout is not None else settings.RESPONSE_CACHE_TIMEOUT
+            cached = cache.get(key)
+            if cached is None:
+                response = method(self, request, *args, **kwargs)
+                if response.status_code != 200:
+                    return response
+                if response.streaming:
+                    # Keep streaming; the body is cached once fully sent
+                    response.streaming_content = tee_to_cache(response.streaming_content, key, response["Content-Type"], ttl)
+                else:
+                    cache.set(key, ("data", response.data, None), ttl)
+            else:
+                kind, body, content_type = cached
+                response = StreamingHttpResponse([body], content_type=content_type) if kind == "raw" else Response(body)
+
+            response["ETag"] = etag
+            response["Cache-Control"] = "private, no-cache"  # Clients must revalidate with If-None-Match
+            return response
+        return wrapper
+    return decorator
+
+
+VALIDATOR_AGGREGATES = {"last_modified": Max("updated_at"), "count": Count("pk")}
+
+
+def make_validators(name, request, kwargs, aggregate, extra=""):
+    """
+    (etag, last_modified) from a VALIDATOR_AGGREGATES result: max(updated_at)
+    plus the row count (so deletions change the ETag too), mixed with the URL
+    arguments and query string.
+    """
+    last_modified = aggregate["last_modified"]
+    query = urlencode(sorted(request.query_params.lists()), doseq=True)
+    raw = f"{name}|{request.user.pk}|{last_modified}|{aggregate['count']}|{sorted(kwargs.items())}|{query}|{extra}"
+    etag = f'W/"{hashlib.sha256(raw.encode()).hexdigest()}"'
+    return etag, int(last_modified.timestamp()) if last_modified else None
+
+
+def set_validator_headers(response, etag, last_modified):
+    if response.status_code in (200, 304):
+        response["ETag"] = etag
+        if last_modified:
+            response["Last-Modified"] = http_date(last_modified)
+        response["Cache-Control"] = "private, no-cache"
+    return response
+
+
+def conditional_get(method):
+    """
+    Answer GET with 304 Not Modified before any serialization when the client's
+    ETag / Last-Modified still match. For views using ConditionalGetMixin that
+    define their own get().
+
+    Validators come from one aggregate over `get_validator_queryset()`; see
+    make_validators().
+    """
+    @wraps(method)
+    def wrapper(self, request, *args, **kwargs):
+        aggregate = self.get_validator_queryset().aggregate(**VALIDATOR_AGGREGATES)
+        etag, last_modified = make_validators(type(self).__name__, request, kwargs, aggregate, self.get_validator_extra())
+
+        response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+        if response is None:
+            response = method(self, request, *args, **kwargs)
+        return set_validator_headers(response, etag, last_modified)
+    return wrapper
+
+
+class ConditionalGetMixin:
+    """ ETag / Last-Modified validation for GET; see conditional_get(). """
+
+    def get_validator_queryset(self):
+        return self.get_queryset()
+
+    def get_validator_extra(self):
+        """ Anything else the response depends on; included in the ETag. """
+        return ""
+
+    @conditional_get
+    def get(self, request, *args, **kwargs):
+        return super().get(request, *args, **kwargs)
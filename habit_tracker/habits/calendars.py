@@ -0,0 +1,144 @@
+from calendar import monthrange
+from collections import defaultdict
+from datetime import date, datetime
+
+from django.db import connection, transaction
+from django.db.models import F
+
+from .models import HabitCalendarMonth, HabitCompletion
+
+# OR the new days into the existing bitmap or create it, in one statement (SQLite >= 3.24 and PostgreSQL)
+UPSERT_SQL = """
+INSERT INTO {table} (habit_id, user_id, month, days)
+VALUES {values}
+ON CONFLICT (habit_id, month) DO UPDATE SET days = {table}.days | excluded.days
+"""
+UPSERT_CHUNK_SIZE = 500
+MAX_CALENDAR_MONTHS = 36  # Longest ?from=&to= range served at once
+
+
+def month_start(day):
+    return day.replace(day=1)
+
+
+def day_bit(day):
+    return 1 << (day.day - 1)
+
+
+def record_completions(completions):
+    """
+    Set the bits of newly inserted HabitCompletion rows in their habit-month
+    bitmaps. Re-recording a day is harmless, so callers may pass rows that
+    bulk_create(ignore_conflicts=True) skipped.
+    """
+    bitmaps = defaultdict(int)
+    users = {}
+    for completion in completions:
+        key = (completion.habit_id, month_start(completion.date))
+        bitmaps[key] |= day_bit(completion.date)
+        users[key] = completion.user_id
+
+    rows = [(habit_id, users[(habit_id, month)], month, days) for (habit_id, month), days in bitmaps.items()]
+    table = connection.ops.quote_name(HabitCalendarMonth._meta.db_table)
+    with connection.cursor() as cursor:
+        for i in range(0, len(rows), UPSERT_CHUNK_SIZE):
+            chunk = rows[i:i + UPSERT_CHUNK_SIZE]
+            values = ", ".join(["(%s, %s, %s, %s)"] * len(chunk))
+            cursor.execute(UPSERT_SQL.format(table=table, values=values), [value for row in chunk for value in row])
+
+
+def forget_completions(completions):
+    """ Clear the bits of deleted HabitCompletion rows, dropping bitmaps left empty. """
+    for completion in completions:
+        months = HabitCalendarMonth.objects.filter(habit_id=completion.habit_id, month=month_start(completion.date))
+        months.update(days=F("days").bitand(~day_bit(completion.date)))
+        months.filter(days=0).delete()
+
+
+def rebuild_calendars(habit_ids=None):
+    """
+    Recompute the bitmaps from the completion history, for all habits or just
+    `habit_ids`. Returns the number of bitmap rows written.
+    """
+    completions = HabitCompletion.objects.all()
+    calendars = HabitCalendarMonth.objects.all()
+    if habit_ids is not None:
+        completions = completions.filter(habit_id__in=habit_ids)
+        calendars = calendars.filter(habit_id__in=habit_ids)
+
+    bitmaps = {}
+    for habit_id, user_id, day in completions.values_list("habit_id", "habit__user_id", "date").iterator(chunk_size=2000):
+        key = (habit_id, month_start(day))
+        bitmap = bitmaps.setdefault(key, HabitCalendarMonth(habit_id=habit_id, user_id=user_id, month=key[1]))
+        bitmap.days |= day_bit(day)
+
+    with transaction.atomic():
+        calendars.delete()
+        return len(HabitCalendarMonth.objects.bulk_create(bitmaps.values(), batch_size=UPSERT_CHUNK_SIZE))
+
+
+def calendar_range(query_params, today):
+    """
+    The (first, last, ranged) months a calendar request covers: ?from=YYYY-MM[&to=YYYY-MM],
+    else ?month=&year= (defaulting to the current month). Raises ValueError
+    with a message for the client.
+    """
+    if "from" in query_params or "to" in query_params:
+        try:
+            first = datetime.strptime(query_params["from"], "%Y-%m").date()
+            last = datetime.strptime(query_params.get("to", query_params["from"]), "%Y-%m").date()
+        except (KeyError, ValueError):
+            raise ValueError("from and to must be months as YYYY-MM")
+        months = (last.year - first.year) * 12 + last.month - first.month + 1
+        if not (1 <= months <= MAX_CALENDAR_MONTHS):
+            raise ValueError(f"to must not be before from, and the range must span at most {MAX_CALENDAR_MONTHS} months")
+        return first, last, True
+
+    try:
+        month = int(query_params.get("month", today.month))
+        year = int(query_params.get("year", today.year))
+    except ValueError:
+        raise ValueError("Invalid month or year")
+    if not (1 <= month <= 12):
+        raise ValueError("Month must be between 1 and 12")
+    try:
+        first = date(year, month, 1)
+    except ValueError:
+        raise ValueError("Invalid month or year")
+    return first, first, False
+
+
+def calendar_rows(user, first, last):
+    """ (month, days, habit name) for each of the user's habit-months in the range, in one query. """
+    return HabitCalendarMonth.objects.filter(
+        user=user, month__range=(first, last)
+    ).order_by("month", "habit_id").values("month", "days", "habit__name")
+
+
+def calendar_payload(rows, first, last, ranged):
+    """ The response body: one month as before, or {"from", "to", "months"} for a range. """
+    calendars = build_calendars(rows, first, last)
+    if not ranged:
+        return calendars[0]
+    return {"from": f"{first:%Y-%m}", "to": f"{last:%Y-%m}", "months": calendars}
+
+
+def build_calendars(rows, first, last):
+    """ One {"month", "year", "calendar"} payload per month from first to last, days mapped to habit names. """
+    by_month = defaultdict(list)
+    for row in rows:
+        by_month[row["month"]].append((row["habit__name"], row["days"]))
+
+    calendars = []
+    month = first
+    while True:
+        last_day = monthrange(month.year, month.month)[1]
+        calendar_data = {str(day): [] for day in range(1, last_day + 1)}
+        for name, days in by_month[month]:
+            for day in range(1, last_day + 1):
+                if days >> (day - 1) & 1:
+                    calendar_data[str(day)].append(name)
+        calendars.append({"month": month.strftime("%B"), "year": month.year, "calendar": calendar_data})
+        if month == last:
+            return calendars
+        month = date(month.year + month.month // 12, month.month % 12 + 1, 1)
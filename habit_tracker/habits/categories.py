@@ -0,0 +1,57 @@
+"""
+Keyword categorization of habit names, shared by the suggestion endpoints.
+
+The taxonomy in data/habit_categories.json is loaded once at import and
+compiled into a single regex alternation of every keyword. A name's category
+is the one whose keyword (a whole word or phrase) occurs first in it; its
+categories are all those with a keyword in it, e.g. both "Health & Hydration"
+and "Fitness & Exercise" for "Drink water after the gym". Habit.save() stores
+both (Habit.category ranks the leaderboards, Habit.categories drives the
+suggestions) so the views never scan names; after editing the data file, run
+`manage.py recategorize_habits`.
+"""
+import json
+import re
+from functools import lru_cache
+from pathlib import Path
+
+DATA_FILE = Path(__file__).resolve().parent / "data" / "habit_categories.json"
+
+with open(DATA_FILE, encoding="utf-8") as data_file:
+    CATEGORIES = json.load(data_file)  # {category: {"keywords", "suggestions", "next_habit"?}}
+
+CATEGORY_ORDER = {category: index for index, category in enumerate(CATEGORIES)}
+
+KEYWORD_CATEGORY = {
+    keyword.lower(): category
+    for category, entry in reversed(CATEGORIES.items())  # The first category listing a keyword wins
+    for keyword in entry["keywords"]
+}
+
+KEYWORD_CATEGORIES = {}  # Every category listing a keyword
+for category, entry in CATEGORIES.items():
+    for keyword in entry["keywords"]:
+        KEYWORD_CATEGORIES.setdefault(keyword.lower(), []).append(category)
+
+# Longest first, so "strength training" matches before "training"
+KEYWORD_PATTERN = re.compile(
+    r"\b(?:%s)\b" % "|".join(re.escape(keyword) for keyword in sorted(KEYWORD_CATEGORY, key=len, reverse=True))
+)
+
+
+@lru_cache(maxsize=4096)
+def categorize(name):
+    """ The category of a habit name, or "" when no keyword matches. """
+    match = KEYWORD_PATTERN.search(" ".join(name.lower().split()))
+    return KEYWORD_CATEGORY[match.group()] if match else ""
+
+
+@lru_cache(maxsize=4096)
+def categorize_all(name):
+    """ Every category with a keyword in a habit name, in the data file's order. """
+    found = {
+        category
+        for match in KEYWORD_PATTERN.finditer(" ".join(name.lower().split()))
+        for category in KEYWORD_CATEGORIES[match.group()]
+    }
+    return tuple(sorted(found, key=CATEGORY_ORDER.get))
@@ -0,0 +1,61 @@
+"""
+Database routing for the read-only report views.
+
+Views decorated with @use_read_database send their ORM reads to the "read"
+alias through ReportReadRouter, when DATABASES defines one. Writes, and reads
+everywhere else, stay on "default".
+"""
+from contextvars import ContextVar
+from functools import wraps
+
+from django.conf import settings
+
+READ_ALIAS = "read"
+
+reading_reports = ContextVar("reading_reports", default=False)
+
+
+class ReportReadRouter:
+    def db_for_read(self, model, **hints):
+        if reading_reports.get() and READ_ALIAS in settings.DATABASES:
+            return READ_ALIAS
+        return None
+
+    def db_for_write(self, model, **hints):
+        return None
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True  # Both aliases hold the same data
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return False if db == READ_ALIAS else None
+
+
+def in_read_context(content):
+    """ Iterate a streaming body with reads routed to the read alias, one chunk at a time. """
+    iterator = iter(content)
+    while True:
+        token = reading_reports.set(True)
+        try:
+            chunk = next(iterator)
+        except StopIteration:
+            return
+        finally:
+            reading_reports.reset(token)
+        yield chunk
+
+
+def use_read_database(method):
+    """ Route the reads of a view method (and of its streamed body) to the read alias. """
+    @wraps(method)
+    def wrapper(self, request, *args, **kwargs):
+        token = reading_reports.set(True)
+        try:
+            response = method(self, request, *args, **kwargs)
+        finally:
+            reading_reports.reset(token)
+        streaming = getattr(response, "streaming", False) and not response.is_async
+        if streaming and getattr(response, "file_to_stream", None) is None:  # Files need no database
+            response.streaming_content = in_read_context(response.streaming_content)
+        return response
+    return wrapper
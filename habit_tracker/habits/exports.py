@@ -0,0 +1,118 @@
+import csv
+import json
+import zlib
+from datetime import date, datetime, time
+
+from django.utils.timezone import is_naive, make_aware
+from rest_framework.renderers import BaseRenderer
+
+from .models import Habit, HabitTimeLog
+
+EXPORT_CHUNK_SIZE = 2000
+
+HABIT_EXPORT_FIELDS = [
+    "id", "name", "description", "completed", "completed_at", "created_at", "updated_at",
+    "goal", "progress", "streak", "longest_streak", "last_completed",
+]
+TIME_LOG_EXPORT_FIELDS = ["id", "habit_id", "habit__name", "date", "time_spent"]
+
+
+class CSVExportRenderer(BaseRenderer):
+    """ Selects CSV for ?format=csv / Accept: text/csv; streamed bodies bypass render(). """
+    media_type = "text/csv"
+    format = "csv"
+    charset = "utf-8"
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        # Only reached for error responses
+        return json.dumps(data, default=str).encode()
+
+
+class NDJSONExportRenderer(CSVExportRenderer):
+    media_type = "application/x-ndjson"
+    format = "ndjson"
+
+
+def export_queryset(model, user, since=None):
+    """ The user's rows as value tuples, read through a server-side cursor. """
+    if model is Habit:
+        queryset = Habit.objects.filter(user=user)
+        fields = HABIT_EXPORT_FIELDS
+        if since:
+            if not isinstance(since, datetime):
+                since = datetime.combine(since, time.min)
+            if is_naive(since):
+                since = make_aware(since)
+            queryset = queryset.filter(updated_at__gte=since)  # Created or changed since
+    else:
+        queryset = HabitTimeLog.objects.filter(habit__user=user)
+        fields = TIME_LOG_EXPORT_FIELDS
+        if since:
+            queryset = queryset.filter(date__gte=since.date() if isinstance(since, datetime) else since)
+    return fields, queryset.order_by("id").values_list(*fields).iterator(chunk_size=EXPORT_CHUNK_SIZE)
+
+
+class _Echo:
+    """ File-like object whose write() hands back the line, for csv.writer. """
+    def write(self, value):
+        return value
+
+
+def iso_row(row):
+    """ Dates and datetimes as ISO 8601 strings, everything else untouched. """
+    return [value.isoformat() if isinstance(value, date) else value for value in row]
+
+
+def csv_lines(fields, rows):
+    writer = csv.writer(_Echo())
+    yield writer.writerow([field.replace("__", "_") for field in fields])
+    for row in rows:
+        yield writer.writerow(iso_row(row))
+
+
+def ndjson_lines(fields, rows):
+    keys = [field.replace("__", "_") for field in fields]
+    for row in rows:
+        yield json.dumps(dict(zip(keys, iso_row(row))), ensure_ascii=False) + "\n"
+
+
+def batched(lines, size=EXPORT_CHUNK_SIZE):
+    """ Join lines into larger chunks so each write to the socket carries many rows. """
+    batch = []
+    for line in lines:
+        batch.append(line)
+        if len(batch) >= size:
+            yield "".join(batch).encode()
+            batch = []
+    if batch:
+        yield "".join(batch).encode()
+
+
+def accepts_gzip(header):
+    """ Whether an Accept-Encoding header allows gzip: listed, or covered by "*", with a non-zero q-value. """
+    qualities = {}
+    for item in header.split(","):
+        coding, *params = [part.strip() for part in item.split(";")]
+        quality = 1.0
+        for param in params:
+            name, _, value = param.partition("=")
+            if name.strip().lower() == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        if coding:
+            qualities[coding.lower()] = quality
+    for coding in ("gzip", "x-gzip", "*"):
+        if coding in qualities:
+            return qualities[coding] > 0
+    return False
+
+
+def gzipped(chunks):
+    compressor = zlib.compressobj(wbits=31)  # 31 = gzip container
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
@@ -0,0 +1,207 @@
+"""
+Cross-user streak leaderboards, one per habit category plus an overall one.
+
+StreakRanking holds each user's best stored streak per board and is updated
+incrementally from Habit saves (refresh_rankings), so requests never sort
+every user's habits. Ranks and percentiles come from a per-process
+ScoreIndex per board, built from one grouped query over the ranking table
+(a row per distinct streak value, not per user) and reloaded at most every
+INDEX_TTL seconds; this process's own writes apply to it immediately. With
+several workers, ranks may lag other workers' writes by up to INDEX_TTL.
+"""
+import threading
+import time
+from collections import Counter
+
+from django.db import transaction
+from django.db.models import Count, F, Max, Window
+from django.db.models.functions import RowNumber
+
+from .models import Habit, StreakRanking
+
+INDEX_TTL = 60  # Seconds
+MAX_SCORE = 2 ** 16 - 1  # ~179 years of days; higher scores tie with it, keeping the tree at most 64K entries
+
+
+class ScoreIndex:
+    """
+    Multiset of non-negative integer scores with O(log n) insert, remove and
+    rank queries (a Fenwick tree over the score values, n = highest score).
+    Scores are clamped to MAX_SCORE, which bounds the tree's size.
+    """
+
+    def __init__(self, counts=None):
+        clamped = Counter()  # {score: number of entries}
+        for score, count in (counts or {}).items():
+            clamped[min(score, MAX_SCORE)] += count
+        counts = clamped
+        self.capacity = 1
+        while self.capacity <= max(counts, default=0):
+            self.capacity *= 2
+        self.tree = [0] * (self.capacity + 1)
+        for score, count in counts.items():
+            self.tree[score + 1] += count
+        for i in range(1, self.capacity + 1):  # Linear-time build
+            parent = i + (i & -i)
+            if parent <= self.capacity:
+                self.tree[parent] += self.tree[i]
+        self.total = sum(counts.values())
+
+    def add(self, score, count=1):
+        """ Insert `count` entries with `score` (remove them with a negative count). """
+        score = min(score, MAX_SCORE)
+        while score >= self.capacity:
+            # Node 2c covers every existing score; the new nodes below it cover none yet
+            self.tree.extend([0] * self.capacity)
+            self.capacity *= 2
+            self.tree[self.capacity] = self.total
+        self.total += count
+        i = score + 1
+        while i <= self.capacity:
+            self.tree[i] += count
+            i += i & -i
+
+    def count_below(self, score):
+        """ Entries with a score lower than `score`. """
+        i, below = min(score, self.capacity), 0
+        while i > 0:
+            below += self.tree[i]
+            i -= i & -i
+        return below
+
+    def rank(self, score):
+        """ 1 + the number of entries scoring higher (ties share a rank). """
+        score = min(score, MAX_SCORE)
+        return 1 + self.total - self.count_below(score + 1)
+
+    def percentile(self, score):
+        """ Share of entries scoring lower than `score`, in percent. """
+        score = min(score, MAX_SCORE)
+        return 100 * self.count_below(score) / self.total if self.total else 0.0
+
+
+class Leaderboards:
+    """ The ScoreIndex of every board, shared by the threads of this process. """
+
+    def __init__(self):
+        self._boards = {}
+        self._loaded_at = None
+        self._lock = threading.Lock()
+
+    def _load(self):
+        counts = {}
+        grouped = StreakRanking.objects.values("board", "streak").annotate(count=Count("id")).order_by()
+        for row in grouped.iterator():
+            counts.setdefault(row["board"], {})[row["streak"]] = row["count"]
+        self._boards = {board: ScoreIndex(board_counts) for board, board_counts in counts.items()}
+        self._loaded_at = time.monotonic()
+
+    def index(self, board):
+        """ The board's ScoreIndex, reloading every board from the table when stale. """
+        with self._lock:
+            if self._loaded_at is None or time.monotonic() - self._loaded_at > INDEX_TTL:
+                self._load()
+            return self._boards.setdefault(board, ScoreIndex())
+
+    def apply(self, board, old_streak, new_streak):
+        """ Move one user's entry on a board (None = no entry) in the loaded index. """
+        with self._lock:
+            if self._loaded_at is None:
+                return  # Loaded from the table on first use
+            index = self._boards.setdefault(board, ScoreIndex())
+            if old_streak is not None:
+                index.add(old_streak, -1)
+            if new_streak is not None:
+                index.add(new_streak)
+
+    def clear(self):
+        with self._lock:
+            self._boards = {}
+            self._loaded_at = None
+
+
+leaderboards = Leaderboards()
+
+
+def best_streaks(user_id):
+    """ {board: best stored streak} for a user's habits, omitting boards without a streak. """
+    grouped = list(Habit.objects.filter(user_id=user_id, streak__gt=0).values("category").annotate(best=Max("streak")).order_by())
+    best = {row["category"]: row["best"] for row in grouped if row["category"]}
+    overall = max((row["best"] for row in grouped), default=0)
+    if overall:
+        best[StreakRanking.OVERALL] = overall
+    return best
+
+
+def refresh_rankings(user_id):
+    """ Bring a user's StreakRanking rows (and the loaded index) in line with their habits. """
+    if user_id is None:
+        return
+    with transaction.atomic():
+        current = dict(StreakRanking.objects.select_for_update().filter(user_id=user_id).values_list("board", "streak"))
+        best = best_streaks(user_id)
+        stale = [board for board in current if board not in best]
+        changed = [StreakRanking(user_id=user_id, board=board, streak=streak) for board, streak in best.items() if current.get(board) != streak]
+        if stale:
+            StreakRanking.objects.filter(user_id=user_id, board__in=stale).delete()
+        if changed:
+            StreakRanking.objects.bulk_create(
+                changed, update_conflicts=True, unique_fields=["user", "board"], update_fields=["streak"],
+            )
+
+    for board in stale:
+        leaderboards.apply(board, current[board], None)
+    for ranking in changed:
+        leaderboards.apply(ranking.board, current.get(ranking.board), ranking.streak)
+
+
+def rebuild_rankings():
+    """ Recompute every StreakRanking row from the habits. Returns the number of rows written. """
+    grouped = Habit.objects.filter(user__isnull=False, streak__gt=0).values("user_id", "category").annotate(best=Max("streak")).order_by()
+    best = {}
+    for row in grouped.iterator():
+        boards = best.setdefault(row["user_id"], {})
+        if row["category"]:
+            boards[row["category"]] = row["best"]
+        boards[StreakRanking.OVERALL] = max(boards.get(StreakRanking.OVERALL, 0), row["best"])
+
+    with transaction.atomic():
+        StreakRanking.objects.all().delete()
+        created = len(StreakRanking.objects.bulk_create(
+            [StreakRanking(user_id=user_id, board=board, streak=streak) for user_id, boards in best.items() for board, streak in boards.items()],
+            batch_size=1000,
+        ))
+    leaderboards.clear()
+    return created
+
+
+def top_rankings(boards, limit):
+    """ {board: [(username, streak), ...]} with the `limit` best users of each board, in one query. """
+    ranked = StreakRanking.objects.filter(board__in=boards).annotate(
+        position=Window(RowNumber(), partition_by=F("board"), order_by=[F("streak").desc(), F("user_id").asc()]),
+    ).filter(position__lte=limit).order_by("board", "position").values_list("board", "user__username", "streak")
+    top = {board: [] for board in boards}
+    for board, username, streak in ranked:
+        top[board].append((username, streak))
+    return top
+
+
+def leaderboard_payload(user, boards, limit):
+    """ The /leaderboard/ body: each board's top users, and the requesting user's place on it. """
+    top = top_rankings(boards, limit)
+    own = dict(StreakRanking.objects.filter(user=user, board__in=boards).values_list("board", "streak"))
+    payload = []
+    for board in boards:
+        index = leaderboards.index(board)
+        streak = own.get(board)
+        payload.append({
+            "category": board or "Overall",
+            "participants": index.total,
+            "top": [{"rank": index.rank(score), "username": username, "streak": score} for username, score in top[board]],
+            "you": {
+                "streak": streak,
+                "rank": index.rank(streak),
+                "percentile": round(index.percentile(streak), 1),
+            } if streak else None,
+        })
+    return payload
@@ -0,0 +1,60 @@
+from itertools import groupby
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from habits.calendars import rebuild_calendars
+from habits.leaderboard import rebuild_rankings
+from habits.models import Habit, HabitCompletion, live_streak, streak_state
+from habits.timezones import user_today
+
+
+class Command(BaseCommand):
+    help = "Backfill the completion history and stored streak counters from existing Habit rows."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=1000)
+
+    def handle(self, *args, **options):
+        batch_size = options["batch_size"]
+
+        with transaction.atomic():
+            # Every completed row becomes a completion event for its own habit
+            events = (
+                HabitCompletion(habit_id=habit_id, user_id=user_id, date=completed_at)
+                for habit_id, user_id, completed_at in Habit.objects.filter(
+                    completed_at__isnull=False
+                ).values_list("id", "user_id", "completed_at").iterator(chunk_size=batch_size)
+            )
+            processed = 0
+            batch = []
+            for event in events:
+                batch.append(event)
+                if len(batch) >= batch_size:
+                    processed += len(HabitCompletion.objects.bulk_create(batch, ignore_conflicts=True))
+                    batch = []
+            if batch:
+                processed += len(HabitCompletion.objects.bulk_create(batch, ignore_conflicts=True))
+
+            # Each habit's own history, like calculate_streak() and HabitQuerySet.streaks()
+            history = HabitCompletion.objects.order_by(
+                "habit_id", "-date"
+            ).values_list("habit_id", "habit__user_id", "date").iterator(chunk_size=batch_size)
+
+            groups = 0
+            for (habit_id, user_id), rows in groupby(history, key=lambda row: (row[0], row[1])):
+                current, longest, last = streak_state(row[2] for row in rows)
+                Habit.objects.filter(pk=habit_id).update(
+                    streak=live_streak(current, last, user_today(user_id)), longest_streak=longest, last_completed=last,
+                )
+                groups += 1
+            # Habits without a history have no streak
+            Habit.objects.filter(completions__isnull=True).update(streak=0, longest_streak=0, last_completed=None)
+
+            calendars = rebuild_calendars()
+            rankings = rebuild_rankings()
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Processed {processed} completion(s); updated streaks for {groups} habit(s), "
+            f"rebuilt {calendars} calendar month(s) and {rankings} leaderboard ranking(s)."
+        ))
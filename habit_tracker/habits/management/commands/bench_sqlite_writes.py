@@ -0,0 +1,109 @@
+import datetime
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, OperationalError, connection, connections
+from django.db.models import Count
+from django.utils.timezone import now
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from habits.models import Habit
+from habits.views import LogHabitTimeView
+
+
+class Command(BaseCommand):
+    help = (
+        "Measure concurrent write throughput (LogHabitTimeView and Habit.save) on a scratch "
+        "SQLite file, with SQLite's defaults and with the tuned DATABASES['default'] options. "
+        "The configured database is not touched."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--threads", type=int, default=8, help="Concurrent writer threads.")
+        parser.add_argument("--writes", type=int, default=100, help="Writes per writer thread.")
+        parser.add_argument("--readers", type=int, default=2, help="Threads running the weekly-summary query meanwhile.")
+
+    def handle(self, *args, **options):
+        database = connections.settings[DEFAULT_DB_ALIAS]
+        if database["ENGINE"] != "django.db.backends.sqlite3":
+            raise CommandError("This benchmark only applies to SQLite.")
+
+        original = dict(database)
+        modes = [("sqlite defaults", {}), ("tuned", original.get("OPTIONS", {}))]
+        self.stdout.write(f"{'mode':<18}{'writes/s':>10}{'locked':>8}{'reads/s':>10}")
+        try:
+            for label, db_options in modes:
+                with tempfile.TemporaryDirectory() as scratch:
+                    # Connections share this dict, so every thread opens the scratch file
+                    connections.close_all()
+                    database.update(NAME=str(Path(scratch) / "bench.sqlite3"), OPTIONS=db_options, CONN_MAX_AGE=0)
+                    call_command("migrate", verbosity=0)
+                    writes, locked, reads, elapsed = self.run_workload(options)
+                    connections.close_all()
+                self.stdout.write(f"{label:<18}{writes / elapsed:>10.0f}{locked:>8}{reads / elapsed:>10.0f}")
+        finally:
+            connections.close_all()
+            database.clear()
+            database.update(original)
+
+    def run_workload(self, options):
+        factory = APIRequestFactory()
+        users = [User.objects.create(username=f"writer-{i}") for i in range(options["threads"])]
+        habits = [Habit.objects.create(user=user, name="Bench") for user in users]
+        counts = {"writes": 0, "locked": 0, "reads": 0}
+        lock = threading.Lock()
+        done = threading.Event()
+
+        def count(key):
+            with lock:
+                counts[key] += 1
+
+        def writer(user, habit):
+            day = now().date()
+            try:
+                for i in range(options["writes"]):
+                    try:
+                        if i % 2:
+                            day += datetime.timedelta(days=1)
+                            habit.completed, habit.completed_at = True, day
+                            habit.save()
+                        else:
+                            request = factory.post(f"/habits/time-spent-log/{habit.pk}/", {"time_spent": 5}, format="json")
+                            force_authenticate(request, user)
+                            LogHabitTimeView.as_view()(request, pk=habit.pk)
+                        count("writes")
+                    except OperationalError:
+                        count("locked")
+            finally:
+                connection.close()
+
+        def reader():
+            # The weekly summary's grouped query, uncached
+            summary = Habit.objects.annotate(days_completed=Count("completions")).values("name", "days_completed")
+            try:
+                while not done.is_set():
+                    try:
+                        list(summary.all())
+                        count("reads")
+                    except OperationalError:
+                        pass
+            finally:
+                connection.close()
+
+        writers = [threading.Thread(target=writer, args=pair) for pair in zip(users, habits)]
+        readers = [threading.Thread(target=reader) for _ in range(options["readers"])]
+        started = time.perf_counter()
+        for thread in writers + readers:
+            thread.start()
+        for thread in writers:
+            thread.join()
+        elapsed = time.perf_counter() - started
+        done.set()
+        for thread in readers:
+            thread.join()
+        return counts["writes"], counts["locked"], counts["reads"], elapsed
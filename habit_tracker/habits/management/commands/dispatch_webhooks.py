@@ -0,0 +1,26 @@
+from asgiref.sync import async_to_sync
+from django.core.management.base import BaseCommand
+
+from habits.webhooks import BATCH_SIZE, REQUEST_TIMEOUT, dispatch
+
+
+class Command(BaseCommand):
+    help = (
+        "Deliver queued habit events (the webhook outbox) to their endpoints. Runs until "
+        "interrupted, or with --once until nothing is due. Several dispatchers can share "
+        "the outbox on PostgreSQL."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--once", action="store_true", help="Exit once no event is due.")
+        parser.add_argument("--batch-size", type=int, default=BATCH_SIZE, help="Events leased per batch.")
+        parser.add_argument("--interval", type=float, default=1.0, help="Seconds between polls of an empty outbox.")
+        parser.add_argument("--timeout", type=float, default=REQUEST_TIMEOUT, help="Seconds per delivery attempt.")
+
+    def handle(self, *args, **options):
+        totals = async_to_sync(dispatch)(
+            once=options["once"], batch_size=options["batch_size"], interval=options["interval"], timeout=options["timeout"],
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f"Delivered {totals['delivered']} event(s); {totals['retried']} will be retried, {totals['failed']} gave up."
+        ))
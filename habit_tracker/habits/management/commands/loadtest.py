@@ -0,0 +1,95 @@
+import asyncio
+import statistics
+import time
+from urllib.parse import urlsplit
+
+from django.core.management.base import BaseCommand, CommandError
+
+# Sync endpoint -> its native async variant (see habits/async_views.py)
+ENDPOINTS = [
+    ("/habits/", "/async/habits/"),
+    ("/habits/streaks/", "/async/habits/streaks/"),
+    ("/progress/weekly-summary/", "/async/progress/weekly-summary/"),
+    ("/habits/progress-calendar/", "/async/habits/progress-calendar/"),
+    ("/habits/daily-reminders/", "/async/habits/daily-reminders/"),
+    ("/motivation/quotes/", "/async/motivation/quotes/"),
+]
+
+
+async def fetch(url, headers, timeout):
+    """ One HTTP/1.1 GET on a fresh connection; returns the status code. """
+    parts = urlsplit(url)
+    reader, writer = await asyncio.wait_for(asyncio.open_connection(parts.hostname, parts.port or 80), timeout)
+    try:
+        path = parts.path + (f"?{parts.query}" if parts.query else "")
+        lines = [f"GET {path} HTTP/1.1", f"Host: {parts.netloc}", "Connection: close"]
+        lines += [f"{name}: {value}" for name, value in headers.items()]
+        writer.write(("\r\n".join(lines) + "\r\n\r\n").encode())
+        await writer.drain()
+        status_line = await asyncio.wait_for(reader.readline(), timeout)
+        await asyncio.wait_for(reader.read(), timeout)  # Drain the body like a real client would
+        return int(status_line.split()[1])
+    finally:
+        writer.close()
+
+
+async def run_load(url, headers, requests, concurrency, timeout):
+    latencies, errors = [], 0
+    remaining = iter(range(requests))
+
+    async def worker():
+        nonlocal errors
+        for _ in remaining:
+            started = time.perf_counter()
+            try:
+                status = await fetch(url, headers, timeout)
+            except (OSError, asyncio.TimeoutError, ValueError, IndexError):
+                status = None
+            if status == 200:
+                latencies.append(time.perf_counter() - started)
+            else:
+                errors += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return latencies, errors, time.perf_counter() - started
+
+
+class Command(BaseCommand):
+    help = (
+        "Load-test the read endpoints under the WSGI server against their async "
+        "variants under the ASGI server, e.g. with `gunicorn habit_tracker.wsgi -b :8000` "
+        "and `uvicorn habit_tracker.asgi:application --port 8001` running."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--wsgi", default="http://127.0.0.1:8000", help="Base URL of the WSGI server.")
+        parser.add_argument("--asgi", default="http://127.0.0.1:8001", help="Base URL of the ASGI server.")
+        parser.add_argument("--token", help="Auth token sent as 'Authorization: Token <key>'.")
+        parser.add_argument("--path", action="append", dest="paths", help="Only test this sync path (repeatable).")
+        parser.add_argument("-n", "--requests", type=int, default=2000, help="Requests per endpoint and server.")
+        parser.add_argument("-c", "--concurrency", type=int, default=200, help="Concurrent clients.")
+        parser.add_argument("--timeout", type=float, default=30.0, help="Seconds before a request counts as failed.")
+
+    def handle(self, *args, **options):
+        endpoints = ENDPOINTS
+        if options["paths"]:
+            endpoints = [pair for pair in ENDPOINTS if pair[0] in options["paths"]]
+            if not endpoints:
+                raise CommandError(f"Unknown path(s); choose from {', '.join(sync for sync, _ in ENDPOINTS)}")
+        headers = {"Authorization": f"Token {options['token']}"} if options["token"] else {}
+
+        self.stdout.write(f"{'endpoint':<34}{'server':<7}{'req/s':>9}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'errors':>8}")
+        for sync_path, async_path in endpoints:
+            for server, url in (("wsgi", options["wsgi"] + sync_path), ("asgi", options["asgi"] + async_path)):
+                latencies, errors, elapsed = asyncio.run(
+                    run_load(url, headers, options["requests"], options["concurrency"], options["timeout"])
+                )
+                self.stdout.write(self.format_row(sync_path, server, latencies, errors, elapsed))
+
+    def format_row(self, path, server, latencies, errors, elapsed):
+        if len(latencies) < 2:
+            return f"{path:<34}{server:<7}{'-':>9}{'-':>9}{'-':>9}{'-':>9}{errors:>8}"
+        cuts = statistics.quantiles(latencies, n=100)
+        p50, p95, p99 = (cuts[i] * 1000 for i in (49, 94, 98))
+        return f"{path:<34}{server:<7}{len(latencies) / elapsed:>9.0f}{p50:>9.1f}{p95:>9.1f}{p99:>9.1f}{errors:>8}"
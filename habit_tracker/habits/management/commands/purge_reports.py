@@ -0,0 +1,15 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from habits.reports import purge_reports
+
+
+class Command(BaseCommand):
+    help = "Delete report PDFs and ReportJob rows older than REPORT_MAX_AGE. Run it daily from cron."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--max-age", type=int, default=settings.REPORT_MAX_AGE, help="Seconds since a file was last written or reused.")
+
+    def handle(self, *args, **options):
+        files, jobs = purge_reports(options["max_age"])
+        self.stdout.write(self.style.SUCCESS(f"Removed {files} report file(s) and {jobs} job(s)."))
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from habits.calendars import rebuild_calendars
+
+
+class Command(BaseCommand):
+    help = "Rebuild HabitCalendarMonth bitmaps from the HabitCompletion history to repair drift."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--habit", type=int, action="append", dest="habits", help="Only rebuild this habit id (repeatable).")
+
+    def handle(self, *args, **options):
+        created = rebuild_calendars(options["habits"])
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt {created} calendar month(s)."))
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from habits.leaderboard import rebuild_rankings
+
+
+class Command(BaseCommand):
+    help = "Rebuild StreakRanking rows from the stored Habit streaks to repair drift."
+
+    def handle(self, *args, **options):
+        created = rebuild_rankings()
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt {created} leaderboard ranking(s)."))
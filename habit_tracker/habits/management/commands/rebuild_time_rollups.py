@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from habits.rollups import rebuild_rollups
+
+
+class Command(BaseCommand):
+    help = "Rebuild HabitTimeRollup rows from the raw HabitTimeLog history to repair drift."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--habit", type=int, action="append", dest="habits", help="Only rebuild this habit id (repeatable).")
+
+    def handle(self, *args, **options):
+        created = rebuild_rollups(options["habits"])
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt {created} rollup row(s)."))
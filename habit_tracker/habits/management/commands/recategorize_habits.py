@@ -0,0 +1,34 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from django.utils.timezone import now
+
+from habits.cache import bump_user_version
+from habits.categories import categorize, categorize_all
+from habits.leaderboard import rebuild_rankings
+from habits.models import Habit
+
+
+class Command(BaseCommand):
+    help = "Recompute Habit.category and Habit.categories from habit names, e.g. after editing habits/data/habit_categories.json."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=1000)
+
+    def handle(self, *args, **options):
+        changed = []
+        habits = Habit.objects.only("id", "user_id", "name", "category", "categories").iterator(chunk_size=options["batch_size"])
+        for habit in habits:
+            category, categories = categorize(habit.name), list(categorize_all(habit.name))
+            if (category, categories) != (habit.category, habit.categories):
+                habit.category, habit.categories = category, categories
+                habit.updated_at = now()  # The category is serialized, so cached responses change too
+                changed.append(habit)
+
+        with transaction.atomic():
+            Habit.objects.bulk_update(changed, ["category", "categories", "updated_at"], batch_size=options["batch_size"])
+            if changed:
+                rebuild_rankings()  # Category leaderboards follow Habit.category
+        for user_id in {habit.user_id for habit in changed}:
+            bump_user_version(user_id)
+        self.stdout.write(self.style.SUCCESS(f"Recategorized {len(changed)} habit(s)."))
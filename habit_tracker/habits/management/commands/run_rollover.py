@@ -0,0 +1,31 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from habits.rollover import run_due_rollovers
+
+
+class Command(BaseCommand):
+    help = (
+        "Roll users over to their new local day: clear yesterday's completions, expire missed "
+        "streaks and precompute reminder digests. Run it from cron every few minutes, or "
+        "keep it running with --loop."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--loop", action="store_true", help="Keep running, checking for due timezones every --interval seconds.")
+        parser.add_argument("--interval", type=int, default=300, help="Seconds between checks with --loop.")
+        parser.add_argument("--workers", type=int, default=settings.ROLLOVER_WORKERS, help="Worker threads; 0 runs inline.")
+        parser.add_argument("--chunk-size", type=int, default=settings.ROLLOVER_CHUNK_SIZE, help="Users per transaction.")
+
+    def handle(self, *args, **options):
+        while True:
+            for result in run_due_rollovers(workers=options["workers"], chunk_size=options["chunk_size"]):
+                self.stdout.write(self.style.SUCCESS(
+                    f"Rolled {result['users']} user(s) in {result['timezone']} over to {result['date']}: "
+                    f"{result['reset']} completion(s) reset, {result['expired']} streak(s) expired."
+                ))
+            if not options["loop"]:
+                return
+            time.sleep(options["interval"])
@@ -0,0 +1,99 @@
+import datetime
+import random
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils.dateparse import parse_date
+from django.utils.timezone import now
+
+from habits.calendars import record_completions
+from habits.categories import categorize, categorize_all
+from habits.leaderboard import rebuild_rankings
+from habits.models import Habit, HabitCompletion, HabitTimeLog, live_streak, streak_state
+from habits.rollups import rebuild_rollups
+
+USERNAME_PREFIX = "bench_user_"
+PASSWORD = "bench-password"
+HABIT_NAMES = [
+    "Read", "Meditate", "Run", "Stretch", "Journal", "Drink water", "Walk", "Practice guitar",
+    "Study Spanish", "Cook dinner", "Sleep by 11", "Plan the day", "Floss", "Call family", "Yoga",
+]
+
+
+def bench_username(index):
+    return f"{USERNAME_PREFIX}{index:05d}"
+
+
+class Command(BaseCommand):
+    help = (
+        "Generate N users x M habits x K days of completions and time logs for benchmarking. "
+        f"Output is deterministic for a given --seed and --end; users are named {USERNAME_PREFIX}00000... "
+        f"with password '{PASSWORD}'."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--users", type=int, default=10)
+        parser.add_argument("--habits", type=int, default=20, help="Habits per user.")
+        parser.add_argument("--days", type=int, default=90, help="Days of history per habit, ending at --end.")
+        parser.add_argument("--completion-rate", type=float, default=0.7, help="Chance a habit is completed on a given day.")
+        parser.add_argument("--end", help="Last day of history (YYYY-MM-DD, default today).")
+        parser.add_argument("--seed", type=int, default=0)
+        parser.add_argument("--clear", action="store_true", help="Delete previously seeded users first.")
+        parser.add_argument("--batch-size", type=int, default=5000)
+
+    def handle(self, *args, **options):
+        end = parse_date(options["end"]) if options["end"] else now().date()
+        if end is None:
+            raise CommandError("--end must be a date (YYYY-MM-DD).")
+        rng = random.Random(options["seed"])
+        days = [end - datetime.timedelta(days=offset) for offset in range(options["days"] - 1, -1, -1)]
+        password = make_password(PASSWORD)  # Hash once; PBKDF2 per user would dominate the run
+        batch_size = options["batch_size"]
+
+        with transaction.atomic():
+            if options["clear"]:
+                User.objects.filter(username__startswith=USERNAME_PREFIX).delete()
+
+            totals = {"completions": 0, "time_logs": 0}
+            for index in range(options["users"]):
+                user = User.objects.create(username=bench_username(index), password=password)
+                habits = Habit.objects.bulk_create([
+                    Habit(
+                        user=user, name=f"{HABIT_NAMES[i % len(HABIT_NAMES)]} #{i}",
+                        category=categorize(HABIT_NAMES[i % len(HABIT_NAMES)]),
+                        categories=list(categorize_all(HABIT_NAMES[i % len(HABIT_NAMES)])), goal=f"{rng.randint(10, 60)} min",
+                    )
+                    for i in range(options["habits"])
+                ], batch_size=batch_size)
+
+                completions, logs = [], []
+                for habit in habits:
+                    completed_days = [day for day in days if rng.random() < options["completion_rate"]]
+                    completions += [HabitCompletion(habit=habit, user=user, date=day) for day in completed_days]
+                    logs += [HabitTimeLog(habit=habit, user=user, date=day, time_spent=rng.randint(5, 90)) for day in completed_days]
+
+                    current, habit.longest_streak, habit.last_completed = streak_state(reversed(completed_days))
+                    habit.streak = live_streak(current, habit.last_completed, end)  # As streaks() reports it on --end
+                    habit.completed = habit.last_completed == end
+                    habit.completed_at = end if habit.completed else None
+                    habit.progress = round(100 * len(completed_days) / len(days)) if days else 0  # Percent of days done
+
+                Habit.objects.bulk_update(
+                    habits, ["streak", "longest_streak", "last_completed", "completed", "completed_at", "progress"],
+                    batch_size=batch_size,
+                )
+                HabitCompletion.objects.bulk_create(completions, batch_size=batch_size)
+                record_completions(completions)
+                HabitTimeLog.objects.bulk_create(logs, batch_size=batch_size)
+                rebuild_rollups([habit.pk for habit in habits])
+                totals["completions"] += len(completions)
+                totals["time_logs"] += len(logs)
+
+            rebuild_rankings()  # bulk_update() skips the signals that keep them current
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Seeded {options['users']} user(s), {options['users'] * options['habits']} habit(s), "
+            f"{totals['completions']} completion(s) and {totals['time_logs']} time log(s)."
+        ))
@@ -0,0 +1,306 @@
+"""
+Per-endpoint request metrics, exported in Prometheus text format at /metrics.
+
+MetricsMiddleware records, per resolved URL name: request latency, ORM query
+count and time (through connection.execute_wrapper), time spent in
+serializers and response bytes. It logs a warning with a stack sample when a
+request runs more queries than its budget, so N+1 regressions show up at once.
+
+The middleware runs natively in either mode. Under ASGI its query wrappers are
+installed from the request's sync thread, where the ORM runs; queries made by
+async views go through that thread too, so they are counted as well.
+
+Metrics are kept per process; with several workers, scrape each one. /metrics
+is served only to a scraper presenting TOKEN, to a client address within
+INTERNAL_NETWORKS or to a staff user, unless PUBLIC is set.
+"""
+import hmac
+import ipaddress
+import logging
+import threading
+import traceback
+from bisect import bisect_left
+from contextlib import ExitStack, contextmanager
+from contextvars import ContextVar
+from time import perf_counter
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.db import connections
+from django.http import HttpResponse, HttpResponseForbidden
+
+logger = logging.getLogger(__name__)
+
+METRICS_SETTINGS = {
+    "QUERY_BUDGET": 30,  # Queries per request before a warning is logged; None disables
+    "QUERY_BUDGETS": {},  # Per URL name overrides, e.g. {"export-time-logs": None}
+    "LATENCY_BUCKETS": (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10),  # Seconds
+    "QUERY_COUNT_BUCKETS": (0, 1, 2, 5, 10, 20, 50, 100),
+    "TOKEN": None,  # If set, scrapers may send "Authorization: Bearer <token>"
+    "INTERNAL_NETWORKS": (),  # Client networks allowed without the token, e.g. ("10.0.0.0/8",)
+    "PUBLIC": False,  # True serves /metrics to anyone
+    **getattr(settings, "REQUEST_METRICS", {}),
+}
+
+current_request_stats = ContextVar("current_request_stats", default=None)
+
+
+class Histogram:
+    """ Cumulative-bucket histogram in the Prometheus sense (le = upper bound). """
+
+    def __init__(self, buckets):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)  # Last slot is +Inf
+        self.sum = 0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def samples(self):
+        """ Yield (le, cumulative count) pairs, ending with +Inf. """
+        total = 0
+        for bound, count in zip(self.buckets + ("+Inf",), self.counts):
+            total += count
+            yield bound, total
+
+
+class EndpointMetrics:
+    def __init__(self):
+        self.responses = {}  # status code -> count
+        self.latency = Histogram(METRICS_SETTINGS["LATENCY_BUCKETS"])
+        self.queries = Histogram(METRICS_SETTINGS["QUERY_COUNT_BUCKETS"])
+        self.query_seconds = 0.0
+        self.serializer_seconds = 0.0
+        self.response_bytes = 0
+
+
+class MetricsRegistry:
+    """ Thread-safe store of EndpointMetrics keyed by (URL name, method). """
+
+    def __init__(self):
+        self._endpoints = {}
+        self._lock = threading.Lock()
+
+    def record(self, view, method, status, seconds, stats, response_bytes):
+        with self._lock:
+            endpoint = self._endpoints.get((view, method))
+            if endpoint is None:
+                endpoint = self._endpoints[(view, method)] = EndpointMetrics()
+            endpoint.responses[status] = endpoint.responses.get(status, 0) + 1
+            endpoint.latency.observe(seconds)
+            endpoint.queries.observe(stats.queries)
+            endpoint.query_seconds += stats.query_seconds
+            endpoint.serializer_seconds += stats.serializer_seconds
+            endpoint.response_bytes += response_bytes
+
+    def clear(self):
+        with self._lock:
+            self._endpoints.clear()
+
+    def render(self):
+        """ The Prometheus text exposition format (version 0.0.4). """
+        with self._lock:
+            endpoints = sorted(self._endpoints.items())
+            lines = []
+
+            def family(name, kind, help_text):
+                lines.append(f"# HELP habit_tracker_{name} {help_text}")
+                lines.append(f"# TYPE habit_tracker_{name} {kind}")
+
+            def histogram(name, key, histogram):
+                for bound, total in histogram.samples():
+                    lines.append(f'habit_tracker_{name}_bucket{{{key},le="{bound}"}} {total}')
+                lines.append(f"habit_tracker_{name}_sum{{{key}}} {histogram.sum}")
+                lines.append(f"habit_tracker_{name}_count{{{key}}} {histogram.count}")
+
+            labels = [(f'view="{view}",method="{method}"', endpoint) for (view, method), endpoint in endpoints]
+
+            family("requests_total", "counter", "Requests served, by endpoint and status.")
+            for key, endpoint in labels:
+                for status, count in sorted(endpoint.responses.items()):
+                    lines.append(f'habit_tracker_requests_total{{{key},status="{status}"}} {count}')
+            family("request_duration_seconds", "histogram", "Time to the end of the response body.")
+            for key, endpoint in labels:
+                histogram("request_duration_seconds", key, endpoint.latency)
+            family("db_queries_per_request", "histogram", "ORM queries issued per request.")
+            for key, endpoint in labels:
+                histogram("db_queries_per_request", key, endpoint.queries)
+            for name, attr, help_text in [
+                ("db_query_duration_seconds_total", "query_seconds", "Time spent executing ORM queries."),
+                ("serializer_duration_seconds_total", "serializer_seconds", "Time spent in serializer to_representation()."),
+                ("response_bytes_total", "response_bytes", "Response body bytes sent."),
+            ]:
+                family(name, "counter", help_text)
+                for key, endpoint in labels:
+                    lines.append(f"habit_tracker_{name}{{{key}}} {getattr(endpoint, attr)}")
+        return "\n".join(lines) + "\n"
+
+
+registry = MetricsRegistry()
+
+
+def stack_sample(limit=10):
+    """ The innermost project frames of the current stack (skipping Django/DRF internals). """
+    base = str(settings.BASE_DIR)
+    frames = [
+        frame for frame in traceback.extract_stack()
+        if frame.filename.startswith(base) and frame.filename != __file__
+    ]
+    return "".join(traceback.format_list(frames[-limit:]))
+
+
+class RequestStats:
+    """ Counters for the request being served; see current_request_stats. """
+
+    def __init__(self):
+        self.queries = 0
+        self.query_seconds = 0.0
+        self.serializer_seconds = 0.0
+        self.serializing = False
+        self.budget = None
+        self.over_budget_stack = None
+
+    def execute_wrapper(self, execute, sql, params, many, context):
+        started = perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.query_seconds += perf_counter() - started
+            self.queries += 1
+            if self.budget is not None and self.queries == self.budget + 1:
+                self.over_budget_stack = stack_sample()
+
+
+@contextmanager
+def serializer_timer():
+    """ Count the enclosed time as serializer time for the current request (outermost call only). """
+    stats = current_request_stats.get()
+    if stats is None or stats.serializing:
+        yield
+        return
+    stats.serializing = True
+    started = perf_counter()
+    try:
+        yield
+    finally:
+        stats.serializer_seconds += perf_counter() - started
+        stats.serializing = False
+
+
+class MetricsMiddleware:
+    """ Records each request in `registry`; list it first in MIDDLEWARE so latency covers the whole stack. """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        stats = RequestStats()
+        token = current_request_stats.set(stats)
+        started = perf_counter()
+        try:
+            with self.track_queries(stats):
+                response = self.get_response(request)
+        finally:
+            current_request_stats.reset(token)
+        return self.observe(request, response, stats, started)
+
+    async def __acall__(self, request):
+        stats = RequestStats()
+        token = current_request_stats.set(stats)
+        started = perf_counter()
+        # Connections belong to the request's sync thread, so the wrappers go on there
+        queries = await sync_to_async(self.track_queries)(stats)
+        try:
+            response = await self.get_response(request)
+        finally:
+            await sync_to_async(queries.close)()
+            current_request_stats.reset(token)
+        return self.observe(request, response, stats, started)
+
+    def observe(self, request, response, stats, started):
+        """ Record `response` now, or once its streaming body has been sent. """
+        if not response.streaming:
+            self.finish(request, response, stats, started, len(response.content))
+        elif response.is_async:
+            response.streaming_content = self.astream(request, response, response.streaming_content, stats, started)
+        else:
+            # Streaming bodies run their queries while the server iterates them
+            response.streaming_content = self.stream(request, response, response.streaming_content, stats, started)
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        stats = current_request_stats.get()
+        if stats is not None:
+            budgets = METRICS_SETTINGS["QUERY_BUDGETS"]
+            name = request.resolver_match.url_name
+            stats.budget = budgets[name] if name in budgets else METRICS_SETTINGS["QUERY_BUDGET"]
+
+    def track_queries(self, stats):
+        stack = ExitStack()
+        for connection in connections.all():
+            stack.enter_context(connection.execute_wrapper(stats.execute_wrapper))
+        return stack
+
+    def stream(self, request, response, content, stats, started):
+        size = 0
+        try:
+            with self.track_queries(stats):
+                for chunk in content:
+                    size += len(chunk)
+                    yield chunk
+        finally:
+            self.finish(request, response, stats, started, size)
+
+    async def astream(self, request, response, content, stats, started):
+        size = 0
+        try:
+            async for chunk in content:
+                size += len(chunk)
+                yield chunk
+        finally:
+            self.finish(request, response, stats, started, size)
+
+    def finish(self, request, response, stats, started, size):
+        match = getattr(request, "resolver_match", None)
+        view = (match.url_name or match.route) if match else "<unresolved>"
+        if view == "metrics":
+            return
+        registry.record(view, request.method, response.status_code, perf_counter() - started, stats, size)
+        if stats.over_budget_stack:
+            logger.warning(
+                "%s %s (%s) ran %d queries, over its budget of %d. Stack at the first query over budget:\n%s",
+                request.method, request.path, view, stats.queries, stats.budget, stats.over_budget_stack,
+            )
+
+
+def may_scrape(request):
+    """ Whether `request` may read /metrics (see PUBLIC, TOKEN and INTERNAL_NETWORKS). """
+    if METRICS_SETTINGS["PUBLIC"]:
+        return True
+    token = METRICS_SETTINGS["TOKEN"]
+    if token and hmac.compare_digest(request.headers.get("Authorization", "").encode(), f"Bearer {token}".encode()):
+        return True
+    try:
+        address = ipaddress.ip_address(request.META.get("REMOTE_ADDR", ""))
+    except ValueError:
+        address = None
+    if address and any(address in ipaddress.ip_network(network) for network in METRICS_SETTINGS["INTERNAL_NETWORKS"]):
+        return True
+    user = getattr(request, "user", None)
+    return bool(user and user.is_staff)
+
+
+def metrics_view(request):
+    """ Prometheus scrape endpoint. """
+    if not may_scrape(request):
+        return HttpResponseForbidden()
+    return HttpResponse(registry.render(), content_type="text/plain; version=0.0.4; charset=utf-8")
@@ -0,0 +1,35 @@
+# Generated by Django 5.2.18 on 2026-10-18 08:39
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('habits', '0007_habit_last_completed_habit_longest_streak_and_more'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='habit',
+            index=models.Index(fields=['user', 'completed', 'completed_at'], name='habit_user_completed_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='habit',
+            index=models.Index(fields=['user', 'completed_at'], name='habit_user_completed_at_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='habit',
+            index=models.Index(fields=['user', 'created_at'], name='habit_user_created_at_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='habit',
+            index=models.Index(fields=['user', 'name', 'last_completed'], name='habit_user_name_last_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='habittimelog',
+            index=models.Index(fields=['habit', 'date', 'time_spent'], name='timelog_habit_date_idx'),
+        ),
+    ]
@@ -0,0 +1,55 @@
+# Generated by Django 5.2.18 on 2026-10-18 08:46
+
+import datetime
+from collections import defaultdict
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def build_rollups(apps, schema_editor):
+    """ Seed rollups from the existing logs (later repairs: manage.py rebuild_time_rollups). """
+    HabitTimeLog = apps.get_model('habits', 'HabitTimeLog')
+    HabitTimeRollup = apps.get_model('habits', 'HabitTimeRollup')
+
+    buckets = defaultdict(lambda: [0, 0])
+    for habit_id, day, minutes in HabitTimeLog.objects.values_list('habit_id', 'date', 'time_spent').iterator():
+        starts = {
+            'day': day,
+            'week': day - datetime.timedelta(days=day.weekday()),
+            'month': day.replace(day=1),
+            'total': datetime.date(1970, 1, 1),
+        }
+        for period, start in starts.items():
+            buckets[(habit_id, period, start)][0] += minutes
+            buckets[(habit_id, period, start)][1] += 1
+
+    HabitTimeRollup.objects.bulk_create([
+        HabitTimeRollup(habit_id=habit_id, period=period, period_start=start, total_minutes=minutes, log_count=count)
+        for (habit_id, period, start), (minutes, count) in buckets.items()
+    ], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('habits', '0009_reportjob'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='HabitTimeRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('period', models.CharField(choices=[('day', 'Day'), ('week', 'Week'), ('month', 'Month'), ('total', 'Total')], max_length=5)),
+                ('period_start', models.DateField()),
+                ('total_minutes', models.PositiveBigIntegerField(default=0)),
+                ('log_count', models.PositiveIntegerField(default=0)),
+                ('habit', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='time_rollups', to='habits.habit')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('habit', 'period', 'period_start'), name='unique_habit_time_rollup')],
+            },
+        ),
+        migrations.RunPython(build_rollups, migrations.RunPython.noop),
+    ]
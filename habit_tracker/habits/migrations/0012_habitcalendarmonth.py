@@ -0,0 +1,44 @@
+# Generated by Django 5.2.18 on 2026-10-18 09:06
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def build_calendars(apps, schema_editor):
+    """ Seed the bitmaps from the completion history (later repairs: manage.py rebuild_calendars). """
+    HabitCompletion = apps.get_model('habits', 'HabitCompletion')
+    HabitCalendarMonth = apps.get_model('habits', 'HabitCalendarMonth')
+
+    bitmaps = {}
+    for habit_id, user_id, day in HabitCompletion.objects.values_list('habit_id', 'habit__user_id', 'date').iterator():
+        month = day.replace(day=1)
+        bitmap = bitmaps.setdefault((habit_id, month), HabitCalendarMonth(habit_id=habit_id, user_id=user_id, month=month))
+        bitmap.days |= 1 << (day.day - 1)
+
+    HabitCalendarMonth.objects.bulk_create(bitmaps.values(), batch_size=500)
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('habits', '0011_habit_updated_at_habit_habit_user_updated_at_idx'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='HabitCalendarMonth',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('month', models.DateField()),
+                ('days', models.PositiveIntegerField(default=0)),
+                ('habit', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='calendar_months', to='habits.habit')),
+                ('user', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['user', 'month'], name='calendar_user_month_idx')],
+                'constraints': [models.UniqueConstraint(fields=('habit', 'month'), name='unique_habit_calendar_month')],
+            },
+        ),
+        migrations.RunPython(build_calendars, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,71 @@
+# Generated by Django 5.2.18 on 2026-10-18 09:09
+
+import re
+
+from django.conf import settings
+from django.db import migrations, models
+
+# Frozen copy of habits/data/habit_categories.json's keywords at the time of this
+# migration, so it categorizes the same way whatever the live file becomes
+# (later changes: manage.py recategorize_habits). First category listing a keyword wins.
+CATEGORY_KEYWORDS = {
+    'Sleep & Relaxation': ['sleep', 'bedtime', 'relaxation', 'rest'],
+    'Fitness & Exercise': [
+        'exercise', 'workout', 'run', 'running', 'yoga', 'cardio', 'strength training', 'training', 'gym', 'jog',
+        'jogging', 'lifting',
+    ],
+    'Mental Wellness': [
+        'meditation', 'meditate', 'mindfulness', 'journaling', 'journal', 'gratitude', 'reflection', 'reflect',
+        'breathe', 'relax', 'calm',
+    ],
+    'Social & Relationships': ['socializing', 'friends', 'family', 'networking', 'community'],
+    'Health & Hydration': ['hydration', 'water', 'drink', 'fluid', 'fluids', 'caffeine', 'diet', 'nutrition', 'meal'],
+    'Learning & Productivity': [
+        'read', 'reading', 'books', 'literature', 'novel', 'study', 'learn', 'write', 'writing', 'skill-building',
+    ],
+}
+
+
+def categorize(name, keyword_category, pattern):
+    match = pattern.search(' '.join(name.lower().split()))
+    return keyword_category[match.group()] if match else ''
+
+
+def categorize_habits(apps, schema_editor):
+    """ Seed categories from CATEGORY_KEYWORDS, matching like habits.categories.categorize() did. """
+    keyword_category = {
+        keyword: category
+        for category, keywords in reversed(CATEGORY_KEYWORDS.items())
+        for keyword in keywords
+    }
+    # Longest first, so "strength training" matches before "training"
+    pattern = re.compile(
+        r'\b(?:%s)\b' % '|'.join(re.escape(keyword) for keyword in sorted(keyword_category, key=len, reverse=True))
+    )
+    Habit = apps.get_model('habits', 'Habit')
+    habits = []
+    for habit in Habit.objects.only('id', 'name').iterator():
+        habit.category = categorize(habit.name, keyword_category, pattern)
+        if habit.category:
+            habits.append(habit)
+    Habit.objects.bulk_update(habits, ['category'], batch_size=500)
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('habits', '0012_habitcalendarmonth'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='habit',
+            name='category',
+            field=models.CharField(blank=True, default='', editable=False, max_length=50),
+        ),
+        migrations.AddIndex(
+            model_name='habit',
+            index=models.Index(fields=['user', 'category'], name='habit_user_category_idx'),
+        ),
+        migrations.RunPython(categorize_habits, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,49 @@
+# Generated by Django 5.2.18 on 2026-10-18 09:15
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Max
+
+
+def build_rankings(apps, schema_editor):
+    """ Seed the rankings from the stored streaks (later repairs: manage.py rebuild_leaderboards). """
+    Habit = apps.get_model('habits', 'Habit')
+    StreakRanking = apps.get_model('habits', 'StreakRanking')
+
+    best = {}
+    grouped = Habit.objects.filter(user__isnull=False, streak__gt=0).values('user_id', 'category').annotate(best=Max('streak')).order_by()
+    for row in grouped.iterator():
+        boards = best.setdefault(row['user_id'], {})
+        if row['category']:
+            boards[row['category']] = row['best']
+        boards[''] = max(boards.get('', 0), row['best'])
+
+    StreakRanking.objects.bulk_create([
+        StreakRanking(user_id=user_id, board=board, streak=streak)
+        for user_id, boards in best.items() for board, streak in boards.items()
+    ], batch_size=1000)
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('habits', '0013_habit_category'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StreakRanking',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('board', models.CharField(blank=True, max_length=50)),
+                ('streak', models.PositiveIntegerField()),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='streak_rankings', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['board', '-streak'], name='ranking_board_streak_idx')],
+                'constraints': [models.UniqueConstraint(fields=('user', 'board'), name='unique_streak_ranking')],
+            },
+        ),
+        migrations.RunPython(build_rankings, migrations.RunPython.noop),
+    ]
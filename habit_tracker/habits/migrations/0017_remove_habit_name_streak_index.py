@@ -0,0 +1,17 @@
+# Generated by Django 5.2.18 on 2026-10-18 10:32
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('habits', '0016_webhook_outbox'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='habit',
+            name='habit_user_name_last_idx',
+        ),
+    ]
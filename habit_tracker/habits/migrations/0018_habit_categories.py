@@ -0,0 +1,51 @@
+# Generated by Django 5.2.18 on 2026-10-18 10:52
+
+import re
+from importlib import import_module
+
+from django.db import migrations, models
+
+# The keywords frozen by 0013, so this migration matches the same way whatever the live
+# data file becomes (later changes: manage.py recategorize_habits)
+CATEGORY_KEYWORDS = import_module('habits.migrations.0013_habit_category').CATEGORY_KEYWORDS
+
+
+def categorize_all_habits(apps, schema_editor):
+    """ Seed Habit.categories, matching like habits.categories.categorize_all() did. """
+    keyword_categories = {}
+    for category, keywords in CATEGORY_KEYWORDS.items():
+        for keyword in keywords:
+            keyword_categories.setdefault(keyword, []).append(category)
+    order = {category: index for index, category in enumerate(CATEGORY_KEYWORDS)}
+    # Longest first, so "strength training" matches before "training"
+    pattern = re.compile(
+        r'\b(?:%s)\b' % '|'.join(re.escape(keyword) for keyword in sorted(keyword_categories, key=len, reverse=True))
+    )
+    Habit = apps.get_model('habits', 'Habit')
+    habits = []
+    for habit in Habit.objects.only('id', 'name').iterator():
+        found = {
+            category
+            for match in pattern.finditer(' '.join(habit.name.lower().split()))
+            for category in keyword_categories[match.group()]
+        }
+        if found:
+            habit.categories = sorted(found, key=order.get)
+            habits.append(habit)
+    Habit.objects.bulk_update(habits, ['categories'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('habits', '0017_remove_habit_name_streak_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='habit',
+            name='categories',
+            field=models.JSONField(blank=True, default=list, editable=False),
+        ),
+        migrations.RunPython(categorize_all_habits, migrations.RunPython.noop),
+    ]
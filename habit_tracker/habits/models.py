@@ -1,7 +1,141 @@
+import datetime
+import secrets
+import uuid
+
+from asgiref.sync import sync_to_async
 from django.contrib.auth.models import User
-from django.db import models
+from django.db import connections, models, transaction
 from django.utils.timezone import now
 
+from .categories import categorize, categorize_all
+
+# Medal tiers based on streak, lowest first (milestone rewards and webhook events)
+MEDALS = [
+    (10, "🥉 Bronze Medal"),
+    (20, "🥈 Silver Medal"),
+    (30, "🥇 Gold Medal"),
+    (50, "🏆 Platinum Trophy"),
+]
+MEDAL_STREAKS = [days for days, _ in MEDALS]
+
+
+def streak_state(dates):
+    """
+    Return (current_streak, longest_streak, last_completed) for an iterable of
+    completion dates sorted newest first. Duplicate dates are ignored.
+    """
+    current = longest = run = 0
+    last = previous = None
+    in_current = True
+    for date in dates:
+        if previous == date:
+            continue
+        if previous is not None and (previous - date).days == 1:
+            run += 1
+        else:
+            if previous is not None:
+                in_current = False  # Streak is broken
+            run = 1
+        if in_current:
+            current = run
+        if last is None:
+            last = date
+        longest = max(longest, run)
+        previous = date
+    return current, longest, last
+
+
+def live_streak(current, last_completed, today):
+    """ `current` while its run reaches `today` or the day before; 0 once a day has been missed. """
+    return current if last_completed is not None and (today - last_completed).days <= 1 else 0
+
+# Day number of a date column, per backend; consecutive days differ by exactly 1
+DAY_NUMBER_SQL = {
+    "sqlite": "CAST(julianday({column}) AS INTEGER)",
+    "postgresql": "({column} - DATE '1970-01-01')",
+}
+
+STREAKS_SQL = """
+WITH days AS (
+    SELECT c.habit_id, h.user_id, c.date
+    FROM {completion_table} c
+    JOIN {habit_table} h ON h.id = c.habit_id
+    WHERE c.habit_id IN ({habits_sql})
+),
+islands AS (
+    SELECT habit_id, user_id, date,
+           {day_number} - ROW_NUMBER() OVER (PARTITION BY habit_id ORDER BY date) AS island
+    FROM days
+),
+runs AS (
+    SELECT habit_id, user_id, COUNT(*) AS length, MAX(date) AS last_date
+    FROM islands
+    GROUP BY habit_id, user_id, island
+),
+ranked AS (
+    SELECT habit_id, user_id, length, last_date,
+           MAX(length) OVER (PARTITION BY habit_id) AS longest,
+           ROW_NUMBER() OVER (PARTITION BY habit_id ORDER BY last_date DESC) AS recency
+    FROM runs
+)
+SELECT habit_id, user_id, length, longest, last_date FROM ranked WHERE recency = 1
+"""
+
+class HabitQuerySet(models.QuerySet):
+    def streaks(self):
+        """
+        Compute streaks for every habit in this queryset in one query.
+
+        Each habit's own completion days count, as in calculate_streak() and
+        the stored Habit.streak; day number minus ROW_NUMBER() is constant
+        across a run of consecutive days (gaps-and-islands), so each island is
+        one streak. The latest run is current only while it reaches today or
+        yesterday in the user's timezone (see live_streak()). Returns
+        {habit_id: (current_streak, longest_streak)}.
+        """
+        from .timezones import user_today  # habits.timezones imports this module
+        connection = connections[self.db]
+        habits_sql, params = self.order_by().values("id").query.sql_with_params()
+        sql = STREAKS_SQL.format(
+            completion_table=HabitCompletion._meta.db_table,
+            habit_table=Habit._meta.db_table,
+            habits_sql=habits_sql,
+            day_number=DAY_NUMBER_SQL[connection.vendor].format(column="date"),
+        )
+        with connection.cursor() as cursor:
+            cursor.execute(sql, params)
+            rows = cursor.fetchall()
+        streaks = {}
+        for habit_id, user_id, length, longest, last_date in rows:
+            last_date = datetime.date.fromisoformat(str(last_date))  # SQLite returns text
+            streaks[habit_id] = (live_streak(length, last_date, user_today(user_id)), longest)
+        return streaks
+
+    def completion_counts(self, since):
+        """ Annotate `days_completed`: distinct completion days on or after `since`, in one grouped query. """
+        return self.annotate(days_completed=models.Count("completions", filter=models.Q(completions__date__gte=since)))
+
+    def with_streaks(self):
+        """ Evaluate the queryset, setting `current_streak` on each habit from streaks(). """
+        habits = list(self)
+        if habits:
+            streaks = self.streaks()
+            for habit in habits:
+                habit.current_streak = streaks.get(habit.pk, (0, 0))[0]
+        return habits
+
+    async def astreaks(self):
+        # Raw cursors have no async API; run the one query in the ORM's thread like QuerySet.aget() does
+        return await sync_to_async(self.streaks)()
+
+    async def awith_streaks(self):
+        habits = [habit async for habit in self]
+        if habits:
+            streaks = await self.astreaks()
+            for habit in habits:
+                habit.current_streak = streaks.get(habit.pk, (0, 0))[0]
+        return habits
+
 class Habit(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE, null=True, blank=True)  # User is optional
     name = models.CharField(max_length=255)
@@ -9,60 +143,345 @@ class Habit(models.Model):
     completed = models.BooleanField(default=False)
     completed_at = models.DateField(blank=True, null=True)  # Last completed date
     created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)  # Bulk writes must set this themselves
     goal = models.CharField(max_length=255, blank=True, null=True)  # Habit goal
     progress = models.IntegerField(default=0)  # Progress tracking
-    streak = models.IntegerField(default=0)
+    streak = models.IntegerField(default=0)  # Current streak
+    longest_streak = models.IntegerField(default=0)
+    last_completed = models.DateField(blank=True, null=True)  # Most recent day in the completion history
+    category = models.CharField(max_length=50, blank=True, default="", editable=False)  # Derived from name, see habits.categories
+    categories = models.JSONField(default=list, blank=True, editable=False)  # Every category the name matches
+
+    objects = HabitQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            # Views filter a user's habits by completion state/date or creation date
+            models.Index(fields=["user", "completed", "completed_at"], name="habit_user_completed_idx"),
+            models.Index(fields=["user", "completed_at"], name="habit_user_completed_at_idx"),
+            models.Index(fields=["user", "created_at"], name="habit_user_created_at_idx"),
+            # Conditional GET validators: max(updated_at) and count per user
+            models.Index(fields=["user", "updated_at"], name="habit_user_updated_at_idx"),
+            # Leaderboards group a user's habits by category
+            models.Index(fields=["user", "category"], name="habit_user_category_idx"),
+        ]
+
+    # Field values as last read or written, compared by the *_changed() checks below
+    TRACKED_FIELDS = ("name", "completed", "completed_at", "streak", "category", "goal")
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        habit = super().from_db(db, field_names, values)
+        habit._saved = {field: habit.__dict__.get(field) for field in cls.TRACKED_FIELDS}
+        return habit
+
+    def saved_value(self, field, default=None):
+        """ The field's value in the database row, or `default` for an unsaved habit. """
+        return getattr(self, "_saved", {}).get(field, default)
+
+    def ranking_changed(self):
+        """ Whether a change to streak or category since loading affects the leaderboards. """
+        saved = (self.saved_value("streak", 0), self.saved_value("category", self.category))  # New rows start without a streak
+        return saved != (self.streak, self.category) and (saved[0] != 0 or self.streak != 0)
+
+    def reminder_changed(self):
+        """ Whether a change since loading affects the user's ReminderDigest. """
+        return not hasattr(self, "_saved") or (self.saved_value("name"), self.saved_value("completed")) != (self.name, self.completed)
 
     def save(self, *args, **kwargs):
         """ Automatically update completed_at and streak when completed is set to True. """
+        self.category = categorize(self.name)
+        self.categories = list(categorize_all(self.name))
+        new_completion = withdrawn = None
         if self.completed:
             if not self.completed_at:  # Set completed_at only if it's not already set
-                self.completed_at = now().date()
-            self.streak = self.calculate_streak()  # Recalculate streak when habit is completed
+                from .timezones import user_today  # habits.timezones imports this module
+                self.completed_at = user_today(self.user_id)  # The user's local day, like the rollover
+            if self.completed_at != self.last_completed:
+                new_completion = self.completed_at
+            self.apply_completion(self.completed_at)
         else:
             self.completed_at = None  # Reset completed_at if marked incomplete
-            self.streak = 0  # Reset streak
-        
-        super().save(*args, **kwargs)
+            if self.saved_value("completed") and self.saved_value("completed_at"):
+                # Unmarked by the user; the daily rollover (habits.rollover) clears `completed` without this
+                withdrawn = HabitCompletion(habit=self, user=self.user, date=self.saved_value("completed_at"))
 
-    def calculate_streak(self):
+        from .cache import bump_user_version  # These modules import this one
+        from .calendars import forget_completions, record_completions
+        from .webhooks import enqueue_events, habit_events
+        with transaction.atomic():  # Webhook events are queued only if the change commits
+            if withdrawn:
+                # Take the day out of the history, so streaks(), the calendar and rewards forget it too
+                HabitCompletion.objects.filter(habit=self, date=withdrawn.date).delete()
+                forget_completions([withdrawn])
+                self.refresh_streak()
+                bump_user_version(self.user_id)
+            super().save(*args, **kwargs)
+
+            if new_completion:
+                # Append-only history: one row per (habit, day), never rewritten
+                completion = HabitCompletion(habit=self, user=self.user, date=new_completion)
+                HabitCompletion.objects.bulk_create([completion], ignore_conflicts=True)
+                record_completions([completion])
+            enqueue_events(self.user_id, habit_events(self, new_completion))
+        self._saved = {field: getattr(self, field) for field in self.TRACKED_FIELDS}  # After the post_save receivers
+
+    def apply_completion(self, date):
         """
-        Calculate the streak of consecutive days this habit was completed.
+        Fold a completion on `date` into the stored streak counters in O(1),
+        whatever the length of the history. Only this habit's own completions
+        count, as in streaks() and calculate_streak().
         """
-        habit_entries = Habit.objects.filter(
-            user=self.user, name=self.name, completed=True
-        ).order_by("-completed_at")
+        if self.last_completed is not None and date <= self.last_completed:
+            if date == self.last_completed and not self.streak:
+                self.streak = 1  # Re-marked after a reset
+            return  # Already counted, or a back-filled day that can't extend the streak
 
-        if not habit_entries:
-            return 0  # No completed habits
+        if self.last_completed is not None and (date - self.last_completed).days == 1:
+            self.streak += 1
+        else:
+            self.streak = 1  # Streak is broken (or first completion)
 
-        streak = 1  # Start at 1 (counting today)
-        previous_date = habit_entries[0].completed_at  # Most recent completion date
+        self.last_completed = date
+        self.longest_streak = max(self.longest_streak, self.streak)
 
-        for habit in habit_entries[1:]:
-            if (previous_date - habit.completed_at).days == 1:
-                streak += 1
-                previous_date = habit.completed_at
-            else:
-                break  # Streak is broken
+    def refresh_streak(self):
+        """ Recompute the stored streak counters from the completion history, as calculate_streak() does. """
+        from .timezones import user_today  # habits.timezones imports this module
+        dates = HabitCompletion.objects.filter(habit=self).order_by("-date").values_list("date", flat=True)
+        current, self.longest_streak, self.last_completed = streak_state(dates.iterator())
+        self.streak = live_streak(current, self.last_completed, user_today(self.user_id))
 
-        return streak
+    def calculate_streak(self):
+        """
+        Calculate the streak of consecutive days this habit was completed,
+        walking the completion history; the same definition as streaks(). Kept
+        for verification/repair; save() maintains `streak` incrementally instead.
+        """
+        from .timezones import user_today  # habits.timezones imports this module
+        dates = HabitCompletion.objects.filter(habit=self).order_by("-date").values_list("date", flat=True)
+        current, _, last = streak_state(dates.iterator())
+        return live_streak(current, last, user_today(self.user_id))
 
     def __str__(self):
         return f"{self.name} - {'Completed' if self.completed else 'Pending'}"
 
+class HabitCompletion(models.Model):
+    """ One row per day a habit was completed. """
+    habit = models.ForeignKey(Habit, on_delete=models.CASCADE, related_name="completions")
+    user = models.ForeignKey(User, on_delete=models.CASCADE, null=True, blank=True)
+    date = models.DateField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["habit", "date"], name="unique_habit_completion_per_day"),
+        ]
+
+    def __str__(self):
+        return f"{self.habit.name} - completed on {self.date}"
+
+class HabitCalendarMonth(models.Model):
+    """
+    Completion days of one habit in one month as a bitmap (bit d - 1 set when
+    completed on day d), kept current by habits.calendars so the progress
+    calendar reads one row per habit-month instead of the completion history.
+    """
+    habit = models.ForeignKey(Habit, on_delete=models.CASCADE, related_name="calendar_months")
+    user = models.ForeignKey(User, on_delete=models.CASCADE, null=True, blank=True)
+    month = models.DateField()  # First day of the month
+    days = models.PositiveIntegerField(default=0)  # 31 bits, fits a signed 32-bit integer
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["habit", "month"], name="unique_habit_calendar_month"),
+        ]
+        indexes = [
+            # A user's month or range of months, in one index range scan
+            models.Index(fields=["user", "month"], name="calendar_user_month_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.habit.name} - {bin(self.days).count('1')} day(s) in {self.month:%Y-%m}"
+
 class HabitTimeLog(models.Model):
     habit = models.ForeignKey(Habit, on_delete=models.CASCADE)
     user = models.ForeignKey(User, on_delete=models.CASCADE, null=True, blank=True)
     date = models.DateField(default=now)
     time_spent = models.PositiveIntegerField(help_text="Time spent in minutes")
 
+    class Meta:
+        indexes = [
+            # Covers per-habit totals and date ranges without touching the table
+            models.Index(fields=["habit", "date", "time_spent"], name="timelog_habit_date_idx"),
+        ]
+
+    def save(self, *args, **kwargs):
+        """ Save, queueing a webhook event for a new log in the same transaction. """
+        adding = self._state.adding
+        from .webhooks import enqueue_events, time_log_event  # habits.webhooks imports this module
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            if adding:
+                enqueue_events(self.user_id or self.habit.user_id, [time_log_event(self)])
+
     def __str__(self):
         return f"{self.habit.name} - {self.time_spent} min on {self.date}"
     
+class HabitTimeRollup(models.Model):
+    """
+    Running totals of HabitTimeLog minutes per habit and period, kept current
+    by habits.rollups so reads never scan the raw logs.
+    """
+    DAY = "day"
+    WEEK = "week"  # period_start is the Monday
+    MONTH = "month"  # period_start is the 1st
+    TOTAL = "total"  # One row per habit, period_start is TOTAL_START
+    PERIOD_CHOICES = [(DAY, "Day"), (WEEK, "Week"), (MONTH, "Month"), (TOTAL, "Total")]
+    TOTAL_START = datetime.date(1970, 1, 1)
+
+    habit = models.ForeignKey(Habit, on_delete=models.CASCADE, related_name="time_rollups")
+    period = models.CharField(max_length=5, choices=PERIOD_CHOICES)
+    period_start = models.DateField()
+    total_minutes = models.PositiveBigIntegerField(default=0)
+    log_count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["habit", "period", "period_start"], name="unique_habit_time_rollup"),
+        ]
+
+    def __str__(self):
+        return f"{self.habit.name} - {self.total_minutes} min ({self.period} of {self.period_start})"
+
+class StreakRanking(models.Model):
+    """
+    A user's best stored streak on one leaderboard: a habit category, or
+    OVERALL for all of their habits. Kept current by habits.leaderboard; users
+    without a streak on a board have no row.
+    """
+    OVERALL = ""
+
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name="streak_rankings")
+    board = models.CharField(max_length=50, blank=True)  # Habit.category, or OVERALL
+    streak = models.PositiveIntegerField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["user", "board"], name="unique_streak_ranking"),
+        ]
+        indexes = [
+            # Top streaks per board, and the per-board score counts the rank index loads
+            models.Index(fields=["board", "-streak"], name="ranking_board_streak_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.user} - {self.streak}-day streak on {self.board or 'overall'}"
+
+class ReportJob(models.Model):
+    """ A PDF report build queued by GenerateHabitReportView and run by habits.reports. """
+    PENDING = "pending"
+    RUNNING = "running"
+    DONE = "done"
+    FAILED = "failed"
+    STATUS_CHOICES = [(PENDING, "Pending"), (RUNNING, "Running"), (DONE, "Done"), (FAILED, "Failed")]
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    user = models.ForeignKey(User, on_delete=models.CASCADE)
+    report_type = models.CharField(max_length=10)
+    report_date = models.DateField()
+    cache_key = models.CharField(max_length=64)  # Content address of the rendered file
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=PENDING)
+    error = models.TextField(blank=True, null=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    finished_at = models.DateTimeField(blank=True, null=True)
+
+    def __str__(self):
+        return f"{self.report_type} report for {self.user} - {self.status}"
+
 class UserProfile(models.Model):
+    DEFAULT_TIMEZONE = "UTC"  # Also the day of users without a profile
+
     user = models.OneToOneField(User, on_delete=models.CASCADE, related_name="profile")
     bio = models.TextField(blank=True, null=True)
+    timezone = models.CharField(max_length=64, default=DEFAULT_TIMEZONE)  # IANA name; the user's day starts at local midnight
+
+    class Meta:
+        indexes = [
+            # The daily rollover walks the users of one timezone at a time
+            models.Index(fields=["timezone", "user"], name="profile_timezone_user_idx"),
+        ]
+
+    def __str__(self):
+        return self.user.username
+
+class ReminderDigest(models.Model):
+    """
+    A user's daily reminders, precomputed by the daily rollover (habits.rollover)
+    and rebuilt on the next read after a habit change, so DailyReminderView
+    reads one row instead of the user's habits.
+    """
+    user = models.OneToOneField(User, on_delete=models.CASCADE, primary_key=True, related_name="reminder_digest")
+    date = models.DateField()  # The user's local day the digest was built for
+    timezone = models.CharField(max_length=64)  # UserProfile.timezone at build time
+    reminders = models.JSONField(default=list)  # [{"habit", "message"}, ...] in habit id order
+    built_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.user} - {len(self.reminders)} reminder(s) for {self.date}"
+
+class DailyRollover(models.Model):
+    """ The last local day rolled over for the users of one timezone. """
+    timezone = models.CharField(max_length=64, unique=True)
+    date = models.DateField()
+    finished_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.timezone} - rolled over to {self.date}"
+
+class WebhookEndpoint(models.Model):
+    """ A URL that receives a user's habit events by POST (see habits.webhooks). """
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name="webhook_endpoints")
+    url = models.URLField(max_length=500)
+    secret = models.CharField(max_length=64, default=secrets.token_hex, editable=False)  # Signs each body
+    events = models.JSONField(default=list, blank=True)  # Event types to receive; empty for all
+    max_concurrency = models.PositiveSmallIntegerField(default=4)  # Requests in flight to this URL at once
+    is_active = models.BooleanField(default=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            # Looked up on every save that produces an event
+            models.Index(fields=["user", "is_active"], name="webhook_user_active_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.user} - {self.url}"
+
+class OutboxEvent(models.Model):
+    """
+    One habit event awaiting delivery to one endpoint. Written in the
+    transaction of the change it describes and drained by habits.webhooks.
+    """
+    PENDING = "pending"
+    DELIVERED = "delivered"
+    FAILED = "failed"  # Gave up after webhooks.MAX_ATTEMPTS
+    STATUS_CHOICES = [(PENDING, "Pending"), (DELIVERED, "Delivered"), (FAILED, "Failed")]
+
+    endpoint = models.ForeignKey(WebhookEndpoint, on_delete=models.CASCADE, related_name="outbox")
+    event = models.CharField(max_length=50)
+    payload = models.JSONField()
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=PENDING)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    next_attempt_at = models.DateTimeField(default=now)  # Also pushed forward while a dispatcher holds the row
+    last_error = models.TextField(blank=True, default="")
+    created_at = models.DateTimeField(auto_now_add=True)
+    delivered_at = models.DateTimeField(blank=True, null=True)
+
+    class Meta:
+        indexes = [
+            # The dispatcher's "due events" scan; delivered rows stay out of the index
+            models.Index(fields=["next_attempt_at", "id"], condition=models.Q(status="pending"), name="outbox_pending_idx"),
+        ]
 
     def __str__(self):
-        return self.user.username
\ No newline at end of file
+        return f"{self.event} to {self.endpoint.url} - {self.status}"
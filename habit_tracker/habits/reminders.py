@@ -0,0 +1,53 @@
+"""
+Daily reminder digests. DailyReminderView serves the user's ReminderDigest
+row; the daily rollover (habits.rollover) writes every user's digest for their
+new day, and a habit change drops the row so the next read rebuilds it.
+"""
+from collections import defaultdict
+
+from .models import Habit, ReminderDigest
+from .timezones import local_today, user_timezone
+
+DIGEST_CHUNK_SIZE = 500
+
+
+def reminder_message(name, completed):
+    if completed:
+        return f"🎉 Congrats! You've completed '{name}' today!"
+    return f"⏰ Reminder: Don't forget to complete '{name}' today!"
+
+
+def build_digests(user_ids, timezone_name, today):
+    """
+    Write the ReminderDigest of each user (all in `timezone_name`) for their
+    local `today`, from one query over their habits. Returns the digests.
+    """
+    reminders = defaultdict(list)
+    habits = Habit.objects.filter(user_id__in=user_ids).order_by("user_id", "id").values_list("user_id", "name", "completed")
+    for user_id, name, completed in habits:
+        reminders[user_id].append({"habit": name, "message": reminder_message(name, completed)})
+
+    digests = [
+        ReminderDigest(user_id=user_id, date=today, timezone=timezone_name, reminders=reminders[user_id])
+        for user_id in user_ids
+    ]
+    ReminderDigest.objects.bulk_create(
+        digests, batch_size=DIGEST_CHUNK_SIZE,
+        update_conflicts=True, unique_fields=["user"], update_fields=["date", "timezone", "reminders", "built_at"],
+    )
+    return digests
+
+
+def user_digest(user):
+    """ The user's ReminderDigest for their current day: one row, rebuilt if missing or from an earlier day. """
+    digest = ReminderDigest.objects.filter(user=user).first()
+    if digest is None or digest.date != local_today(digest.timezone):
+        timezone_name = user_timezone(user.pk)
+        digest = build_digests([user.pk], timezone_name, local_today(timezone_name))[0]
+    return digest
+
+
+def drop_digest(user_id):
+    """ Discard a user's digest after a change to their habits; the next read rebuilds it. """
+    if user_id is not None:
+        ReminderDigest.objects.filter(user_id=user_id).delete()
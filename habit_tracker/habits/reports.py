@@ -0,0 +1,225 @@
+"""
+Habit report builds, served from a content-addressed file cache.
+
+A report is identified by (user, type, date, data version), where the data
+version is a digest of the rows that go into it. Re-requesting a report whose
+data hasn't changed reuses the file on disk; otherwise the PDF is rendered on
+a small local worker pool so the request thread returns immediately. A build
+hashes the rows as it renders them and files the PDF under that digest, so a
+file always shows exactly the data its key names, however the rows change
+between the request and the build.
+
+Files and ReportJob rows older than REPORT_MAX_AGE are removed by
+purge_reports() (`manage.py purge_reports`); reusing a file renews it.
+"""
+import hashlib
+import os
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from django.conf import settings
+from django.db import close_old_connections
+from django.utils.timezone import now, timedelta
+from reportlab.pdfgen import canvas
+
+from .models import Habit, ReportJob
+from .timezones import user_today
+
+REPORT_TYPES = ["daily", "weekly"]
+REPORT_FIELDS = ("name", "completed", "streak", "progress")
+
+_executor = None
+
+
+def report_period(report_type, today):
+    """ (start_date, end_date) covered by a report. """
+    return (today if report_type == "daily" else today - timedelta(days=7)), today
+
+
+def report_queryset(user, report_type, today):
+    """ The habits a report covers. """
+    start_date, _ = report_period(report_type, today)
+    return Habit.objects.filter(user=user, completed_at=today) if report_type == "daily" else Habit.objects.filter(user=user, completed_at__gte=start_date)
+
+
+def report_rows(user, report_type, today):
+    """ Yield the habit rows a report renders, as plain tuples in a stable order, without holding them all. """
+    rows = report_queryset(user, report_type, today).order_by("id").values_list(*REPORT_FIELDS)
+    yield from rows.iterator(chunk_size=2000)  # A server-side cursor on PostgreSQL
+
+
+def hashed_rows(rows, digest):
+    """ Pass `rows` through, feeding each into the hashlib object `digest`. """
+    for row in rows:
+        digest.update(repr(row).encode() + b"\n")
+        yield row
+
+
+def data_version(user, report_type, today):
+    """ Digest of the rows a report would render now. """
+    digest = hashlib.sha256()
+    for _ in hashed_rows(report_rows(user, report_type, today), digest):
+        pass
+    return digest.hexdigest()
+
+
+def report_cache_key(user, report_type, today, version):
+    """ Content address of a report: same user, type, date and data version -> same file. """
+    return hashlib.sha256(f"{user.pk}|{report_type}|{today}|{version}".encode()).hexdigest()
+
+
+def report_path(cache_key):
+    return Path(settings.REPORTS_ROOT) / f"{cache_key}.pdf"
+
+
+def cached_report(cache_key):
+    """ The path of the report filed under `cache_key`, renewed for purge_reports(), or None. """
+    path = report_path(cache_key)
+    try:
+        os.utime(path)
+    except FileNotFoundError:
+        return None
+    return path
+
+
+def render_report(output, username, report_type, today, rows):
+    """ Write the PDF for `rows` (any iterable, read once) to the binary file `output`. """
+    start_date, _ = report_period(report_type, today)
+    pdf = canvas.Canvas(output)
+    pdf.setTitle(f"Habit Report - {report_type.capitalize()}")
+
+    # Header
+    pdf.setFont("Helvetica-Bold", 14)
+    pdf.drawString(100, 800, f"Habit Report ({report_type.capitalize()})")
+    pdf.setFont("Helvetica", 12)
+    pdf.drawString(100, 780, f"User: {username}")
+    pdf.drawString(100, 765, f"Period: {start_date} to {today}")
+
+    y_position = 740  # Initial Y position for listing habits
+    empty = True
+    for name, completed, streak, progress in rows:
+        if empty:
+            pdf.setFont("Helvetica-Bold", 12)
+            pdf.drawString(100, y_position, "Habit Progress:")
+            y_position -= 20
+            pdf.setFont("Helvetica", 11)
+            empty = False
+
+        status_str = "✅ Completed" if completed else "❌ Not Completed"
+        streak_str = f"🔥 Streak: {streak} days" if streak else "No streak yet"
+
+        pdf.drawString(100, y_position, f"- {name}: {status_str}")
+        pdf.drawString(120, y_position - 15, f"{streak_str} 📊 Progress: {progress}%")
+        y_position -= 40
+
+        # Prevent text from going off-page
+        if y_position < 50:
+            pdf.showPage()  # Add a new page
+            y_position = 800  # Reset position
+
+    if empty:
+        pdf.setFont("Helvetica", 12)
+        pdf.drawString(100, y_position, "No habits found for this period. Keep going! 🚀")
+    pdf.save()
+
+
+def write_report(user, report_type, today):
+    """
+    Render the report from one read of its rows, hashing them on the way, and
+    file it (atomically, so readers never see a partial file) under the key of
+    exactly those rows. Returns the cache key.
+    """
+    root = Path(settings.REPORTS_ROOT)
+    root.mkdir(parents=True, exist_ok=True)
+    digest = hashlib.sha256()
+    fd, tmp_path = tempfile.mkstemp(dir=root, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as output:
+            render_report(output, user.username, report_type, today, hashed_rows(report_rows(user, report_type, today), digest))
+        cache_key = report_cache_key(user, report_type, today, digest.hexdigest())
+        os.replace(tmp_path, report_path(cache_key))
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+    return cache_key
+
+
+def build_report(job_id):
+    """ Render a queued job, recording the key of the rows it actually rendered. """
+    job = ReportJob.objects.select_related("user").get(pk=job_id)
+    job.status = ReportJob.RUNNING
+    job.save(update_fields=["status"])
+    try:
+        job.cache_key = write_report(job.user, job.report_type, job.report_date)
+        job.status = ReportJob.DONE
+    except Exception as exc:
+        job.status = ReportJob.FAILED
+        job.error = str(exc)
+    job.finished_at = now()
+    job.save(update_fields=["cache_key", "status", "error", "finished_at"])
+
+
+def run_report_job(job_id):
+    """ Worker-thread entry point; the thread owns its own database connection. """
+    close_old_connections()
+    try:
+        build_report(job_id)
+    finally:
+        close_old_connections()
+
+
+def enqueue_report(user, report_type, today=None):
+    """
+    Create a job for the report and schedule its build. A cached file for the
+    current rows makes the job finish immediately without rendering; otherwise
+    the build files the report under the rows it reads itself.
+    """
+    today = today or user_today(user.pk)
+    cache_key = report_cache_key(user, report_type, today, data_version(user, report_type, today))
+    job = ReportJob.objects.create(user=user, report_type=report_type, report_date=today, cache_key=cache_key)
+
+    if cached_report(cache_key):
+        job.status = ReportJob.DONE
+        job.finished_at = now()
+        job.save(update_fields=["status", "finished_at"])
+    elif settings.REPORT_WORKERS:
+        get_executor().submit(run_report_job, job.pk)
+    else:
+        build_report(job.pk)  # No pool configured: build inline
+        job.refresh_from_db()
+    return job
+
+
+def get_report_file(user, report_type, today=None):
+    """ Path of an up-to-date report, rendering it synchronously on a cache miss. """
+    today = today or user_today(user.pk)
+    cache_key = report_cache_key(user, report_type, today, data_version(user, report_type, today))
+    return cached_report(cache_key) or report_path(write_report(user, report_type, today))
+
+
+def purge_reports(max_age=None, moment=None):
+    """
+    Delete report files not written or reused, and ReportJob rows (finished
+    or long dead) not created, within `max_age` seconds (default settings.REPORT_MAX_AGE) of
+    `moment`. Returns (files removed, jobs removed).
+    """
+    cutoff = (moment or now()) - timedelta(seconds=settings.REPORT_MAX_AGE if max_age is None else max_age)
+    removed = 0
+    root = Path(settings.REPORTS_ROOT)
+    for path in [*root.glob("*.pdf"), *root.glob("*.tmp")]:  # .tmp: renders cut short by a crash
+        try:
+            if path.stat().st_mtime < cutoff.timestamp():
+                path.unlink()
+                removed += 1
+        except FileNotFoundError:
+            pass  # Replaced or removed meanwhile
+    jobs, _ = ReportJob.objects.filter(created_at__lt=cutoff).delete()
+    return removed, jobs
+
+
+def get_executor():
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(max_workers=settings.REPORT_WORKERS, thread_name_prefix="habit-report")
+    return _executor
@@ -0,0 +1,112 @@
+"""
+The daily rollover. Once a user's local day ends, their habits' `completed`
+flags are cleared for the new day, stored streaks whose last completion is
+older than yesterday expire, and their ReminderDigest is written for the new
+day, so none of this happens on the request path.
+
+Users follow UserProfile.timezone (DEFAULT_TIMEZONE without a profile).
+run_due_rollovers() rolls over each timezone whose local date moved past its
+DailyRollover row: its users are split into chunks, each chunk one transaction
+of bulk writes, spread over a thread pool. `manage.py run_rollover` runs it
+once (from cron) or on an interval.
+"""
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.db import connections, transaction
+from django.db.models import Q
+from django.utils.timezone import now
+
+from .cache import bump_user_version
+from .leaderboard import refresh_rankings
+from .models import DailyRollover, Habit, UserProfile
+from .reminders import build_digests
+from .timezones import local_today
+
+
+def timezone_users(timezone_name):
+    """ Ids of the users whose day follows `timezone_name`, in id order. """
+    users = Q(profile__timezone=timezone_name)
+    if timezone_name == UserProfile.DEFAULT_TIMEZONE:
+        users |= Q(profile__isnull=True)
+    return list(User.objects.filter(users).order_by("id").values_list("id", flat=True))
+
+
+def rollover_users(user_ids, timezone_name, today):
+    """
+    Roll a chunk of users over to their local `today` in one transaction: two
+    set-based UPDATEs (rows needing a change all get the same values) and the
+    digests' bulk upsert. Returns (habits reset, streaks expired).
+    """
+    habits = Habit.objects.filter(user_id__in=user_ids)
+    finished = habits.filter(completed=True, completed_at__lt=today)
+    missed = habits.filter(streak__gt=0, last_completed__lt=today - timedelta(days=1))  # No completion yesterday
+    stamp = now()  # update() skips auto_now
+    with transaction.atomic():
+        expired_users = set(missed.values_list("user_id", flat=True))
+        reset_users = set(finished.values_list("user_id", flat=True))
+        reset = finished.update(completed=False, completed_at=None, updated_at=stamp)  # Keeps the streak, unlike an unmark
+        expired = missed.update(streak=0, updated_at=stamp)
+        build_digests(user_ids, timezone_name, today)
+
+    # update() skips the Habit signals
+    for user_id in expired_users:
+        refresh_rankings(user_id)
+    for user_id in expired_users | reset_users:
+        bump_user_version(user_id)
+    return reset, expired
+
+
+def rollover_chunk(user_ids, timezone_name, today):
+    """ Worker-thread entry point; the thread owns its own database connection. """
+    try:
+        return rollover_users(user_ids, timezone_name, today)
+    finally:
+        connections.close_all()  # Pool threads outlive the chunk
+
+
+def due_rollovers(moment=None):
+    """ [(timezone, local date)] for each timezone in use whose local date is past its last rollover. """
+    timezones = set(UserProfile.objects.values_list("timezone", flat=True).distinct()) | {UserProfile.DEFAULT_TIMEZONE}
+    done = dict(DailyRollover.objects.values_list("timezone", "date"))
+    due = []
+    for timezone_name in sorted(timezones):
+        today = local_today(timezone_name, moment)
+        if timezone_name not in done or done[timezone_name] < today:
+            due.append((timezone_name, today))
+    return due
+
+
+def run_due_rollovers(moment=None, workers=None, chunk_size=None):
+    """
+    Roll over every due timezone. `workers` threads (default
+    settings.ROLLOVER_WORKERS; 0 runs inline) work through chunks of
+    `chunk_size` users. Returns one {"timezone", "date", "users", "reset",
+    "expired"} dict per timezone rolled over.
+    """
+    workers = settings.ROLLOVER_WORKERS if workers is None else workers
+    chunk_size = chunk_size or settings.ROLLOVER_CHUNK_SIZE
+    executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="habit-rollover") if workers else None
+    results = []
+    try:
+        for timezone_name, today in due_rollovers(moment):
+            user_ids = timezone_users(timezone_name)
+            chunks = [user_ids[i:i + chunk_size] for i in range(0, len(user_ids), chunk_size)]
+            if executor:
+                counts = list(executor.map(rollover_chunk, chunks, [timezone_name] * len(chunks), [today] * len(chunks)))
+            else:
+                counts = [rollover_users(chunk, timezone_name, today) for chunk in chunks]
+            DailyRollover.objects.update_or_create(timezone=timezone_name, defaults={"date": today})
+            results.append({
+                "timezone": timezone_name,
+                "date": today,
+                "users": len(user_ids),
+                "reset": sum(reset for reset, _ in counts),
+                "expired": sum(expired for _, expired in counts),
+            })
+    finally:
+        if executor:
+            executor.shutdown()
+    return results
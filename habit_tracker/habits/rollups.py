@@ -0,0 +1,103 @@
+from collections import defaultdict
+from datetime import datetime, timedelta
+
+from django.db import connection, transaction
+from django.db.models import Count, Sum
+from django.db.models.functions import TruncDay, TruncMonth, TruncWeek
+
+from .models import HabitTimeLog, HabitTimeRollup
+
+PERIODS = [HabitTimeRollup.DAY, HabitTimeRollup.WEEK, HabitTimeRollup.MONTH, HabitTimeRollup.TOTAL]
+
+# Add to the existing bucket or create it, in one statement (SQLite >= 3.24 and PostgreSQL)
+UPSERT_SQL = """
+INSERT INTO {table} (habit_id, period, period_start, total_minutes, log_count)
+VALUES {values}
+ON CONFLICT (habit_id, period, period_start) DO UPDATE SET
+    total_minutes = {table}.total_minutes + excluded.total_minutes,
+    log_count = {table}.log_count + excluded.log_count
+"""
+UPSERT_CHUNK_SIZE = 500
+
+
+def period_start(period, day):
+    """ First day of the `period` bucket that contains `day`. """
+    if period == HabitTimeRollup.WEEK:
+        return day - timedelta(days=day.weekday())
+    if period == HabitTimeRollup.MONTH:
+        return day.replace(day=1)
+    if period == HabitTimeRollup.TOTAL:
+        return HabitTimeRollup.TOTAL_START
+    return day
+
+
+def next_period_start(period, start):
+    """ First day of the `period` bucket after the one starting on `start`. """
+    if period == HabitTimeRollup.WEEK:
+        return start + timedelta(days=7)
+    if period == HabitTimeRollup.MONTH:
+        return (start + timedelta(days=32)).replace(day=1)
+    return start + timedelta(days=1)
+
+
+def record_time_logs(logs):
+    """
+    Add newly inserted HabitTimeLog rows to every rollup period. Call inside
+    the transaction that inserted them so totals and logs never disagree.
+    """
+    buckets = defaultdict(lambda: [0, 0])
+    for log in logs:
+        day = log.date.date() if isinstance(log.date, datetime) else log.date  # The field defaults to now()
+        for period in PERIODS:
+            bucket = buckets[(log.habit_id, period, period_start(period, day))]
+            bucket[0] += log.time_spent
+            bucket[1] += 1
+
+    rows = [(*key, minutes, count) for key, (minutes, count) in buckets.items()]
+    table = connection.ops.quote_name(HabitTimeRollup._meta.db_table)
+    with connection.cursor() as cursor:
+        for i in range(0, len(rows), UPSERT_CHUNK_SIZE):
+            chunk = rows[i:i + UPSERT_CHUNK_SIZE]
+            values = ", ".join(["(%s, %s, %s, %s, %s)"] * len(chunk))
+            cursor.execute(UPSERT_SQL.format(table=table, values=values), [value for row in chunk for value in row])
+
+
+def rebuild_rollups(habit_ids=None):
+    """
+    Recompute rollups from the raw logs, for all habits or just `habit_ids`.
+    Returns the number of rollup rows written.
+    """
+    logs = HabitTimeLog.objects.all()
+    rollups = HabitTimeRollup.objects.all()
+    if habit_ids is not None:
+        logs = logs.filter(habit_id__in=habit_ids)
+        rollups = rollups.filter(habit_id__in=habit_ids)
+
+    truncs = {
+        HabitTimeRollup.DAY: TruncDay("date"),
+        HabitTimeRollup.WEEK: TruncWeek("date"),
+        HabitTimeRollup.MONTH: TruncMonth("date"),
+    }
+    with transaction.atomic():
+        rollups.delete()
+        created = 0
+        for period in PERIODS:
+            grouped = logs.order_by()
+            if period == HabitTimeRollup.TOTAL:
+                grouped = grouped.values("habit_id")
+            else:
+                grouped = grouped.annotate(start=truncs[period]).values("habit_id", "start")
+            grouped = grouped.annotate(minutes=Sum("time_spent"), count=Count("id"))
+
+            batch = [
+                HabitTimeRollup(
+                    habit_id=row["habit_id"],
+                    period=period,
+                    period_start=row.get("start", HabitTimeRollup.TOTAL_START),
+                    total_minutes=row["minutes"],
+                    log_count=row["count"],
+                )
+                for row in grouped.iterator()
+            ]
+            created += len(HabitTimeRollup.objects.bulk_create(batch, batch_size=UPSERT_CHUNK_SIZE))
+    return created
@@ -1,24 +1,59 @@
 from rest_framework import serializers
 from .models import Habit
-from .models import HabitTimeLog
+from .models import HabitTimeLog, WebhookEndpoint
+from .webhooks import EVENT_TYPES, check_endpoint_url
 from django.contrib.auth.models import User
+from .metrics import serializer_timer
 
 
-class HabitSerializer(serializers.ModelSerializer):
+class TimedSerializerMixin:
+    """ Counts to_representation() time towards the request's serializer metric (see metrics.py). """
+
+    def to_representation(self, instance):
+        with serializer_timer():
+            return super().to_representation(instance)
+
+
+class HabitSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     user = serializers.SerializerMethodField()
 
     class Meta:
         model = Habit
         fields = '__all__'
+        # Maintained by Habit.save() from `completed`; the leaderboards rank the stored streak
+        read_only_fields = ["completed_at", "streak", "longest_streak", "last_completed", "category", "categories"]
+
+    def __init__(self, *args, **kwargs):
+        # Optional sparse fieldset, e.g. HabitSerializer(habits, fields=["id", "name"])
+        fields = kwargs.pop("fields", None)
+        super().__init__(*args, **kwargs)
+        if fields is not None:
+            for name in set(self.fields) - set(fields):
+                self.fields.pop(name)
 
     def get_user(self, obj):
         return obj.user.username
 
-class HabitTimeLogSerializer(serializers.ModelSerializer):
+class HabitTimeLogSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     class Meta:
         model = HabitTimeLog
         fields = '__all__'
 
+class WebhookEndpointSerializer(serializers.ModelSerializer):
+    events = serializers.ListField(child=serializers.ChoiceField(choices=EVENT_TYPES), required=False)  # Empty for all
+    max_concurrency = serializers.IntegerField(min_value=1, max_value=20, required=False)
+
+    class Meta:
+        model = WebhookEndpoint
+        fields = ["id", "url", "events", "max_concurrency", "is_active", "secret", "created_at"]  # secret is read-only
+
+    def validate_url(self, value):
+        try:
+            check_endpoint_url(value)  # Delivery checks the address again on every connect
+        except ValueError as exc:
+            raise serializers.ValidationError(str(exc))
+        return value
+
 class ResetStreakSerializer(serializers.Serializer):
     habit_id = serializers.IntegerField()
 
@@ -39,9 +74,38 @@ class RegisterSerializer(serializers.ModelSerializer):
         user = User.objects.create_user(**validated_data)
         return user
     
-class UserProfileSerializer(serializers.ModelSerializer):
+class UserProfileSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     bio = serializers.CharField(source="profile.bio", required=False)
+    timezone = serializers.CharField(source="profile.timezone", required=False)
 
     class Meta:
         model = User
-        fields = ["username", "date_joined", "bio"]
+        fields = ["username", "date_joined", "bio", "timezone"]
+
+class BatchOperationSerializer(serializers.Serializer):
+    """
+    One entry of a batch payload. `habit` is an existing habit id, or the `ref`
+    of a habit created earlier in the same batch.
+    """
+    CREATE = "create"
+    COMPLETE = "complete"
+    LOG_TIME = "log_time"
+
+    op = serializers.ChoiceField(choices=[CREATE, COMPLETE, LOG_TIME])
+    ref = serializers.CharField(max_length=64, required=False)
+    habit = serializers.CharField(max_length=64, required=False)
+    name = serializers.CharField(max_length=255, required=False)
+    description = serializers.CharField(required=False, allow_blank=True, allow_null=True)
+    goal = serializers.CharField(max_length=255, required=False, allow_blank=True, allow_null=True)
+    progress = serializers.IntegerField(required=False)
+    date = serializers.DateField(required=False)
+    time_spent = serializers.IntegerField(min_value=1, required=False)
+
+    def validate(self, data):
+        if data["op"] == self.CREATE and not data.get("name"):
+            raise serializers.ValidationError({"name": "This field is required to create a habit."})
+        if data["op"] != self.CREATE and not data.get("habit"):
+            raise serializers.ValidationError({"habit": "This field is required."})
+        if data["op"] == self.LOG_TIME and not data.get("time_spent"):
+            raise serializers.ValidationError({"time_spent": "This field is required to log time."})
+        return data
@@ -0,0 +1,86 @@
+from django.contrib.auth.models import User
+from django.db.models.signals import post_delete, post_init, post_save
+from django.dispatch import receiver
+from rest_framework.authtoken.models import Token
+
+from .authentication import invalidate_token, revoke_credentials
+from .cache import bump_user_version
+from .leaderboard import refresh_rankings
+from .models import Habit, HabitTimeLog, UserProfile
+from .reminders import drop_digest
+from .timezones import forget_user_timezone
+
+
+@receiver(post_delete, sender=Token)
+def token_deleted(sender, instance, **kwargs):
+    invalidate_token(instance.key)
+    revoke_credentials(instance.user_id)  # Other workers may still hold the token
+
+
+def credential_values(user):
+    return (user.__dict__.get("password"), user.__dict__.get("is_active"))  # Deferred fields read as None
+
+
+@receiver(post_init, sender=User)
+def user_loaded(sender, instance, **kwargs):
+    instance._saved_credentials = credential_values(instance)
+
+
+@receiver(post_save, sender=User)
+def user_changed(sender, instance, created, **kwargs):
+    """
+    A password change or deactivation voids the user's cached tokens and
+    Basic-auth verifications in every worker. Other saves (last_login on each
+    login, profile edits) leave them cached; those fields may lag by the TTL.
+    """
+    credentials = credential_values(instance)
+    if not created and credentials != instance._saved_credentials:
+        revoke_credentials(instance.pk)
+    instance._saved_credentials = credentials
+
+
+@receiver(post_delete, sender=User)
+def user_deleted(sender, instance, **kwargs):
+    revoke_credentials(instance.pk)
+
+
+@receiver(post_save, sender=Habit)
+@receiver(post_delete, sender=Habit)
+def habit_changed(sender, instance, **kwargs):
+    bump_user_version(instance.user_id)
+
+
+@receiver(post_save, sender=Habit)
+def habit_ranking_saved(sender, instance, **kwargs):
+    if instance.ranking_changed():
+        refresh_rankings(instance.user_id)
+
+
+@receiver(post_delete, sender=Habit)
+def habit_ranking_deleted(sender, instance, **kwargs):
+    if instance.streak:
+        refresh_rankings(instance.user_id)
+
+
+@receiver(post_save, sender=Habit)
+def habit_reminder_saved(sender, instance, **kwargs):
+    if instance.reminder_changed():
+        drop_digest(instance.user_id)
+
+
+@receiver(post_delete, sender=Habit)
+def habit_reminder_deleted(sender, instance, **kwargs):
+    drop_digest(instance.user_id)
+
+
+@receiver(post_save, sender=UserProfile)
+def profile_changed(sender, instance, **kwargs):
+    # The timezone decides the user's day, and so which day the digest is for
+    forget_user_timezone(instance.user_id)
+    drop_digest(instance.user_id)
+
+
+@receiver(post_save, sender=HabitTimeLog)
+@receiver(post_delete, sender=HabitTimeLog)
+def time_log_changed(sender, instance, **kwargs):
+    bump_user_version(instance.user_id or instance.habit.user_id)
@@ -1,3 +1,1484 @@
-from django.test import TestCase
+import base64
+import csv
+import gzip
+import hashlib
+import hmac
+import io
+import json
+import os
+import random
+import re
+import socket
+import tempfile
+import threading
+import time
+from datetime import date, datetime, timedelta, timezone as dt_timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from unittest.mock import patch
 
-# Create your tests here.
+from asgiref.sync import async_to_sync
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.exceptions import ImproperlyConfigured
+from django.core.management import call_command
+from django.db import connection, transaction
+from django.db.models import Sum
+from django.http import StreamingHttpResponse
+from django.test import AsyncClient, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils.timezone import now
+from rest_framework.authentication import BasicAuthentication
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from habit_tracker.database import database_from_url
+
+from .authentication import (
+    basic_auth_cache, credentials_cache_key, revoke_credentials, shared_token_cache_key, shared_token_hits, token_cache,
+    token_cache_stats,
+)
+from .cache import check_version_cache
+from .batch import apply_batch
+from .calendars import rebuild_calendars
+from .categories import categorize, categorize_all
+from .db import READ_ALIAS, ReportReadRouter, use_read_database
+from .leaderboard import MAX_SCORE, ScoreIndex, leaderboards
+from .metrics import registry
+from .models import (
+    DailyRollover, Habit, HabitCalendarMonth, HabitCompletion, HabitTimeLog, HabitTimeRollup, OutboxEvent, ReminderDigest,
+    ReportJob, StreakRanking, UserProfile, WebhookEndpoint, live_streak, streak_state,
+)
+from .reports import build_report, data_version, enqueue_report, purge_reports, report_cache_key, report_path, report_rows
+from .rollover import run_due_rollovers
+from .rollups import PERIODS, period_start, rebuild_rollups
+from .timezones import local_today, user_timezone
+from .webhooks import dispatch, enqueue_events
+
+# "SCAN habits_habit" is a full table scan; "SCAN t USING INDEX ..." is not
+FULL_SCAN = re.compile(r"^SCAN (\w+)$")
+
+
+class QueryPlanTests(TestCase):
+    """ Hot endpoint queries must be served by an index, never a full table scan. """
+
+    endpoints = [
+        "/habits/",
+        "/habits/streaks/",
+        "/habits/daily-reminders/",
+        "/habits/milestones/rewards/",
+        "/habits/scale-difficulty/",
+        "/habits/progress-calendar/",
+        "/progress/weekly-summary/",
+        "/progress/completion-report/",
+        "/reports/generate/?type=weekly",
+        "/habits/time-spent/{pk}/",
+        "/check-completion/{pk}/",
+        "/habits/frequency-over-time/{pk}/?granularity=week",
+    ]
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user("planner", password="secret-pass")
+        other = User.objects.create_user("other", password="secret-pass")
+        today = now().date()
+        for owner in (cls.user, other):
+            for i in range(5):
+                habit = Habit.objects.create(user=owner, name=f"Habit {i}", completed=True, completed_at=today - timedelta(days=i))
+                HabitTimeLog.objects.create(habit=habit, user=owner, time_spent=10 + i)
+        cls.habit = Habit.objects.filter(user=cls.user).first()
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        reports_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(reports_dir.cleanup)
+        reports_override = override_settings(REPORTS_ROOT=reports_dir.name)
+        reports_override.enable()
+        self.addCleanup(reports_override.disable)
+
+    def full_scans(self, sql):
+        ctes = set(re.findall(r"(\w+) AS \(", sql))
+        with connection.cursor() as cursor:
+            cursor.execute(f"EXPLAIN QUERY PLAN {sql}")
+            details = [row[-1] for row in cursor.fetchall()]
+        return [d for d in details if FULL_SCAN.match(d) and FULL_SCAN.match(d).group(1) not in ctes]
+
+    def test_endpoints_use_indexes(self):
+        if connection.vendor != "sqlite":
+            self.skipTest("EXPLAIN QUERY PLAN is SQLite-specific")
+        for url in self.endpoints:
+            url = url.format(pk=self.habit.pk)
+            with self.subTest(url=url), CaptureQueriesContext(connection) as ctx:
+                response = self.client.get(url)
+                self.assertEqual(response.status_code, 200)
+                if response.streaming:
+                    b"".join(response.streaming_content)
+                for query in ctx.captured_queries:
+                    if query["sql"].lstrip().upper().startswith(("SELECT", "WITH")):
+                        self.assertEqual(self.full_scans(query["sql"]), [], query["sql"])
+
+
+class WeeklySummaryTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user("weekly", password="secret-pass")
+        user_timezone(self.user.pk)  # Warm the cached timezone, as on a worker that has served the user
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def get_summary(self, url="/progress/weekly-summary/"):
+        response = self.client.get(url)
+        return response, json.loads(b"".join(response.streaming_content))
+
+    def test_query_count_is_constant(self):
+        today = now().date()
+        for habit_count in (2, 40):
+            for i in range(habit_count):
+                Habit.objects.create(user=self.user, name=f"Habit {habit_count}-{i}", completed=True, completed_at=today)
+            with self.assertNumQueries(1):
+                _, data = self.get_summary()
+            self.assertEqual(len(data["weekly_summary"]), Habit.objects.filter(user=self.user).count())
+
+    def test_counts_completion_days_in_window(self):
+        today = now().date()
+        habit = Habit.objects.create(user=self.user, name="Read", completed=True, completed_at=today - timedelta(days=9))
+        for offset in (2, 1, 0):
+            habit.completed_at = today - timedelta(days=offset)
+            habit.save()
+
+        _, data = self.get_summary()
+        self.assertEqual(data["weekly_summary"], [{"habit": "Read", "days_completed": 3}])
+        _, data = self.get_summary("/progress/weekly-summary/?days=30")
+        self.assertEqual(data["weekly_summary"][0]["days_completed"], 4)
+
+    def test_rejects_invalid_window(self):
+        for days in ("abc", "0", "10000"):
+            response = self.client.get(f"/progress/weekly-summary/?days={days}")
+            self.assertEqual(response.status_code, 400)
+
+
+class BackendParityTests(TestCase):
+    """
+    streaks() and completion_counts() must match the Python reference on every
+    backend: "default" always, plus the "parity" alias when PARITY_DATABASE_URL
+    is set, e.g. a local Postgres while default is SQLite.
+    """
+    databases = {"default", "parity"} if "parity" in settings.DATABASES else {"default"}
+
+    # Days ago each habit was completed: runs, gaps, a month boundary and a shared name
+    HISTORY = {
+        ("alice", "Read", 0): [0, 1, 2, 5, 6, 7, 8, 30, 31],
+        ("alice", "Read", 1): [2, 3, 4, 40],  # Same name, its own history
+        ("alice", "Run", 0): [3, 4, 10, 11, 12, 13, 14],
+        ("alice", "Idle", 0): [],
+        ("bob", "Read", 0): [0, 2, 4, 6, 8, 10],
+        ("bob", "Swim", 0): list(range(0, 60)),
+    }
+
+    def seed(self, alias):
+        today = now().date()
+        users = {name: User.objects.db_manager(alias).create_user(name, password="secret-pass") for name in ("alice", "bob")}
+        completions = []
+        self.habits = {}  # Habit id -> HISTORY key
+        for key, days_ago in self.HISTORY.items():
+            habit = Habit.objects.using(alias).create(user=users[key[0]], name=key[1])
+            self.habits[habit.pk] = key
+            completions += [HabitCompletion(habit=habit, user=habit.user, date=today - timedelta(days=d)) for d in days_ago]
+        HabitCompletion.objects.using(alias).bulk_create(completions)
+        return today
+
+    def expected_streaks(self, today):
+        expected = {}
+        for key, days_ago in self.HISTORY.items():
+            if days_ago:
+                current, longest, last = streak_state(sorted((today - timedelta(days=d) for d in days_ago), reverse=True))
+                expected[key] = (live_streak(current, last, today), longest)
+        return expected
+
+    def test_streaks_match_reference(self):
+        for alias in sorted(self.databases):
+            with self.subTest(alias=alias):
+                today = self.seed(alias)
+                streaks = Habit.objects.using(alias).all().streaks()
+                actual = {self.habits[habit_id]: tuple(value) for habit_id, value in streaks.items()}
+                self.assertEqual(actual, self.expected_streaks(today))
+
+    def test_calculate_streak_agrees_with_streaks(self):
+        today = self.seed("default")
+        streaks = Habit.objects.all().streaks()
+        for habit in Habit.objects.all():
+            with self.subTest(habit=self.habits[habit.pk]):
+                self.assertEqual(habit.calculate_streak(), streaks.get(habit.pk, (0, 0))[0])
+        self.assertEqual(streaks[next(pk for pk, key in self.habits.items() if key == ("alice", "Read", 1))], (0, 3))
+
+        habit = Habit.objects.create(user=User.objects.get(username="alice"), name="Read")  # A third "Read"
+        for days_ago in (2, 1, 0):
+            habit.completed, habit.completed_at = True, today - timedelta(days=days_ago)
+            habit.save()
+        self.assertEqual((habit.streak, habit.calculate_streak(), Habit.objects.filter(pk=habit.pk).streaks()[habit.pk][0]), (3, 3, 3))
+
+    def test_same_named_habit_starts_its_own_streak(self):
+        user = User.objects.create_user("carol", password="secret-pass")
+        today = now().date()
+        first = Habit.objects.create(user=user, name="Read")
+        for days_ago in (3, 2, 1):
+            first.completed, first.completed_at = True, today - timedelta(days=days_ago)
+            first.save()
+        second = Habit.objects.create(user=user, name="Read")
+        second.completed = True
+        second.save()
+
+        streaks = Habit.objects.filter(user=user).streaks()
+        self.assertEqual((second.streak, second.longest_streak, second.calculate_streak()), (1, 1, 1))
+        self.assertEqual(streaks[second.pk], (1, 1))
+        self.assertEqual((first.streak, first.calculate_streak(), streaks[first.pk]), (3, 3, (3, 3)))
+
+    def test_backfill_restores_stored_streaks(self):
+        today = self.seed("default")
+        carol = User.objects.create_user("carol", password="secret-pass")
+        for days_ago in ((2, 1), (0,)):  # Same name: one run that ends yesterday, another that starts today
+            habit = Habit.objects.create(user=carol, name="Read")
+            HabitCompletion.objects.bulk_create([HabitCompletion(habit=habit, user=carol, date=today - timedelta(days=d)) for d in days_ago])
+        Habit.objects.update(streak=99, longest_streak=99, last_completed=today)
+
+        call_command("backfill_streaks", stdout=io.StringIO())
+        streaks = Habit.objects.all().streaks()
+        stored = {habit.pk: (habit.streak, habit.longest_streak) for habit in Habit.objects.all()}
+        self.assertEqual(stored, {pk: streaks.get(pk, (0, 0)) for pk in stored})
+        self.assertEqual(sorted(stored[habit.pk] for habit in Habit.objects.filter(user=carol)), [(1, 1), (2, 2)])
+
+    def test_seeded_benchmark_data_matches_streaks(self):
+        call_command("seed_benchmark_data", users=2, habits=4, days=20, stdout=io.StringIO())
+        streaks = Habit.objects.all().streaks()
+        for habit in Habit.objects.all():
+            with self.subTest(habit=habit.name):
+                self.assertEqual((habit.streak, habit.longest_streak), streaks.get(habit.pk, (0, 0)))
+                days_done = HabitCompletion.objects.filter(habit=habit).count()
+                self.assertEqual(habit.progress, round(100 * days_done / 20))  # A percentage, like the views read it
+
+    def test_streak_view_query_count_is_constant(self):
+        self.seed("default")
+        alice = User.objects.get(username="alice")
+        user_timezone(alice.pk)  # Warm the cached timezone, as on a worker that has served the user
+        client = APIClient()
+        client.force_authenticate(alice)
+        expected = {"Read": 0, "Run": 0, "Idle": 0}  # Both "Read" habits: the later one wins the name
+        for extra in (0, 30):
+            for i in range(extra):
+                habit = Habit.objects.create(user=alice, name=f"Extra {i}")
+                HabitCompletion.objects.create(habit=habit, user=alice, date=now().date())
+                expected[habit.name] = 1
+            with self.assertNumQueries(2):  # The habits, then every streak in one window query
+                streaks = client.get("/habits/streaks/").json()["habit_streaks"]
+            self.assertEqual(streaks, expected)
+
+    def test_completion_counts_match_reference(self):
+        for alias in sorted(self.databases):
+            with self.subTest(alias=alias):
+                today = self.seed(alias)
+                for window in (1, 7, 30, 365):
+                    since = today - timedelta(days=window)
+                    rows = Habit.objects.using(alias).completion_counts(since).values_list("user__username", "name", "days_completed")
+                    expected = {}
+                    for (username, name, _), days_ago in self.HISTORY.items():
+                        expected.setdefault((username, name), []).append(sum(d <= window for d in days_ago))
+                    actual = {}
+                    for username, name, count in rows:
+                        actual.setdefault((username, name), []).append(count)
+                    self.assertEqual({k: sorted(v) for k, v in actual.items()}, {k: sorted(v) for k, v in expected.items()})
+
+
+class ProgressCalendarTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user("calendar", password="secret-pass")
+        user_timezone(self.user.pk)  # Warm the cached timezone, as on a worker that has served the user
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.habit = Habit.objects.create(user=self.user, name="Read")
+        for day in (date(2025, 1, 1), date(2025, 1, 31), date(2025, 3, 15)):
+            self.habit.completed, self.habit.completed_at = True, day
+            self.habit.save()
+
+    def test_completions_set_bitmap_bits(self):
+        months = dict(HabitCalendarMonth.objects.filter(habit=self.habit).values_list("month", "days"))
+        self.assertEqual(months, {date(2025, 1, 1): 1 | 1 << 30, date(2025, 3, 1): 1 << 14})
+        self.assertEqual(rebuild_calendars(), 2)
+        self.assertEqual(dict(HabitCalendarMonth.objects.values_list("month", "days")), months)
+
+    def test_month_is_one_query(self):
+        with self.assertNumQueries(1):
+            data = self.client.get("/habits/progress-calendar/?month=1&year=2025").json()
+        self.assertEqual((data["month"], data["year"]), ("January", 2025))
+        self.assertEqual([day for day, names in data["calendar"].items() if names], ["1", "31"])
+        self.assertEqual(data["calendar"]["31"], ["Read"])
+
+    def test_month_range(self):
+        data = self.client.get("/habits/progress-calendar/?from=2024-12&to=2025-03").json()
+        self.assertEqual((data["from"], data["to"]), ("2024-12", "2025-03"))
+        self.assertEqual([(m["month"], m["year"]) for m in data["months"]], [
+            ("December", 2024), ("January", 2025), ("February", 2025), ("March", 2025),
+        ])
+        self.assertEqual([sum(map(len, m["calendar"].values())) for m in data["months"]], [0, 2, 0, 1])
+        self.assertEqual(len(data["months"][2]["calendar"]), 28)
+
+    def test_rejects_invalid_range(self):
+        for query in ("from=2025-13", "to=2025-01", "from=2025-03&to=2025-01", "from=2020-01&to=2025-01", "month=13"):
+            response = self.client.get(f"/habits/progress-calendar/?{query}")
+            self.assertEqual(response.status_code, 400, query)
+
+
+class CategorySuggestionTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user("suggest", password="secret-pass")
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_categorize_matches_whole_words_and_phrases(self):
+        self.assertEqual(categorize("Morning  RUN"), "Fitness & Exercise")
+        self.assertEqual(categorize("Strength training"), "Fitness & Exercise")
+        self.assertEqual(categorize("Drink water after the gym"), "Health & Hydration")  # The leaderboards' category
+        self.assertEqual(categorize_all("Drink water after the gym"), ("Fitness & Exercise", "Health & Hydration"))
+        self.assertEqual(categorize("Sunday brunch"), "")
+        self.assertEqual(categorize_all("Sunday brunch"), ())
+
+    def test_category_is_stored_on_save(self):
+        habit = Habit.objects.create(user=self.user, name="Read a chapter")
+        self.assertEqual(Habit.objects.get(pk=habit.pk).category, "Learning & Productivity")
+        habit.name = "Evening yoga"
+        habit.save()
+        self.assertEqual(Habit.objects.get(pk=habit.pk).category, "Fitness & Exercise")
+        self.assertEqual(Habit.objects.get(pk=habit.pk).categories, ["Fitness & Exercise"])
+
+    def test_suggestions_use_stored_categories(self):
+        yoga = Habit.objects.create(user=self.user, name="Yoga")
+        Habit.objects.create(user=self.user, name="Go to bedtime early")
+        Habit.objects.create(user=self.user, name="Run")
+        with self.assertNumQueries(2):
+            suggestions = self.client.get("/habits/suggest-personalized/").json()["suggestions"]
+        self.assertEqual(suggestions, [
+            "Try a relaxing bedtime routine like stretching or reading.",
+            "Consider adding strength training or yoga to balance your routine.",
+        ])
+        data = self.client.get(f"/habits/suggest-new/{yoga.pk}/").json()
+        self.assertEqual(data["suggestions"], ["Try meal prepping to support your fitness goals."])
+
+    def test_suggestions_cover_every_matched_category(self):
+        habit = Habit.objects.create(user=self.user, name="Drink water after the gym")
+        data = self.client.get(f"/habits/suggest-new/{habit.pk}/").json()
+        self.assertEqual(data["suggestions"], [
+            "Try meal prepping to support your fitness goals.",
+            "Since you stay hydrated, try tracking your daily caffeine intake.",
+        ])
+        self.assertEqual(self.client.get("/habits/suggest-personalized/").json()["suggestions"], [
+            "Consider adding strength training or yoga to balance your routine.",
+            "Since you track hydration, consider monitoring your caffeine intake.",
+        ])
+
+
+class HabitAnalyticsTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user("analyst", password="secret-pass")
+        user_timezone(self.user.pk)  # Warm the cached timezone, as on a worker that has served the user
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_metrics(self):
+        today = now().date()
+        run = Habit.objects.create(user=self.user, name="Run")
+        Habit.objects.create(user=self.user, name="Idle")
+        for days_ago in (9, 8, 7, 3, 2, 1):  # Active for 10 days, today not done yet
+            run.completed, run.completed_at = True, today - timedelta(days=days_ago)
+            run.save()
+        for minutes in (30, 15):
+            HabitTimeLog.objects.create(habit=run, user=self.user, date=today, time_spent=minutes)
+
+        with self.assertNumQueries(2):  # Habits, then completions UNION ALL time logs
+            data = self.client.get("/analytics/?days=30").json()
+        run_stats, idle_stats = data["habits"]
+        self.assertEqual(run_stats["completion_rate"], {"7d": round(3 / 7, 4), "30d": 0.6})
+        self.assertEqual((run_stats["current_streak"], run_stats["longest_streak"]), (3, 3))
+        self.assertTrue(0.5 < run_stats["consistency"] < 0.7)
+        self.assertEqual(run_stats["time_spent"]["total_minutes"], 45)
+        self.assertEqual((idle_stats["name"], idle_stats["consistency"], idle_stats["longest_streak"]), ("Idle", 0.0, 0))
+
+    def test_rejects_invalid_window(self):
+        for days in ("abc", "0", "5000"):
+            self.assertEqual(self.client.get(f"/analytics/?days={days}").status_code, 400)
+
+
+class HabitListTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user("lister", password="secret-pass")
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.habits = [Habit.objects.create(user=self.user, name=f"Habit {i}") for i in range(12)]
+        Habit.objects.filter(pk__in=[h.pk for h in self.habits[3:7]]).update(created_at=self.habits[3].created_at)  # Ties on created_at
+        Habit.objects.create(user=User.objects.create_user("other", password="secret-pass"), name="Not mine")
+
+    def test_cursors_walk_every_habit_once(self):
+        seen, pages, url = [], 0, "/habits/?page_size=5"
+        while url:
+            data = self.client.get(url).json()
+            seen += [habit["id"] for habit in data["results"]]
+            pages, url = pages + 1, data["next"]
+        self.assertEqual(pages, 3)
+        self.assertEqual(sorted(seen), sorted(habit.pk for habit in self.habits))
+        self.assertEqual(len(seen), len(set(seen)))
+
+    def test_invalid_cursor_is_not_found(self):
+        for cursor in ("garbage", base64.urlsafe_b64encode(b"yesterday|1").decode()):
+            self.assertEqual(self.client.get(f"/habits/?cursor={cursor}").status_code, 404)
+
+    def test_sparse_fields(self):
+        with CaptureQueriesContext(connection) as queries:
+            data = self.client.get("/habits/?fields=id,name&page_size=2").json()
+        self.assertNotIn('"description"', queries[-1]["sql"])  # The SELECT list is trimmed too
+        self.assertEqual([set(habit) for habit in data["results"]], [{"id", "name"}] * 2)
+        self.assertIsNotNone(data["next"])
+        user_only = self.client.get("/habits/?fields=user&page_size=1").json()["results"]
+        self.assertEqual(user_only, [{"user": "lister"}])
+
+        response = self.client.get("/habits/?fields=id,secret")
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("secret", response.json()["fields"])
+
+
+class ExportTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user("exporter", password="secret-pass")
+        self.client.force_login(self.user)
+        self.today = now().date()
+        self.read = Habit.objects.create(user=self.user, name="Read, daily", description='Say "hi"')
+        self.run = Habit.objects.create(user=self.user, name="Run")
+        Habit.objects.filter(pk=self.run.pk).update(updated_at=now() - timedelta(days=10))
+        for habit, days_ago, minutes in ((self.read, 0, 20), (self.run, 5, 30), (self.run, 15, 45)):
+            HabitTimeLog.objects.create(habit=habit, user=self.user, date=self.today - timedelta(days=days_ago), time_spent=minutes)
+        Habit.objects.create(user=User.objects.create_user("other", password="secret-pass"), name="Not mine")
+
+    def body(self, response):
+        self.assertEqual(response.status_code, 200)
+        content = b"".join(response.streaming_content)
+        if response.get("Content-Encoding") == "gzip":
+            content = gzip.decompress(content)
+        return content.decode()
+
+    def test_habits_as_csv(self):
+        response = self.client.get("/export/habits/")
+        self.assertEqual(response["Content-Type"], "text/csv")
+        self.assertEqual(response["Content-Disposition"], 'attachment; filename="habits.csv"')
+        rows = list(csv.DictReader(io.StringIO(self.body(response))))
+        self.assertEqual([(row["name"], row["description"]) for row in rows], [("Read, daily", 'Say "hi"'), ("Run", "")])
+        self.assertEqual(rows[0]["created_at"], self.read.created_at.isoformat())
+
+    def test_time_logs_as_ndjson(self):
+        for response in (
+            self.client.get("/export/time-logs/?format=ndjson"),
+            self.client.get("/export/time-logs/", headers={"Accept": "application/x-ndjson"}),
+        ):
+            self.assertEqual(response["Content-Type"], "application/x-ndjson")
+            rows = [json.loads(line) for line in self.body(response).splitlines()]
+            self.assertEqual([(row["habit_name"], row["time_spent"]) for row in rows], [("Read, daily", 20), ("Run", 30), ("Run", 45)])
+            self.assertEqual(rows[0]["date"], self.today.isoformat())
+
+    def test_since(self):
+        since = (self.today - timedelta(days=7)).isoformat()
+        habits = self.body(self.client.get(f"/export/habits/?format=ndjson&since={since}"))
+        self.assertEqual([json.loads(line)["name"] for line in habits.splitlines()], ["Read, daily"])  # Run last changed 10 days ago
+        logs = self.body(self.client.get(f"/export/time-logs/?format=ndjson&since={since}T12:00:00"))
+        self.assertEqual([json.loads(line)["time_spent"] for line in logs.splitlines()], [20, 30])
+
+        response = self.client.get("/export/habits/?since=last-week")
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("since", json.loads(response.content)["error"])  # Errors are JSON under the export media type
+
+    def test_gzip(self):
+        plain = self.body(self.client.get("/export/time-logs/"))
+        response = self.client.get("/export/time-logs/", headers={"Accept-Encoding": "gzip, deflate"})
+        self.assertEqual(response["Content-Encoding"], "gzip")
+        self.assertEqual(self.body(response), plain)
+
+        for header in ("gzip;q=0, deflate", "identity", "*;q=0.5, gzip; q=0", ""):
+            with self.subTest(header=header):
+                response = self.client.get("/export/time-logs/", headers={"Accept-Encoding": header})
+                self.assertNotIn("Content-Encoding", response)
+                self.assertLessEqual({"Accept", "Accept-Encoding"}, set(re.split(r",\s*", response["Vary"])))
+                self.assertEqual(self.body(response), plain)
+        response = self.client.get("/export/time-logs/", headers={"Accept-Encoding": "br;q=1.0, *;q=0.1"})
+        self.assertEqual(response["Content-Encoding"], "gzip")
+        self.assertLessEqual({"Accept", "Accept-Encoding"}, set(re.split(r",\s*", response["Vary"])))
+
+    def test_requires_login(self):
+        self.client.logout()
+        self.assertEqual(self.client.get("/export/habits/").status_code, 403)
+
+
+class ConditionalGetTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user("revalidator", password="secret-pass")
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.read = Habit.objects.create(user=self.user, name="Read")
+        self.run = Habit.objects.create(user=self.user, name="Run")
+
+    def etag(self, url):
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response["Cache-Control"], "private, no-cache")
+        return response["ETag"]
+
+    def test_round_trip(self):
+        for url in ("/habits/", f"/habits/{self.read.pk}/"):
+            with self.subTest(url=url):
+                response = self.client.get(url)
+                with self.assertNumQueries(1):  # The validator aggregate, no page or serialization
+                    revalidated = self.client.get(url, headers={"If-None-Match": response["ETag"]})
+                self.assertEqual(revalidated.status_code, 304)
+                self.assertEqual(revalidated["ETag"], response["ETag"])
+                since = self.client.get(url, headers={"If-Modified-Since": response["Last-Modified"]})
+                self.assertEqual(since.status_code, 304)
+                self.assertEqual(self.client.get(url, headers={"If-None-Match": 'W/"stale"'}).status_code, 200)
+
+    def test_writes_change_the_etag(self):
+        list_etag, detail_etag = self.etag("/habits/"), self.etag(f"/habits/{self.read.pk}/")
+        self.assertNotEqual(self.etag("/habits/?page_size=1"), list_etag)
+
+        self.client.patch(f"/habits/{self.read.pk}/", {"goal": "20 pages"}, format="json")
+        self.assertNotEqual(self.etag(f"/habits/{self.read.pk}/"), detail_etag)
+        self.assertNotEqual(self.etag("/habits/"), list_etag)
+
+        steps = [
+            lambda: self.client.post("/habits/", {"name": "Swim"}, format="json"),
+            lambda: self.client.delete(f"/habits/{self.run.pk}/"),
+        ]
+        for step in steps:
+            list_etag = self.etag("/habits/")
+            step()
+            self.assertEqual(self.client.get("/habits/", headers={"If-None-Match": list_etag}).status_code, 200)
+
+        other = User.objects.create_user("other", password="secret-pass")
+        list_etag = self.etag("/habits/")
+        Habit.objects.create(user=other, name="Not mine")
+        self.assertEqual(self.client.get("/habits/", headers={"If-None-Match": list_etag}).status_code, 304)
+
+
+class BatchTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user("syncer", password="secret-pass")
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.run = Habit.objects.create(user=self.user, name="Run")
+        self.others = Habit.objects.create(user=User.objects.create_user("other", password="secret-pass"), name="Not mine")
+        self.today = now().date()
+
+    def counts(self):
+        return [model.objects.count() for model in (Habit, HabitCompletion, HabitTimeLog, OutboxEvent)]
+
+    def operations(self):
+        yesterday = (self.today - timedelta(days=1)).isoformat()
+        return [
+            {"op": "create", "ref": "r1", "name": "Read"},
+            {"op": "complete", "habit": "r1", "date": yesterday},
+            {"op": "complete", "habit": "r1"},
+            {"op": "complete", "habit": str(self.run.pk)},
+            {"op": "log_time", "habit": "r1", "time_spent": 20},
+            {"op": "log_time", "habit": str(self.run.pk), "time_spent": 30, "date": yesterday},
+        ]
+
+    def test_json_batch(self):
+        response = self.client.post("/habits/batch/", {"operations": self.operations()}, format="json")
+        self.assertEqual(response.status_code, 201)
+        data = response.json()
+        self.assertEqual((data["completed"], data["time_logged"]), (3, 2))
+        read = Habit.objects.get(pk=data["created"][0]["id"])
+        self.assertEqual((data["created"][0]["ref"], read.user, read.category), ("r1", self.user, categorize("Read")))
+        self.assertEqual((read.streak, read.longest_streak, read.last_completed), (2, 2, self.today))
+        self.run.refresh_from_db()
+        self.assertEqual((self.run.streak, self.run.completed), (1, True))
+        self.assertEqual(sorted(HabitTimeLog.objects.values_list("habit__name", "time_spent")), [("Read", 20), ("Run", 30)])
+
+    def test_ndjson_batch(self):
+        body = "\n".join(json.dumps(op) for op in self.operations()) + "\n\n"
+        response = self.client.post("/habits/batch/", body, content_type="application/x-ndjson")
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.json()["completed"], 3)
+
+        before = self.counts()
+        response = self.client.post("/habits/batch/", '{"op": "complete", "habit": "r1"}\n{"op": ', content_type="application/x-ndjson")
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("line 2", response.json()["detail"])
+        self.assertEqual(self.counts(), before)
+
+    def test_invalid_operation_writes_nothing(self):
+        before = self.counts()
+        for bad in (
+            {"op": "complete", "habit": str(self.others.pk)},  # Someone else's habit
+            {"op": "complete", "habit": "r2"},  # Unknown ref
+            {"op": "log_time", "habit": "r1"},  # No time_spent
+            {"op": "explode"},
+        ):
+            with self.subTest(bad=bad):
+                response = self.client.post("/habits/batch/", self.operations() + [bad], format="json")
+                self.assertEqual(response.status_code, 400)
+                self.assertEqual([error["index"] for error in response.json()["errors"]], [6])
+                self.assertEqual(self.counts(), before)
+        self.assertEqual(self.client.post("/habits/batch/", [], format="json").status_code, 400)
+
+    def test_backfilled_days_do_not_revive_a_lapsed_streak(self):
+        self.run.completed, self.run.completed_at = True, self.today - timedelta(days=7)
+        self.run.save()
+        operations = [{"op": "complete", "habit": str(self.run.pk), "date": (self.today - timedelta(days=d)).isoformat()} for d in (9, 8)]
+        self.assertEqual(self.client.post("/habits/batch/", operations, format="json").status_code, 201)
+        self.run.refresh_from_db()
+        self.assertEqual((self.run.streak, self.run.longest_streak), (0, 3))
+        self.assertEqual((self.run.calculate_streak(), Habit.objects.filter(pk=self.run.pk).streaks()[self.run.pk]), (0, (0, 3)))
+
+    def test_failure_mid_batch_rolls_back(self):
+        before = self.counts()
+        with patch("habits.batch.record_time_logs", side_effect=RuntimeError("disk full")):
+            with self.assertRaises(RuntimeError):
+                apply_batch(self.user, self.operations())
+        self.assertEqual(self.counts(), before)
+        self.run.refresh_from_db()
+        self.assertEqual((self.run.streak, self.run.completed), (0, False))
+
+
+class TimeRollupTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user("timer", password="secret-pass")
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.read = Habit.objects.create(user=self.user, name="Read")
+        self.run = Habit.objects.create(user=self.user, name="Run")
+
+    def log_time(self):
+        for minutes in (15, 25):
+            self.assertEqual(self.client.post(f"/habits/time-spent-log/{self.read.pk}/", {"time_spent": minutes}, format="json").status_code, 201)
+        operations = [
+            {"op": "log_time", "habit": str(habit.pk), "time_spent": minutes, "date": day}
+            for habit, minutes, day in (
+                (self.read, 30, "2025-12-31"), (self.read, 40, "2026-01-01"), (self.read, 5, "2026-01-01"),
+                (self.read, 50, "2026-02-01"), (self.run, 60, "2026-01-04"), (self.run, 10, "2026-01-05"),
+            )
+        ]
+        self.assertEqual(self.client.post("/habits/batch/", operations, format="json").status_code, 201)
+
+    def raw_sums(self):
+        """ {(habit id, period, start): (minutes, logs)} computed straight from the logs. """
+        sums = {}
+        for habit_id, day, minutes in HabitTimeLog.objects.values_list("habit_id", "date", "time_spent"):
+            for period in PERIODS:
+                key = (habit_id, period, period_start(period, day))
+                total, count = sums.get(key, (0, 0))
+                sums[key] = (total + minutes, count + 1)
+        return sums
+
+    def rollups(self):
+        rows = HabitTimeRollup.objects.values_list("habit_id", "period", "period_start", "total_minutes", "log_count")
+        return {(habit_id, period, start): (minutes, count) for habit_id, period, start, minutes, count in rows}
+
+    def test_rollups_match_the_raw_logs(self):
+        self.log_time()
+        expected = self.raw_sums()
+        self.assertEqual(self.rollups(), expected)
+        self.assertEqual(expected[(self.run.pk, HabitTimeRollup.WEEK, date(2025, 12, 29))], (60, 1))  # Sunday the 4th
+        self.assertEqual(rebuild_rollups(), len(expected))
+        self.assertEqual(self.rollups(), expected)
+
+    def test_logs_default_to_the_users_local_day(self):
+        UserProfile.objects.create(user=self.user, timezone="America/Los_Angeles")
+        evening = datetime(2026, 2, 1, 4, 0, tzinfo=dt_timezone.utc)  # 20:00 on 31 January in Los Angeles
+        with patch("habits.timezones.now", return_value=evening):
+            self.client.post(f"/habits/time-spent-log/{self.read.pk}/", {"time_spent": 30}, format="json")
+        self.assertEqual(HabitTimeLog.objects.get().date, date(2026, 1, 31))
+        self.assertEqual(self.rollups()[(self.read.pk, HabitTimeRollup.MONTH, date(2026, 1, 1))], (30, 1))
+
+    def test_time_spent_view_reads_the_rollups(self):
+        self.log_time()
+        data = self.client.get(f"/habits/time-spent/{self.read.pk}/").json()
+        self.assertEqual(data["total_time_spent"], 165)
+        self.assertEqual(data["total_time_spent"], HabitTimeLog.objects.filter(habit=self.read).aggregate(total=Sum("time_spent"))["total"])
+
+        data = self.client.get(f"/habits/time-spent/{self.read.pk}/?from=2025-12-15&to=2026-02-10&granularity=month").json()
+        self.assertEqual(data["time_spent"], [
+            {"period_start": "2025-12-01", "time_spent": 30},
+            {"period_start": "2026-01-01", "time_spent": 45},
+            {"period_start": "2026-02-01", "time_spent": 50},
+        ])
+        data = self.client.get(f"/habits/time-spent/{self.run.pk}/?from=2026-01-01&to=2026-01-31&granularity=week").json()
+        self.assertEqual([bucket["time_spent"] for bucket in data["time_spent"]], [60, 10])
+        for query in ("granularity=year", "from=2026-02-01&to=2026-01-01", "from=soon"):
+            self.assertEqual(self.client.get(f"/habits/time-spent/{self.run.pk}/?{query}").status_code, 400)
+
+
+class AsyncViewTests(TestCase):
+    """ The /async/ views must answer exactly as their sync counterparts. """
+
+    paths = [
+        "habits/",
+        "habits/?fields=id,name&page_size=1",
+        "habits/streaks/",
+        "progress/weekly-summary/?days=30",
+        "progress/weekly-summary/?days=365",
+        "progress/weekly-summary/?days=366",  # Refused by both
+        "habits/progress-calendar/",
+        "habits/daily-reminders/",
+        "habits/guide/",
+    ]
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user("awaiter", password="secret-pass")
+        today = now().date()
+        for name, days_ago in (("Read", [0, 1, 2]), ("Run", [3, 10]), ("Idle", [])):
+            habit = Habit.objects.create(user=self.user, name=name)
+            for days in days_ago:
+                habit.completed, habit.completed_at = True, today - timedelta(days=days)
+                habit.save()
+        self.client.force_login(self.user)
+
+    def content(self, response):
+        if response.streaming:
+            return b"".join(response.streaming_content)
+        return response.content
+
+    def fetch(self, *requests, login=True):
+        """ Run (method, path, headers) requests through an AsyncClient; returns (status, headers, body) tuples. """
+        client = AsyncClient()
+
+        async def run():
+            if login:
+                await client.aforce_login(self.user)
+            results = []
+            for method, path, headers in requests:
+                response = await getattr(client, method)(path, headers=headers)
+                body = b"".join([chunk async for chunk in response.streaming_content]) if response.streaming else response.content
+                results.append((response.status_code, response, body))
+            return results
+        return async_to_sync(run)()
+
+    def test_payloads_match_the_sync_views(self):
+        responses = self.fetch(*[("get", f"/async/{path}", {}) for path in self.paths])
+        for path, (status, _, body) in zip(self.paths, responses):
+            with self.subTest(path=path):
+                expected = self.client.get(f"/{path}")
+                self.assertEqual(status, expected.status_code)
+                data = json.loads(body)
+                if data.get("next"):
+                    data["next"] = data["next"].replace("/async/", "/")  # Next-page links point back at the async view
+                self.assertEqual(data, json.loads(self.content(expected)))
+
+    def test_habit_list_revalidates(self):
+        (_, first, _), = self.fetch(("get", "/async/habits/", {}))
+        (status, _, body), = self.fetch(("get", "/async/habits/", {"If-None-Match": first["ETag"]}))
+        self.assertEqual((status, body), (304, b""))
+
+    def test_refuses_anonymous_requests_and_writes(self):
+        (status, _, body), = self.fetch(("get", "/async/habits/", {}), login=False)
+        self.assertEqual(status, 403)
+        self.assertIn("detail", json.loads(body))
+        (status, _, _), = self.fetch(("get", "/async/motivation/quotes/", {}), login=False)
+        self.assertEqual(status, 200)
+        (status, _, _), = self.fetch(("post", "/async/habits/", {}))
+        self.assertEqual(status, 405)
+
+
+class DatabaseSetupTests(TestCase):
+    def test_sqlite_connections_are_tuned(self):
+        if connection.vendor != "sqlite":
+            self.skipTest("SQLite only")
+        with connection.cursor() as cursor:
+            pragmas = {name: cursor.execute(f"PRAGMA {name}").fetchone()[0] for name in ("busy_timeout", "synchronous", "cache_size")}
+        self.assertEqual(pragmas, {"busy_timeout": 5000, "synchronous": 1, "cache_size": -20000})  # 1 = NORMAL
+        self.assertEqual(connection.settings_dict["OPTIONS"]["transaction_mode"], "IMMEDIATE")
+        self.assertIn("PRAGMA journal_mode=wal", connection.settings_dict["OPTIONS"]["init_command"])  # :memory: test databases can't use WAL
+
+    def test_database_urls(self):
+        pragmas = {"journal_mode": "wal"}
+        self.assertEqual(database_from_url("sqlite:////srv/habits.sqlite3", pragmas)["NAME"], "/srv/habits.sqlite3")
+        self.assertEqual(database_from_url("sqlite:///habits.sqlite3", pragmas)["OPTIONS"]["init_command"], "PRAGMA journal_mode=wal")
+
+        with patch.dict(os.environ, {"DATABASE_POOL_MAX_SIZE": "4"}):
+            database = database_from_url("postgresql://app:p%40ss@/habits?host=/var/run/postgresql&sslmode=disable", pragmas)
+        self.assertEqual(
+            (database["NAME"], database["USER"], database["PASSWORD"], database["HOST"], database["CONN_MAX_AGE"]),
+            ("habits", "app", "p@ss", "/var/run/postgresql", 0),
+        )
+        self.assertEqual(database["OPTIONS"], {"sslmode": "disable", "pool": {"min_size": 2, "max_size": 4, "timeout": 10}})
+        with patch.dict(os.environ, {"DATABASE_POOL_MAX_SIZE": "0"}):
+            self.assertEqual(database_from_url("postgres://db.internal:6432/habits", pragmas)["CONN_MAX_AGE"], 600)
+        with self.assertRaises(ImproperlyConfigured):
+            database_from_url("mysql://localhost/habits", pragmas)
+
+    def test_report_reads_use_the_read_alias(self):
+        router = ReportReadRouter()
+
+        class View:
+            @use_read_database
+            def get(self, request):
+                response = StreamingHttpResponse(router.db_for_read(Habit) for _ in range(2))
+                response["X-Alias"] = router.db_for_read(Habit) or ""
+                return response
+
+        self.assertIsNone(router.db_for_read(Habit))
+        response = View().get(None)
+        self.assertEqual((response["X-Alias"], list(response.streaming_content)), ("", [b"None", b"None"]))  # No "read" configured
+
+        with patch.dict(settings.DATABASES, {READ_ALIAS: settings.DATABASES["default"]}):
+            response = View().get(None)
+            self.assertEqual((response["X-Alias"], list(response.streaming_content)), ("read", [b"read", b"read"]))
+            self.assertIsNone(router.db_for_read(Habit))
+            self.assertIsNone(router.db_for_write(Habit))
+        self.assertIs(router.allow_migrate(READ_ALIAS, "habits"), False)
+        self.assertIsNone(router.allow_migrate("default", "habits"))
+
+
+class MetricsTests(TestCase):
+    def setUp(self):
+        registry.clear()
+        self.addCleanup(registry.clear)
+        self.user = User.objects.create_user("scraper", password="secret-pass")
+
+    def sample(self, text, name, view):
+        match = re.search(rf'^habit_tracker_{name}{{view="{view}",method="GET"}} (\S+)$', text, re.M)
+        return float(match.group(1)) if match else None
+
+    def test_metrics_require_a_token_an_internal_address_or_staff(self):
+        self.assertEqual(self.client.get("/metrics").status_code, 403)
+        self.client.force_login(self.user)
+        self.assertEqual(self.client.get("/metrics").status_code, 403)
+        self.user.is_staff = True
+        self.user.save()
+        self.assertEqual(self.client.get("/metrics").status_code, 200)
+        self.client.logout()
+
+        with patch.dict("habits.metrics.METRICS_SETTINGS", {"TOKEN": "s3cret"}):
+            self.assertEqual(self.client.get("/metrics", headers={"Authorization": "Bearer wrong"}).status_code, 403)
+            self.assertEqual(self.client.get("/metrics", headers={"Authorization": "Bearer s3cret"}).status_code, 200)
+        with patch.dict("habits.metrics.METRICS_SETTINGS", {"INTERNAL_NETWORKS": ("127.0.0.0/8",)}):
+            self.assertEqual(self.client.get("/metrics").status_code, 200)
+        with patch.dict("habits.metrics.METRICS_SETTINGS", {"PUBLIC": True}):
+            self.assertEqual(self.client.get("/metrics").status_code, 200)
+
+    def test_async_requests_are_recorded_with_their_queries(self):
+        Habit.objects.create(user=self.user, name="Read")
+        client = AsyncClient()
+
+        async def fetch():
+            await client.aforce_login(self.user)
+            return await client.get("/async/habits/")
+
+        self.assertEqual(async_to_sync(fetch)().status_code, 200)
+        with patch.dict("habits.metrics.METRICS_SETTINGS", {"PUBLIC": True}):
+            text = self.client.get("/metrics").content.decode()
+        self.assertEqual(self.sample(text, "db_queries_per_request_count", "async-habit-list"), 1)
+        self.assertGreaterEqual(self.sample(text, "db_queries_per_request_sum", "async-habit-list"), 2)  # Session, then habits
+
+
+class TokenCacheTests(TestCase):
+    """ Another worker's cached copy of a token must stop working once the token is revoked or its user deactivated. """
+
+    def setUp(self):
+        cache.clear()
+        token_cache.clear()
+        shared_token_hits.reset()
+        self.addCleanup(token_cache.clear)
+        self.user = User.objects.create_user("keyholder", password="secret-pass")
+        self.key = Token.objects.create(user=self.user).key
+
+    def get(self):
+        response = self.client.get("/habits/", headers={"Authorization": f"Token {self.key}"})
+        return response.status_code if response.status_code == 200 else response.json()["detail"]
+
+    def test_revoked_token_is_refused_by_every_worker(self):
+        self.assertEqual(self.get(), 200)
+        with self.assertNumQueries(2):  # The view's validators and page; the token comes from the cache
+            self.assertEqual(self.get(), 200)
+        elsewhere = token_cache.get(self.key)
+        Token.objects.get(key=self.key).delete()
+        token_cache.set(self.key, elsewhere)  # Still cached by a worker that didn't see the delete
+        self.assertEqual(self.get(), "Invalid token.")
+
+    def test_deactivated_user_is_refused_by_every_worker(self):
+        with patch.dict("habits.authentication.TOKEN_CACHE_SETTINGS", {"SHARED_CACHE": "default"}):
+            self.assertEqual(self.get(), 200)
+            elsewhere = token_cache.get(self.key)
+            shared = cache.get(shared_token_cache_key(self.key))
+            self.user.is_active = False
+            self.user.save()
+            token_cache.set(self.key, elsewhere)
+            cache.set(shared_token_cache_key(self.key), shared)
+            self.assertEqual(self.get(), "User inactive or deleted.")
+
+            self.user.is_active = True
+            self.user.save()
+            self.assertEqual(self.get(), 200)
+
+    def test_token_revoked_while_loading_is_not_cached(self):
+        select_related = Token.objects.select_related
+
+        def revoked_meanwhile(*fields):
+            revoke_credentials(self.user.pk)  # e.g. a password change committed by another request
+            return select_related(*fields)
+
+        with patch.dict("habits.authentication.TOKEN_CACHE_SETTINGS", {"SHARED_CACHE": "default"}):
+            with patch.object(Token.objects, "select_related", side_effect=revoked_meanwhile):
+                self.assertEqual(self.get(), 200)
+            self.assertIsNone(token_cache.get(self.key))
+            self.assertIsNone(cache.get(shared_token_cache_key(self.key)))
+
+            self.assertEqual(self.get(), 200)  # Loaded and cached under the current version
+            token_cache.clear()
+            self.assertEqual(self.get(), 200)  # From the shared tier
+        self.assertEqual(token_cache_stats()["shared_hits"], 1)
+
+
+class BasicAuthCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        basic_auth_cache.clear()
+        self.addCleanup(basic_auth_cache.clear)
+        self.user = User.objects.create_user("basic", password="old-pass")
+
+    def get(self, password):
+        credentials = base64.b64encode(f"basic:{password}".encode()).decode()
+        response = self.client.get("/habits/", headers={"Authorization": f"Basic {credentials}"})
+        return response.status_code if response.status_code == 200 else response.json()["detail"]
+
+    def test_password_change_voids_other_workers_entries(self):
+        self.assertEqual(self.get("old-pass"), 200)
+        key = credentials_cache_key("basic", "old-pass")
+        elsewhere = basic_auth_cache.get(key)
+        self.user.set_password("new-pass")
+        self.user.save()
+        basic_auth_cache.set(key, elsewhere)  # Still cached by a worker that didn't see the save
+        self.assertEqual(self.get("old-pass"), "Invalid username/password.")
+        self.assertEqual(self.get("new-pass"), 200)
+
+    def test_only_credential_changes_evict(self):
+        self.assertEqual(self.get("old-pass"), 200)
+        user = User.objects.get(pk=self.user.pk)
+        user.first_name = "Bea"
+        user.save()
+        User.objects.get(pk=self.user.pk).save(update_fields=["last_login"])
+        with self.assertNumQueries(2):  # The view's validators and page; no user lookup
+            self.assertEqual(self.get("old-pass"), 200)
+
+        user.is_active = False
+        user.save()
+        self.assertEqual(self.get("old-pass"), "Invalid username/password.")  # ModelBackend refuses inactive users
+
+    def test_change_during_verification_is_not_cached(self):
+        verify = BasicAuthentication.authenticate_credentials
+
+        def changed_meanwhile(auth, userid, password, request=None):
+            result = verify(auth, userid, password, request)
+            revoke_credentials(self.user.pk)  # e.g. a password change saved by another request
+            return result
+
+        with patch.object(BasicAuthentication, "authenticate_credentials", changed_meanwhile):
+            self.assertEqual(self.get("old-pass"), 200)
+        self.assertIsNone(basic_auth_cache.get(credentials_cache_key("basic", "old-pass")))
+
+
+class ResponseCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user("cached", password="secret-pass")
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def summary(self, etag=""):
+        response = self.client.get("/progress/weekly-summary/", headers={"If-None-Match": etag})
+        body = json.loads(b"".join(response.streaming_content)) if response.status_code == 200 else None
+        return response, body
+
+    def test_writes_invalidate_cached_responses(self):
+        habit = Habit.objects.create(user=self.user, name="Read")
+        first, body = self.summary()
+        self.assertEqual([row["habit"] for row in body["weekly_summary"]], ["Read"])
+        with self.assertNumQueries(0):
+            self.assertEqual(self.summary(first["ETag"])[0].status_code, 304)
+            self.assertEqual(self.summary()[1], body)
+
+        self.client.post("/habits/", {"name": "Run"}, format="json")
+        second, body = self.summary(first["ETag"])
+        self.assertEqual(second.status_code, 200)
+        self.assertEqual([row["habit"] for row in body["weekly_summary"]], ["Read", "Run"])
+
+        HabitTimeLog.objects.create(habit=habit, user=self.user, time_spent=25)
+        self.assertNotEqual(self.summary()[0]["ETag"], second["ETag"])
+        habit.delete()
+        self.assertEqual([row["habit"] for row in self.summary()[1]["weekly_summary"]], ["Run"])
+
+    def test_several_workers_need_a_shared_cache(self):
+        with override_settings(WORKER_PROCESSES=2):
+            with self.assertRaises(ImproperlyConfigured):
+                check_version_cache()
+            with tempfile.TemporaryDirectory() as directory:
+                shared = {"default": {"BACKEND": "django.core.cache.backends.filebased.FileBasedCache", "LOCATION": directory}}
+                with override_settings(CACHES=shared):
+                    check_version_cache()
+        check_version_cache()  # One process may keep its own cache
+
+
+class ReportTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user("reporter", password="secret-pass")
+        self.habit = Habit.objects.create(user=self.user, name="Read", completed=True, completed_at=now().date())
+        reports_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(reports_dir.cleanup)
+        self.root = Path(reports_dir.name)
+        reports_override = override_settings(REPORTS_ROOT=reports_dir.name, REPORT_WORKERS=1)
+        reports_override.enable()
+        self.addCleanup(reports_override.disable)
+        self.queued = []
+        executor = patch("habits.reports.get_executor")
+        executor.start().return_value.submit.side_effect = lambda function, job_id: self.queued.append(job_id)
+        self.addCleanup(executor.stop)
+
+    def key(self, today):
+        return report_cache_key(self.user, "daily", today, data_version(self.user, "daily", today))
+
+    def test_build_files_the_rows_it_rendered(self):
+        today = now().date()
+        job = enqueue_report(self.user, "daily", today)
+        self.assertEqual(self.queued, [job.pk])
+        Habit.objects.filter(pk=self.habit.pk).update(progress=50)  # Changes between the request and the build
+        build_report(job.pk)
+
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.cache_key), (ReportJob.DONE, self.key(today)))
+        self.assertEqual([path.name for path in self.root.iterdir()], [f"{job.cache_key}.pdf"])
+
+        again = enqueue_report(self.user, "daily", today)  # Same rows: reuses the file
+        self.assertEqual((again.status, again.cache_key, self.queued), (ReportJob.DONE, job.cache_key, [job.pk]))
+
+    def test_rows_are_streamed(self):
+        Habit.objects.create(user=self.user, name="Run", completed=True, completed_at=now().date())
+        rows = report_rows(self.user, "daily", now().date())
+        self.assertEqual(next(rows), ("Read", True, 1, 0))  # An iterator, not a list held in memory
+        self.assertEqual(list(rows), [("Run", True, 1, 0)])
+
+    def test_purge_removes_old_files_and_jobs(self):
+        today = now().date()
+        old = enqueue_report(self.user, "daily", today)
+        build_report(old.pk)
+        old.refresh_from_db()
+        self.client.force_login(self.user)
+        download = f"/reports/jobs/{old.pk}/download/"
+        self.assertEqual(self.client.get(download).status_code, 200)
+
+        week_ago = time.time() - 8 * 24 * 3600
+        os.utime(report_path(old.cache_key), (week_ago, week_ago))
+        (self.root / "crashed.tmp").touch()
+        os.utime(self.root / "crashed.tmp", (week_ago, week_ago))
+        ReportJob.objects.filter(pk=old.pk).update(created_at=now() - timedelta(days=8))
+        fresh = enqueue_report(self.user, "weekly", today)
+        self.assertEqual(purge_reports(), (2, 1))
+        self.assertEqual(self.client.get(download).status_code, 404)
+        self.assertTrue(ReportJob.objects.filter(pk=fresh.pk).exists())
+
+        Habit.objects.create(user=self.user, name="Run", completed=True, completed_at=today)
+        reused = enqueue_report(self.user, "daily", today)
+        build_report(reused.pk)
+        os.utime(report_path(self.key(today)), (week_ago, week_ago))
+        self.assertEqual(enqueue_report(self.user, "daily", today).status, ReportJob.DONE)  # Reuse renews the file
+        self.assertEqual(purge_reports(), (0, 0))
+
+
+class HabitFrequencyTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user("frequency", password="secret-pass")
+        user_timezone(self.user.pk)  # Warm the cached timezone, as on a worker that has served the user
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.habit = Habit.objects.create(user=self.user, name="Stretch")
+        self.today = now().date()
+        HabitCompletion.objects.bulk_create([
+            HabitCompletion(habit=self.habit, user=self.user, date=self.today - timedelta(days=d)) for d in (0, 1, 2, 5, 40)
+        ])
+
+    def test_daily_buckets_are_zero_filled(self):
+        with self.assertNumQueries(2):
+            data = self.client.get(f"/habits/frequency-over-time/{self.habit.pk}/?days=7").json()
+        expected = {str(self.today - timedelta(days=d)): int(d in (0, 1, 2, 5)) for d in range(7, -1, -1)}
+        self.assertEqual(data["frequency"], expected)
+        self.assertEqual(list(data["frequency"]), list(expected))
+        self.assertEqual(data["total"], 4)
+
+    def test_weekly_and_monthly_buckets(self):
+        for granularity in ("week", "month"):
+            with self.subTest(granularity=granularity):
+                data = self.client.get(f"/habits/frequency-over-time/{self.habit.pk}/?days=60&granularity={granularity}").json()
+                self.assertEqual(data["total"], 5)
+                starts = [date.fromisoformat(day) for day in data["frequency"]]
+                if granularity == "week":
+                    self.assertTrue(all(day.weekday() == 0 for day in starts))
+                    self.assertEqual([(b - a).days for a, b in zip(starts, starts[1:])], [7] * (len(starts) - 1))
+                else:
+                    self.assertTrue(all(day.day == 1 for day in starts))
+
+    def test_rejects_invalid_parameters(self):
+        for query in ("days=abc", "days=0", "days=100000", "granularity=year"):
+            response = self.client.get(f"/habits/frequency-over-time/{self.habit.pk}/?{query}")
+            self.assertEqual(response.status_code, 400, query)
+        other = Habit.objects.create(user=User.objects.create_user("someone"), name="Theirs")
+        self.assertEqual(self.client.get(f"/habits/frequency-over-time/{other.pk}/").status_code, 404)
+
+
+class LeaderboardTests(TestCase):
+    def setUp(self):
+        leaderboards.clear()  # The index outlives each test's transaction
+        self.addCleanup(leaderboards.clear)
+        self.users = [User.objects.create_user(f"runner{i}", password="secret-pass") for i in range(4)]
+        self.client = APIClient()
+        self.client.force_authenticate(self.users[0])
+
+    def complete_days(self, user, name, days):
+        habit = Habit.objects.create(user=user, name=name)
+        start = now().date() - timedelta(days=days)
+        for offset in range(days):
+            habit.completed, habit.completed_at = True, start + timedelta(days=offset)
+            habit.save()
+        return habit
+
+    def test_score_index_matches_sorting(self):
+        rng = random.Random(0)
+        scores = [rng.randrange(40) for _ in range(500)]
+        index = ScoreIndex({score: scores.count(score) for score in set(scores)})
+        for score in [rng.randrange(200) for _ in range(200)]:  # Grows past the initial capacity
+            index.add(score)
+            scores.append(score)
+        for removed in scores[:100]:
+            index.add(removed, -1)
+        scores = scores[100:]
+        for score in range(0, 210, 7):
+            self.assertEqual(index.rank(score), 1 + sum(s > score for s in scores))
+            self.assertAlmostEqual(index.percentile(score), 100 * sum(s < score for s in scores) / len(scores))
+
+    def test_score_index_size_is_bounded(self):
+        index = ScoreIndex({2 ** 31 - 1: 1, 5: 2})
+        index.add(2 ** 40)
+        self.assertLessEqual(len(index.tree), MAX_SCORE + 2)
+        self.assertEqual((index.rank(2 ** 31 - 1), index.rank(MAX_SCORE), index.rank(5), index.total), (1, 1, 3, 4))
+        index.add(2 ** 31 - 1, -1)
+        self.assertEqual(index.rank(5), 2)
+
+    def test_rankings_follow_streak_changes(self):
+        run = self.complete_days(self.users[0], "Morning run", 3)
+        self.complete_days(self.users[1], "Run", 5)
+        self.complete_days(self.users[2], "Read", 2)
+        self.assertEqual(dict(StreakRanking.objects.filter(user=self.users[0]).values_list("board", "streak")), {
+            StreakRanking.OVERALL: 3, "Fitness & Exercise": 3,
+        })
+
+        data = self.client.get("/leaderboard/?category=Fitness %26 Exercise").json()["leaderboards"]
+        self.assertEqual(data, [{
+            "category": "Fitness & Exercise",
+            "participants": 2,
+            "top": [{"rank": 1, "username": "runner1", "streak": 5}, {"rank": 2, "username": "runner0", "streak": 3}],
+            "you": {"streak": 3, "rank": 2, "percentile": 0.0},
+        }])
+
+        run.completed = False
+        run.save()  # Unmarking resets the streak, which drops the user from the boards
+        self.assertFalse(StreakRanking.objects.filter(user=self.users[0]).exists())
+        boards = {board["category"]: board for board in self.client.get("/leaderboard/").json()["leaderboards"]}
+        self.assertEqual(boards["Overall"]["participants"], 2)
+        self.assertIsNone(boards["Overall"]["you"])
+        self.assertEqual([entry["username"] for entry in boards["Overall"]["top"]], ["runner1", "runner2"])
+        self.assertEqual(boards["Learning & Productivity"]["top"], [{"rank": 1, "username": "runner2", "streak": 2}])
+
+    def test_clients_cannot_write_streaks(self):
+        habit = Habit.objects.create(user=self.users[0], name="Run")
+        response = self.client.patch(f"/habits/{habit.pk}/", {
+            "streak": 100000, "longest_streak": 100000, "last_completed": "2026-01-01",
+            "completed_at": "2026-01-01", "category": "Cheating",
+        }, format="json")
+        self.assertEqual(response.status_code, 200)
+        habit.refresh_from_db()
+        self.assertEqual((habit.streak, habit.longest_streak, habit.last_completed, habit.completed_at), (0, 0, None, None))
+        self.assertEqual(habit.category, "Fitness & Exercise")
+        self.assertFalse(StreakRanking.objects.exists())
+
+    def test_rejects_invalid_parameters(self):
+        for query in ("category=Knitting", "limit=0", "limit=abc", "limit=1000"):
+            self.assertEqual(self.client.get(f"/leaderboard/?{query}").status_code, 400, query)
+
+
+class DailyRolloverTests(TestCase):
+    def setUp(self):
+        leaderboards.clear()
+        self.addCleanup(leaderboards.clear)
+        self.user = User.objects.create_user("owl", password="secret-pass")
+        UserProfile.objects.create(user=self.user, timezone="Pacific/Auckland")
+        self.other = User.objects.create_user("lark", password="secret-pass")  # No profile: UTC
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def habit(self, user, name, last_completed, streak, completed):
+        habit = Habit.objects.create(user=user, name=name)
+        Habit.objects.filter(pk=habit.pk).update(
+            completed=completed, completed_at=last_completed if completed else None,
+            last_completed=last_completed, streak=streak, longest_streak=streak,
+        )
+        return habit
+
+    def test_rollover_resets_completions_and_expires_missed_streaks(self):
+        today = local_today("Pacific/Auckland")
+        yesterday = self.habit(self.user, "Read", today - timedelta(days=1), 3, True)
+        self.habit(self.user, "Run", today - timedelta(days=3), 2, True)
+        self.habit(self.user, "Stretch", today, 4, True)
+        self.habit(self.other, "Walk", local_today("UTC") - timedelta(days=1), 5, True)
+
+        results = {result["timezone"]: result for result in run_due_rollovers(workers=0)}
+        self.assertEqual(results["Pacific/Auckland"], {
+            "timezone": "Pacific/Auckland", "date": today, "users": 1, "reset": 2, "expired": 1,
+        })
+        self.assertEqual(results["UTC"]["users"], 1)
+        self.assertEqual(run_due_rollovers(workers=0), [])  # Nothing due until the next local midnight
+        self.assertEqual(DailyRollover.objects.get(timezone="Pacific/Auckland").date, today)
+
+        states = {habit.name: (habit.completed, habit.completed_at, habit.streak) for habit in Habit.objects.all()}
+        self.assertEqual(states, {
+            "Read": (False, None, 3),  # Still continues if completed today
+            "Run": (False, None, 0),
+            "Stretch": (True, today, 4),
+            "Walk": (False, None, 5),
+        })
+        self.assertEqual(dict(StreakRanking.objects.filter(user=self.user, board="").values_list("board", "streak")), {"": 4})
+
+        yesterday.refresh_from_db()
+        yesterday.description = "Ten pages"
+        yesterday.save()  # Editing a rolled-over habit keeps its streak
+        yesterday.completed = True
+        yesterday.save()
+        self.assertEqual((yesterday.streak, yesterday.completed_at), (4, today))
+
+    def test_streak_views_agree_with_the_stored_streaks(self):
+        today = local_today("Pacific/Auckland")
+        for name, days_ago in (("Read", [1, 2, 3]), ("Run", [3, 4]), ("Stretch", [0, 1])):
+            habit = self.habit(self.user, name, today - timedelta(days=days_ago[0]), len(days_ago), True)
+            HabitCompletion.objects.bulk_create(HabitCompletion(habit=habit, user=self.user, date=today - timedelta(days=d)) for d in days_ago)
+        run_due_rollovers(workers=0)
+
+        stored = dict(Habit.objects.filter(user=self.user).values_list("name", "streak"))
+        self.assertEqual(stored, {"Read": 3, "Run": 0, "Stretch": 2})  # Read is no longer `completed` but its streak lives on
+        self.assertEqual(self.client.get("/habits/streaks/").json()["habit_streaks"], stored)
+        self.assertEqual(self.client.get("/async/habits/streaks/").json()["habit_streaks"], stored)
+
+    def test_completions_use_the_users_local_day(self):
+        sydney = User.objects.create_user("roo")
+        UserProfile.objects.create(user=sydney, timezone="Australia/Sydney")
+        habit = Habit.objects.create(user=sydney, name="Swim")
+        morning = datetime(2026, 3, 10, 22, 30, tzinfo=dt_timezone.utc)  # 09:30 on the 11th in Sydney
+        for day in range(2):
+            moment = morning + timedelta(days=day)
+            run_due_rollovers(moment=moment - timedelta(hours=8), workers=0)  # 01:30 local, the night's rollover
+            habit.refresh_from_db()
+            with patch("habits.timezones.now", return_value=moment):
+                habit.completed = True
+                habit.save()
+        self.assertEqual((habit.completed_at, habit.streak), (date(2026, 3, 12), 2))
+
+        with patch("habits.timezones.now", return_value=morning + timedelta(days=1)):
+            client = APIClient()
+            client.force_authenticate(sydney)
+            response = client.get(f"/check-completion/{habit.pk}/").json()
+        self.assertIn("✅", response["message"])
+
+    def test_unmarking_withdraws_the_completion(self):
+        habit = Habit.objects.create(user=self.user, name="Floss")
+        today = local_today(user_timezone(self.user.pk))
+
+        def views():
+            return (
+                self.client.get("/habits/streaks/").json()["habit_streaks"],
+                self.client.get("/habits/milestones/rewards/").json().get("milestone_rewards"),
+                self.client.get("/habits/progress-calendar/").json()["calendar"][str(today.day)],
+            )
+
+        self.client.patch(f"/habits/{habit.pk}/", {"completed": True}, format="json")
+        self.assertEqual(views()[0], {"Floss": 1})
+        self.assertEqual(views()[2], ["Floss"])
+
+        self.client.patch(f"/habits/{habit.pk}/", {"completed": False}, format="json")
+        habit.refresh_from_db()
+        self.assertEqual((habit.streak, habit.longest_streak, habit.last_completed, habit.completed_at), (0, 0, None, None))
+        self.assertFalse(HabitCompletion.objects.filter(habit=habit).exists())
+        self.assertFalse(HabitCalendarMonth.objects.filter(habit=habit).exists())
+        self.assertEqual(views(), ({"Floss": 0}, None, []))
+        self.assertIn("❌", self.client.get(f"/check-completion/{habit.pk}/").json()["message"])
+
+        self.client.patch(f"/habits/{habit.pk}/", {"completed": True}, format="json")  # Marked again the same day
+        self.assertEqual(views()[0], {"Floss": 1})
+
+    def test_reminders_are_served_from_the_digest(self):
+        self.assertEqual(self.client.get("/habits/daily-reminders/").json(), {"message": "You have no habits added yet."})
+        habit = Habit.objects.create(user=self.user, name="Journal")
+        Habit.objects.create(user=self.user, name="Floss")
+        run_due_rollovers(workers=0)
+        digest = ReminderDigest.objects.get(user=self.user)
+        self.assertEqual((digest.date, digest.timezone), (local_today("Pacific/Auckland"), "Pacific/Auckland"))
+
+        cache.clear()
+        with CaptureQueriesContext(connection) as queries:
+            reminders = self.client.get("/habits/daily-reminders/").json()["daily_reminders"]
+        self.assertEqual(len([q for q in queries if "habits_habit" in q["sql"]]), 0)
+        self.assertEqual([r["habit"] for r in reminders], ["Journal", "Floss"])
+        self.assertTrue(reminders[0]["message"].startswith("⏰"))
+
+        habit.completed = True
+        habit.save()  # Drops the digest; the next read rebuilds it
+        self.assertFalse(ReminderDigest.objects.filter(user=self.user).exists())
+        reminders = self.client.get("/habits/daily-reminders/").json()["daily_reminders"]
+        self.assertEqual(reminders[0]["message"], "🎉 Congrats! You've completed 'Journal' today!")
+        self.assertEqual(self.client.get("/async/habits/daily-reminders/").json()["daily_reminders"], reminders)
+
+    def test_profile_timezone_is_validated(self):
+        response = self.client.patch("/profile/update/", {"timezone": "Mars/Olympus"}, format="json")
+        self.assertEqual(response.status_code, 400)
+        response = self.client.patch("/profile/update/", {"timezone": "Europe/Berlin"}, format="json")
+        self.assertEqual(response.json()["timezone"], "Europe/Berlin")
+        self.assertEqual(self.client.get("/profile/view/").json()["timezone"], "Europe/Berlin")
+
+
+class StubWebhookServer:
+    """ A local keep-alive HTTP server recording webhook POSTs and answering with scripted statuses. """
+
+    def __init__(self, statuses=(), delay=0):
+        self.statuses = list(statuses)  # Then 200s
+        self.delay = delay
+        self.requests = []  # (client port, headers, body)
+        self.in_flight = self.max_in_flight = 0
+        self.lock = threading.Lock()
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            disable_nagle_algorithm = True  # Headers and body go out in separate writes
+
+            def do_POST(self):
+                body = self.rfile.read(int(self.headers["Content-Length"]))
+                with stub.lock:
+                    stub.in_flight += 1
+                    stub.max_in_flight = max(stub.max_in_flight, stub.in_flight)
+                    stub.requests.append((self.client_address[1], self.headers, body))
+                    status = stub.statuses.pop(0) if stub.statuses else 200
+                time.sleep(stub.delay)
+                with stub.lock:
+                    stub.in_flight -= 1
+                self.send_response(status)
+                self.send_header("Content-Length", "2")
+                self.end_headers()
+                self.wfile.write(b"ok")
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self.server.server_port}/hooks"
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+def resolving(*addresses):
+    """ Patch the webhooks' DNS lookups so every host resolves to `addresses`. """
+    infos = [(socket.AF_INET6 if ":" in a else socket.AF_INET, socket.SOCK_STREAM, 6, "", (a, 0)) for a in addresses]
+    return patch("habits.webhooks.socket.getaddrinfo", return_value=infos)
+
+
+class WebhookTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user("hooked", password="secret-pass")
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def outbox(self, endpoint):
+        return sorted(OutboxEvent.objects.filter(endpoint=endpoint).values_list("event", flat=True))
+
+    def test_saves_queue_events_in_their_transaction(self):
+        with resolving("93.184.215.14"):
+            response = self.client.post("/webhooks/", {"url": "https://example.com/all"}, format="json")
+        self.assertEqual(response.status_code, 201)
+        everything = WebhookEndpoint.objects.get(pk=response.json()["id"])
+        self.assertEqual(len(response.json()["secret"]), 64)
+        completions = WebhookEndpoint.objects.create(user=self.user, url="https://example.com/done", events=["habit.completed"])
+        self.assertEqual(self.client.post("/webhooks/", {"url": "https://x.test/", "events": ["nope"]}, format="json").status_code, 400)
+
+        habit = Habit.objects.create(user=self.user, name="Meditate")
+        Habit.objects.filter(pk=habit.pk).update(streak=9, longest_streak=9, last_completed=now().date() - timedelta(days=1))
+        habit = Habit.objects.get(pk=habit.pk)
+        habit.completed = True
+        habit.save()  # Day 10: a completion and a milestone
+        self.client.post(f"/habits/set-goals/{habit.pk}/", {"goal": "20 minutes"}, format="json")
+        self.client.post(f"/habits/time-spent-log/{habit.pk}/", {"time_spent": 20}, format="json")
+        self.assertEqual(self.outbox(everything), ["habit.completed", "habit.goal_set", "habit.streak_milestone", "habit.time_logged"])
+        self.assertEqual(self.outbox(completions), ["habit.completed"])
+        milestone = OutboxEvent.objects.get(endpoint=everything, event="habit.streak_milestone").payload
+        self.assertEqual((milestone["streak"], milestone["milestone"]), (10, 10))
+
+        habit.description = "Breathing"
+        habit.save()  # Nothing webhook-worthy
+        try:
+            with transaction.atomic():
+                habit.goal = "30 minutes"
+                habit.save()
+                raise RuntimeError
+        except RuntimeError:
+            pass
+        self.assertEqual(OutboxEvent.objects.count(), 5)  # The rolled-back goal left no event
+
+    def test_endpoints_must_reach_public_addresses(self):
+        def register(url):
+            return self.client.post("/webhooks/", {"url": url}, format="json").status_code
+
+        for url in ("ftp://example.com/", "file:///etc/passwd", "http://127.0.0.1/", "http://[::1]:8000/",
+                    "http://169.254.169.254/latest/", "http://10.0.0.7/", "http://[::ffff:192.168.0.1]/"):
+            self.assertEqual(register(url), 400, url)
+        with resolving("93.184.215.14", "10.1.2.3"):
+            self.assertEqual(register("https://rebound.example/"), 400)  # Any private answer is refused
+        with patch("habits.webhooks.socket.getaddrinfo", side_effect=socket.gaierror(-2, "Name or service not known")):
+            self.assertEqual(register("https://nowhere.invalid/"), 400)
+        self.assertFalse(WebhookEndpoint.objects.exists())
+
+        stub = StubWebhookServer()
+        self.addCleanup(stub.close)
+        WebhookEndpoint.objects.create(user=self.user, url=stub.url)  # Bypassing the serializer
+        enqueue_events(self.user.pk, [("habit.completed", {"habit": 1})])
+        self.assertEqual(async_to_sync(dispatch)(once=True)["retried"], 1)
+        self.assertEqual(stub.requests, [])
+        self.assertIn("not a public address", OutboxEvent.objects.get().last_error)
+
+    @override_settings(WEBHOOK_ALLOW_PRIVATE_HOSTS=True)  # The stub receiver listens on 127.0.0.1
+    def test_dispatcher_retries_and_limits_concurrency(self):
+        stub = StubWebhookServer(statuses=[500], delay=0.05)
+        self.addCleanup(stub.close)
+        endpoint = WebhookEndpoint.objects.create(user=self.user, url=stub.url, max_concurrency=2)
+        enqueue_events(self.user.pk, [("habit.completed", {"habit": i}) for i in range(6)])
+
+        totals = async_to_sync(dispatch)(once=True)
+        self.assertEqual((totals["delivered"], totals["retried"]), (5, 1))
+        self.assertLessEqual(stub.max_in_flight, 2)
+        self.assertLessEqual(len({port for port, _, _ in stub.requests}), 2)  # Connections were reused
+        _, headers, body = stub.requests[-1]
+        expected = "sha256=" + hmac.new(endpoint.secret.encode(), body, hashlib.sha256).hexdigest()
+        self.assertEqual(headers["X-Habit-Signature"], expected)
+        self.assertEqual(json.loads(body)["event"], "habit.completed")
+
+        failed = OutboxEvent.objects.get(status=OutboxEvent.PENDING)
+        self.assertEqual((failed.attempts, failed.last_error), (1, "HTTP 500"))
+        self.assertGreater(failed.next_attempt_at, now())  # Backing off
+        OutboxEvent.objects.filter(pk=failed.pk).update(next_attempt_at=now())
+        self.assertEqual(async_to_sync(dispatch)(once=True)["delivered"], 1)
+        self.assertEqual(OutboxEvent.objects.filter(status=OutboxEvent.DELIVERED).count(), 6)
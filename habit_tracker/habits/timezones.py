@@ -0,0 +1,60 @@
+"""
+Users' local days. Completions are stamped, and "today" is judged, in the
+user's UserProfile.timezone, the same day the rollover (habits.rollover) uses.
+The timezone is cached; saving a profile drops the entry (see signals.py).
+"""
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+
+from django.core.cache import cache
+from django.utils.timezone import now
+
+from .models import UserProfile
+
+
+def is_valid_timezone(name):
+    try:
+        ZoneInfo(name)
+    except (ZoneInfoNotFoundError, ValueError, TypeError):
+        return False
+    return True
+
+
+def local_today(timezone_name, moment=None):
+    """ The date in `timezone_name` at `moment` (default: now). """
+    return (moment or now()).astimezone(ZoneInfo(timezone_name)).date()
+
+
+def user_timezone_key(user_id):
+    return f"habits:user-timezone:{user_id}"
+
+
+def user_timezone(user_id):
+    """ The user's timezone name, DEFAULT_TIMEZONE without a user or profile. """
+    if user_id is None:
+        return UserProfile.DEFAULT_TIMEZONE
+    name = cache.get(user_timezone_key(user_id))
+    if name is None:
+        name = UserProfile.objects.filter(user_id=user_id).values_list("timezone", flat=True).first() or UserProfile.DEFAULT_TIMEZONE
+        cache.set(user_timezone_key(user_id), name, None)
+    return name
+
+
+async def auser_timezone(user_id):
+    name = await cache.aget(user_timezone_key(user_id))
+    if name is None:
+        name = await UserProfile.objects.filter(user_id=user_id).values_list("timezone", flat=True).afirst() or UserProfile.DEFAULT_TIMEZONE
+        await cache.aset(user_timezone_key(user_id), name, None)
+    return name
+
+
+def user_today(user_id, moment=None):
+    """ The user's local date at `moment` (default: now). """
+    return local_today(user_timezone(user_id), moment)
+
+
+async def auser_today(user_id):
+    return local_today(await auser_timezone(user_id))
+
+
+def forget_user_timezone(user_id):
+    cache.delete(user_timezone_key(user_id))
@@ -2,6 +2,10 @@ from django.urls import path, re_path
 from rest_framework.authtoken.views import obtain_auth_token
 from .views import HabitListCreateView, HabitDetailView, DailyReminderView, MotivationalQuoteView, SetHabitGoalView, CheckHabitCompletionView, HabitStreakView, WeeklySummaryView, CompletionReportView, UserProfileView, HabitMilestoneRewardView, HabitReinforcementView, LogHabitTimeView
 from .views import HabitTimeSpentView, ResetStreakView, RegisterView, GenerateHabitReportView, HabitFrequencyOverTimeView, SuggestTrackingMethodsView, SuggestNewHabitView, SuggestPersonalizedHabitView, ScaleHabitDifficultyView, HabitProgressCalendarView, api_guide_view 
+from .views import ReportJobStatusView, ReportJobDownloadView, HabitExportView, TimeLogExportView, HabitBatchView, HabitAnalyticsView, LeaderboardView
+from .views import WebhookEndpointListCreateView, WebhookEndpointDetailView
+from . import async_views
+from .metrics import metrics_view
 
 urlpatterns = [
    # Authentication & User Management
@@ -13,24 +17,37 @@ urlpatterns = [
     # Habit Management
     path('habits/', HabitListCreateView.as_view(), name='habit-list'),
     path('habits/<int:pk>/', HabitDetailView.as_view(), name='habit-detail'),
+    path('habits/batch/', HabitBatchView.as_view(), name='habit-batch'),
     path('habits/set-goals/<int:pk>/', SetHabitGoalView.as_view(), name='set-habit-goals'),
     path('habits/reset-streak/<int:pk>/', ResetStreakView.as_view(), name='reset-streak'),
 
+    # Webhooks
+    path('webhooks/', WebhookEndpointListCreateView.as_view(), name='webhook-list'),
+    path('webhooks/<int:pk>/', WebhookEndpointDetailView.as_view(), name='webhook-detail'),
+
     # Habit Tracking & Completion
     path('check-completion/<int:pk>/', CheckHabitCompletionView.as_view(), name='check-habit-completion'),
     path('habits/streaks/', HabitStreakView.as_view(), name='habit-streaks'),
     path('habits/time-spent/<int:pk>/', HabitTimeSpentView.as_view(), name='habit-time-spent'),
-    path('habits/frequency-over-time/<int:hab>/', HabitFrequencyOverTimeView.as_view(), name='habit-frequency-over-time'),
+    path('habits/frequency-over-time/<int:pk>/', HabitFrequencyOverTimeView.as_view(), name='habit-frequency-over-time'),
     path('habits/time-spent-log/<int:pk>/', LogHabitTimeView.as_view(), name='log-habit-time'),
 
     # Progress & Reports
     path('progress/weekly-summary/', WeeklySummaryView.as_view(), name='weekly-summary'),
     path('progress/completion-report/', CompletionReportView.as_view(), name='completion-report'),
+    path('analytics/', HabitAnalyticsView.as_view(), name='habit-analytics'),
     path('reports/generate/', GenerateHabitReportView.as_view(), name="generate-habit-report"),
+    path('reports/jobs/<uuid:job_id>/', ReportJobStatusView.as_view(), name="report-job-status"),
+    path('reports/jobs/<uuid:job_id>/download/', ReportJobDownloadView.as_view(), name="report-job-download"),
     path('habits/progress-calendar/', HabitProgressCalendarView.as_view(), name='habit-progress-calendar'),
 
+    # Bulk Export
+    path('export/habits/', HabitExportView.as_view(), name='export-habits'),
+    path('export/time-logs/', TimeLogExportView.as_view(), name='export-time-logs'),
+
     # Motivation & Rewards
     path('habits/milestones/rewards/', HabitMilestoneRewardView.as_view(), name='habit-milestone-rewards'),
+    path('leaderboard/', LeaderboardView.as_view(), name='leaderboard'),
     path('habits/reinforce/<int:pk>/', HabitReinforcementView.as_view(), name='habit-reinforce'),
     path('motivation/quotes/', MotivationalQuoteView.as_view(), name='motivation-quotes'),
 
@@ -43,7 +60,19 @@ urlpatterns = [
     # Habit Reminders
     path('habits/daily-reminders/', DailyReminderView.as_view(), name='habit-reminders'),
 
+    # Prometheus metrics
+    path('metrics', metrics_view, name='metrics'),
+
     # API Guide
     path('habits/guide/', api_guide_view, name='api-guide'),
+
+    # Async (ASGI) variants of the read-only endpoints
+    path('async/habits/', async_views.habit_list, name='async-habit-list'),
+    path('async/habits/streaks/', async_views.habit_streaks, name='async-habit-streaks'),
+    path('async/progress/weekly-summary/', async_views.weekly_summary, name='async-weekly-summary'),
+    path('async/habits/progress-calendar/', async_views.progress_calendar, name='async-habit-progress-calendar'),
+    path('async/habits/daily-reminders/', async_views.daily_reminders, name='async-habit-reminders'),
+    path('async/motivation/quotes/', async_views.motivational_quote, name='async-motivation-quotes'),
+    path('async/habits/guide/', async_views.api_guide, name='async-api-guide'),
 ]
 
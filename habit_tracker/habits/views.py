@@ -1,31 +1,52 @@
 from rest_framework import generics, status, permissions
 from django.shortcuts import get_object_or_404
 from rest_framework.views import APIView, exception_handler
+from rest_framework.exceptions import ValidationError
+from rest_framework.parsers import JSONParser
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated, AllowAny
-from django.db.models import Sum
-from django.utils.timezone import now, timedelta
+from django.db import transaction
+from django.db.models import Count
+from django.db.models.functions import TruncDay, TruncMonth, TruncWeek
+from django.utils.timezone import now, timedelta, make_aware
+from django.utils.cache import patch_vary_headers
+from django.utils.dateparse import parse_date, parse_datetime
 from django.contrib.auth.models import User
 from .serializers import RegisterSerializer
-from collections import Counter
-from reportlab.pdfgen import canvas
-from django.http import HttpResponse
+from django.http import FileResponse, HttpResponse, Http404, StreamingHttpResponse
+from bisect import bisect_right
 from datetime import datetime
-from io import BytesIO
 from .models import Habit
-from calendar import monthrange
 from collections import defaultdict
 from rest_framework import status
 from django.http import JsonResponse
 from rest_framework.authtoken.views import ObtainAuthToken
 from rest_framework.authtoken.models import Token
 from .models import UserProfile
-from django.urls import path 
+from django.urls import path, reverse
 import random
 import json
 
-from .models import Habit, HabitTimeLog
-from .serializers import HabitSerializer, HabitTimeLogSerializer, ResetStreakSerializer
+from .models import (
+    MEDAL_STREAKS, MEDALS, Habit, HabitCompletion, HabitTimeLog, HabitTimeRollup, ReportJob, StreakRanking, WebhookEndpoint,
+)
+from .serializers import HabitSerializer, HabitTimeLogSerializer, ResetStreakSerializer, WebhookEndpointSerializer
+from .pagination import KeysetPagination
+from .cache import ConditionalGetMixin, cache_per_user, conditional_get
+from .db import use_read_database
+from .reports import REPORT_TYPES, enqueue_report, get_report_file, report_path, report_queryset
+from .batch import BatchError, apply_batch
+from .analytics import MAX_DAYS as ANALYTICS_MAX_DAYS, user_analytics
+from .calendars import calendar_payload, calendar_range, calendar_rows
+from .categories import CATEGORIES, CATEGORY_ORDER
+from .leaderboard import leaderboard_payload
+from .reminders import user_digest
+from .timezones import is_valid_timezone, user_today
+from .rollups import next_period_start, period_start, record_time_logs
+from .parsers import NDJSONParser
+from .exports import (
+    CSVExportRenderer, NDJSONExportRenderer, accepts_gzip, batched, csv_lines, export_queryset, gzipped, ndjson_lines,
+)
 
 
 class CustomLoginView(ObtainAuthToken):
@@ -75,20 +96,31 @@ def api_guide_view(request):
             "Habit Detail (Retrieve, Update, Delete)": "/habits/<int:pk>/",
             "Set Habit Goals": "/habits/set-goals/<int:pk>/",
             "Reset Habit Streak": "/habits/reset-streak/<int:pk>/",
+            "Batch Create/Complete/Log Time": "/habits/batch/",
+        },
+        "Webhooks (Push Instead of Polling)": {
+            "List & Register Endpoints": "/webhooks/",
+            "Endpoint Detail (Retrieve, Update, Delete)": "/webhooks/<int:pk>/",
         },
         "Habit Tracking & Completion": {
             "Track Completion": "/habits/track-completion/",
             "Check Completion": "/check-completion/<int:pk>/",
             "Habit Streaks": "/habits/streaks/",
-            "Time Spent on Habit": "/habits/time-spent/<int:pk>/",
-            "Frequency Over Time": "/habits/frequency-over-time/<int:pk>/",
+            "Time Spent on Habit": "/habits/time-spent/<int:pk>/?from=<date>&to=<date>&granularity=day|week|month",
+            "Frequency Over Time": "/habits/frequency-over-time/<int:pk>/?days=<1-1830>&granularity=day|week|month",
             "Log in Time Spent on Habit": "habits/time-spent-log/",
         },
         "Progress & Reports": {
             "Weekly Summary": "/progress/weekly-summary/",
             "Completion Report": "/progress/completion-report/",
+            "Habit Analytics (Rates, Streaks, Consistency, Time Trends)": "/analytics/?days=<1-1830>",
             "Generate Reports": "/reports/generate/",
-            "Progress Calendar": "/habits/progress-calendar/",
+            "Report Job Status": "/reports/jobs/<uuid:job_id>/",
+            "Download Report": "/reports/jobs/<uuid:job_id>/download/",
+            "Progress Calendar": "/habits/progress-calendar/?month=<1-12>&year=<year>",
+            "Progress Calendar Range (Heatmap)": "/habits/progress-calendar/?from=<YYYY-MM>&to=<YYYY-MM>",
+            "Export Habits (CSV/NDJSON)": "/export/habits/?format=csv&since=<date>",
+            "Export Time Logs (CSV/NDJSON)": "/export/time-logs/?format=ndjson&since=<date>",
         },
         "Motivation & Suggestions": {
             "Motivational Quotes": "/motivation/quotes/",
@@ -97,10 +129,20 @@ def api_guide_view(request):
         },
         "Other Features": {
             "Milestone Rewards": "/habits/milestones/rewards/",
+            "Streak Leaderboards": "/leaderboard/?category=<name|Overall>&limit=<1-100>",
             "Reinforcement Messages": "/habits/reinforce/<int:pk>/",
             "Daily Habit Reminders": "/habits/daily-reminders/",
             "Scale Habit Difficulty": "/habits/scale-difficulty/",
             "Suggest Tracking Methods": "/habits/suggest-tracking-methods/",
+        },
+        "Async (ASGI) Read Endpoints": {
+            "List Habits": "/async/habits/",
+            "Habit Streaks": "/async/habits/streaks/",
+            "Weekly Summary": "/async/progress/weekly-summary/",
+            "Progress Calendar": "/async/habits/progress-calendar/",
+            "Daily Habit Reminders": "/async/habits/daily-reminders/",
+            "Motivational Quotes": "/async/motivation/quotes/",
+            "API Guide": "/async/habits/guide/",
         }
     }
     
@@ -121,51 +163,90 @@ class ProtectedView(APIView):
         return Response({"message": "You must be logged in to see this!"})
 
 
-class HabitListCreateView(generics.ListCreateAPIView):
+class HabitListCreateView(ConditionalGetMixin, generics.ListCreateAPIView):
     queryset = Habit.objects.all()
     serializer_class = HabitSerializer
     permission_classes = [IsAuthenticated]  
+    pagination_class = KeysetPagination
 
     def perform_create(self, serializer):
         serializer.save(user=self.request.user)
 
-    def get_queryset(self):
+    def get_validator_queryset(self):
         return self.queryset.filter(user=self.request.user)
 
+    def get_requested_fields(self):
+        """ Parse ?fields=id,name,... into a list of serializer field names (None = all). """
+        param = self.request.query_params.get("fields")
+        if self.request.method != "GET" or not param:
+            return None
+        fields = [name.strip() for name in param.split(",") if name.strip()]
+        unknown = set(fields) - set(HabitSerializer().fields)
+        if unknown:
+            raise ValidationError({"fields": f"Unknown field(s): {', '.join(sorted(unknown))}"})
+        return fields
+
+    def get_queryset(self):
+        queryset = self.queryset.filter(user=self.request.user)
+        fields = self.get_requested_fields()
+        if fields is None:
+            return queryset.select_related("user")
+
+        # Trim the SELECT list too; the cursor always needs created_at and id
+        columns = {"id", "created_at"} | set(fields)
+        if "user" in columns:
+            queryset = queryset.select_related("user")
+            columns.add("user__username")
+        return queryset.only(*columns)
+
+    def get_serializer(self, *args, **kwargs):
+        kwargs.setdefault("fields", self.get_requested_fields())
+        return super().get_serializer(*args, **kwargs)
+
 # Retrieve, Update, and Delete Habit
-class HabitDetailView(generics.RetrieveUpdateDestroyAPIView):
+class HabitDetailView(ConditionalGetMixin, generics.RetrieveUpdateDestroyAPIView):
     queryset = Habit.objects.all()
     serializer_class = HabitSerializer
     permission_classes = [IsAuthenticated]  
 
     def get_queryset(self):
-        return Habit.objects.filter(user=self.request.user) 
+        return Habit.objects.filter(user=self.request.user).select_related("user")
+
+    def get_validator_queryset(self):
+        return Habit.objects.filter(user=self.request.user, pk=self.kwargs["pk"])
+
+
+# Webhook endpoints: habit events pushed by habits.webhooks instead of polled
+class WebhookEndpointListCreateView(generics.ListCreateAPIView):
+    serializer_class = WebhookEndpointSerializer
+    permission_classes = [IsAuthenticated]
+
+    def get_queryset(self):
+        return WebhookEndpoint.objects.filter(user=self.request.user).order_by("id")
+
+    def perform_create(self, serializer):
+        serializer.save(user=self.request.user)
+
+class WebhookEndpointDetailView(generics.RetrieveUpdateDestroyAPIView):
+    serializer_class = WebhookEndpointSerializer
+    permission_classes = [IsAuthenticated]
+
+    def get_queryset(self):
+        return WebhookEndpoint.objects.filter(user=self.request.user)
 
 
 # Daily Habit Reminder View
 class DailyReminderView(APIView):
     permission_classes = [IsAuthenticated]
 
+    @cache_per_user()
     def get(self, request):
-        habits = Habit.objects.filter(user=request.user)
+        digest = user_digest(request.user)  # Precomputed by the daily rollover, see habits.reminders
 
-        if not habits.exists():
+        if not digest.reminders:
             return Response({"message": "You have no habits added yet."}, status=200)
 
-        reminders = []
-        for habit in habits:
-            if habit.completed:
-                reminders.append({
-                    "habit": habit.name,
-                    "message": f"🎉 Congrats! You've completed '{habit.name}' today!"
-                })
-            else:
-                reminders.append({
-                    "habit": habit.name,
-                    "message": f"⏰ Reminder: Don't forget to complete '{habit.name}' today!"
-                })
-
-        return Response({"daily_reminders": reminders})
+        return Response({"daily_reminders": digest.reminders})
 
 # Motivational Quotes
 MOTIVATIONAL_QUOTES = [
@@ -210,7 +291,7 @@ class CheckHabitCompletionView(APIView):
         except Habit.DoesNotExist:
             return Response({"error": "Habit not found."}, status=404)
 
-        today = now().date()
+        today = user_today(request.user.pk)
         if habit.completed and habit.completed_at == today:
             return Response({"message": f"You completed '{habit.name}' today ✅"})
         
@@ -221,31 +302,67 @@ class HabitStreakView(APIView):
     permission_classes = [IsAuthenticated]
 
     def get(self, request):
-        habits = Habit.objects.filter(user=request.user, completed=True)
-        streaks = {habit.name: habit.calculate_streak() for habit in habits}
+        habits = Habit.objects.filter(user=request.user).with_streaks()
+        streaks = {habit.name: habit.current_streak for habit in habits}
         return Response({"habit_streaks": streaks})
 
 # Weekly Summary
+def stream_json_list(key, items):
+    """ Yield a {"key": [...]} JSON document one list item at a time. """
+    yield f'{{"{key}": ['
+    for i, item in enumerate(items):
+        yield ("," if i else "") + json.dumps(item, ensure_ascii=False, default=str)
+    yield "]}"
+
 class WeeklySummaryView(APIView):
     permission_classes = [IsAuthenticated]
+    max_days = 365
 
+    @cache_per_user()
+    @use_read_database
     def get(self, request):
-        past_week = now().date() - timedelta(days=7)
-        habits = Habit.objects.filter(user=request.user)
-        summary = [{
-            "habit": habit.name,
-            "days_completed": Habit.objects.filter(user=request.user, id=habit.id, completed_at__gte=past_week).count()
-        } for habit in habits]
-        return Response({"weekly_summary": summary})
+        try:
+            days = int(request.query_params.get("days", 7))
+        except ValueError:
+            return Response({"error": "days must be a number."}, status=status.HTTP_400_BAD_REQUEST)
+        if not (1 <= days <= self.max_days):
+            return Response({"error": f"days must be between 1 and {self.max_days}."}, status=status.HTTP_400_BAD_REQUEST)
+
+        since = user_today(request.user.pk) - timedelta(days=days)
+        # One grouped query: completion days per habit inside the window
+        summary = Habit.objects.filter(user=request.user).completion_counts(since).order_by("id").values("name", "days_completed")
+
+        items = ({"habit": row["name"], "days_completed": row["days_completed"]} for row in summary.iterator(chunk_size=500))
+        return StreamingHttpResponse(stream_json_list("weekly_summary", items), content_type="application/json")
+
+class HabitAnalyticsView(APIView):
+    permission_classes = [IsAuthenticated]
+    max_days = ANALYTICS_MAX_DAYS
+
+    @cache_per_user()
+    @use_read_database
+    def get(self, request):
+        """ Completion rates, streaks, consistency and time-spent trends for all of the user's habits. """
+        try:
+            days = int(request.query_params.get("days", 365))
+        except ValueError:
+            return Response({"error": "days must be a number."}, status=status.HTTP_400_BAD_REQUEST)
+        if not (1 <= days <= self.max_days):
+            return Response({"error": f"days must be between 1 and {self.max_days}."}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(user_analytics(request.user, days, user_today(request.user.pk)))
 
 # Habit Completion Report
 class CompletionReportView(APIView):
     permission_classes = [IsAuthenticated]
 
+    @cache_per_user()
+    @use_read_database
     def get(self, request):
-        today = now().date()
+        today = user_today(request.user.pk)
         start_of_month = today.replace(day=1)
-        total_habits = Habit.objects.filter(user=request.user, created_at__date__gte=start_of_month).count()
+        # Compare against a datetime so the (user, created_at) index applies
+        month_start = make_aware(datetime.combine(start_of_month, datetime.min.time()))
+        total_habits = Habit.objects.filter(user=request.user, created_at__gte=month_start).count()
         completed_habits = Habit.objects.filter(user=request.user, completed=True, completed_at__gte=start_of_month).count()
         completion_percentage = (completed_habits / total_habits) * 100 if total_habits else 0
         return Response({
@@ -281,20 +398,25 @@ class UserProfileView(APIView):
             "username": user.username,  # Username is retrieved but not required for updates
             "date_joined": user.date_joined,
             "bio": profile.bio,
+            "timezone": profile.timezone,
         }
         return Response(data, status=status.HTTP_200_OK)
 
     def patch(self, request):
-        """Update the authenticated user's bio."""
+        """Update the authenticated user's bio and/or timezone."""
         user = request.user
         profile, _ = UserProfile.objects.get_or_create(user=user)  # Ensure profile exists
 
-        bio = request.data.get("bio", "")
-        profile.bio = bio
+        timezone = request.data.get("timezone", profile.timezone)
+        if not is_valid_timezone(timezone):
+            return Response({"error": "timezone must be an IANA name such as 'Europe/Berlin'"}, status=400)
+
+        profile.bio = request.data.get("bio", profile.bio)
+        profile.timezone = timezone
         profile.save()
 
         return Response(
-            {"message": "Profile updated successfully", "bio": profile.bio},
+            {"message": "Profile updated successfully", "bio": profile.bio, "timezone": profile.timezone},
             status=status.HTTP_200_OK
         )
 
@@ -302,33 +424,24 @@ class UserProfileView(APIView):
 class HabitMilestoneRewardView(APIView):
     permission_classes = [IsAuthenticated]
 
+    @cache_per_user()
     def get(self, request):
-        habits = Habit.objects.filter(user=request.user)
+        habits = Habit.objects.filter(user=request.user).with_streaks()
         rewards = []
         no_streaks = True  # Flag to check if any habit has a streak
 
-        # Medal tiers based on streak
-        medals = {
-            10: "🥉 Bronze Medal",
-            20: "🥈 Silver Medal",
-            30: "🥇 Gold Medal",
-            50: "🏆 Platinum Trophy",
-        }
-
         for habit in habits:
-            if habit.streak and habit.streak > 0:
+            if habit.current_streak > 0:
                 no_streaks = False  # At least one habit has a streak
 
                 # Determine the highest earned medal
-                earned_medal = None
-                for days, medal in sorted(medals.items()):
-                    if habit.streak >= days:
-                        earned_medal = medal
+                earned = bisect_right(MEDAL_STREAKS, habit.current_streak)
+                earned_medal = MEDALS[earned - 1][1] if earned else None
                 
                 rewards.append({
                     "habit": habit.name,
-                    "streak": habit.streak,
-                    "message": f"🎉 Congrats! You've reached a {habit.streak}-day streak!",
+                    "streak": habit.current_streak,
+                    "message": f"🎉 Congrats! You've reached a {habit.current_streak}-day streak!",
                     "medal": earned_medal if earned_medal else "🎖 Keep going!"
                 })
 
@@ -340,12 +453,42 @@ class HabitMilestoneRewardView(APIView):
 
         return Response({"milestone_rewards": rewards}, status=status.HTTP_200_OK)
 
+class LeaderboardView(APIView):
+    permission_classes = [IsAuthenticated]
+    max_limit = 100
+
+    def get(self, request):
+        """
+        Top streaks on the overall leaderboard and on each habit category's
+        (or only ?category=<name>), with the requesting user's rank and percentile.
+        """
+        try:
+            limit = int(request.query_params.get("limit", 10))
+        except ValueError:
+            return Response({"error": "limit must be a number."}, status=status.HTTP_400_BAD_REQUEST)
+        if not (1 <= limit <= self.max_limit):
+            return Response({"error": f"limit must be between 1 and {self.max_limit}."}, status=status.HTTP_400_BAD_REQUEST)
+
+        boards = [StreakRanking.OVERALL, *CATEGORIES]
+        if "category" in request.query_params:
+            category = request.query_params["category"]
+            if category.lower() == "overall":
+                category = StreakRanking.OVERALL
+            if category not in boards:
+                return Response({"error": f"category must be one of: Overall, {', '.join(CATEGORIES)}."}, status=status.HTTP_400_BAD_REQUEST)
+            boards = [category]
+
+        return Response({"leaderboards": leaderboard_payload(request.user, boards, limit)})
+
 # Habit Reinforcement View
 class HabitReinforcementView(APIView):
     permission_classes = [IsAuthenticated]
 
     def get(self, request, pk):  # Use pk from URL
-        habit = get_object_or_404(Habit, id=pk, user=request.user)
+        habits = Habit.objects.filter(id=pk, user=request.user).with_streaks()
+        if not habits:
+            raise Http404
+        habit = habits[0]
 
         # Example reinforcement messages based on streaks
         messages = {
@@ -353,43 +496,75 @@ class HabitReinforcementView(APIView):
             14: "🔥 Two weeks strong! You're on fire!",
             30: "🎉 One month of consistency! Amazing job!",
         }
-        message = messages.get(habit.streak, "👏 Keep going! Every small step counts!")
+        message = messages.get(habit.current_streak, "👏 Keep going! Every small step counts!")
 
         return Response({
             "message": message,
             "habit": {
                 "name": habit.name,
-                "streak": habit.streak
+                "streak": habit.current_streak
             }
         }, status=status.HTTP_200_OK)
 
 # Habit Time Spent View
 class HabitTimeSpentView(APIView):
     permission_classes = [IsAuthenticated]
+    granularities = [HabitTimeRollup.DAY, HabitTimeRollup.WEEK, HabitTimeRollup.MONTH]
 
     def get(self, request, pk):
-        """Retrieve total time spent on a habit"""
+        """
+        Retrieve total time spent on a habit, or per-day/week/month totals with
+        ?from=YYYY-MM-DD&to=YYYY-MM-DD&granularity=day|week|month. Both read
+        the pre-aggregated rollups, never the raw logs.
+        """
         try:
             habit = Habit.objects.get(id=pk, user=request.user)
         except Habit.DoesNotExist:
             return Response({"error": "Habit not found."}, status=status.HTTP_404_NOT_FOUND)
 
-        # Check if logs exist
-        logs = HabitTimeLog.objects.filter(habit=habit)
-        if not logs.exists():
+        if {"from", "to", "granularity"} & set(request.query_params):
+            return self.get_range(request, habit)
+
+        total = HabitTimeRollup.objects.filter(
+            habit=habit, period=HabitTimeRollup.TOTAL, period_start=HabitTimeRollup.TOTAL_START
+        ).values_list("total_minutes", flat=True).first()
+        if not total:
             return Response({
                 "habit": habit.name,
                 "total_time_spent": 0,
                 "message": f"No time logs found for '{habit.name}'."
             }, status=status.HTTP_200_OK)
 
-        # Calculate total time spent
-        total_time = logs.aggregate(Sum('time_spent'))['time_spent__sum'] or 0
+        return Response({
+            "habit": habit.name,
+            "total_time_spent": total,
+            "message": f"You've spent {total} minutes on '{habit.name}' so far."
+        }, status=status.HTTP_200_OK)
+
+    def get_range(self, request, habit):
+        granularity = request.query_params.get("granularity", HabitTimeRollup.DAY)
+        if granularity not in self.granularities:
+            return Response({"error": f"granularity must be one of: {', '.join(self.granularities)}."}, status=status.HTTP_400_BAD_REQUEST)
+
+        today = user_today(request.user.pk)
+        start = parse_date(request.query_params.get("from", "")) if "from" in request.query_params else today - timedelta(days=30)
+        end = parse_date(request.query_params.get("to", "")) if "to" in request.query_params else today
+        if start is None or end is None or start > end:
+            return Response({"error": "from and to must be YYYY-MM-DD dates with from <= to."}, status=status.HTTP_400_BAD_REQUEST)
+
+        buckets = HabitTimeRollup.objects.filter(
+            habit=habit, period=granularity,
+            period_start__range=(period_start(granularity, start), end),
+        ).order_by("period_start").values_list("period_start", "total_minutes")
+        time_spent = [{"period_start": str(day), "time_spent": minutes} for day, minutes in buckets]
 
         return Response({
             "habit": habit.name,
-            "total_time_spent": total_time,
-            "message": f"You've spent {total_time} minutes on '{habit.name}' so far."
+            "from": str(start),
+            "to": str(end),
+            "granularity": granularity,
+            "total_time_spent": sum(bucket["time_spent"] for bucket in time_spent),
+            "time_spent": time_spent,
         }, status=status.HTTP_200_OK)
     
 class LogHabitTimeView(APIView):
@@ -406,11 +581,37 @@ class LogHabitTimeView(APIView):
         if not time_spent or not isinstance(time_spent, int) or time_spent <= 0:
             return Response({"error": "Invalid time_spent value."}, status=status.HTTP_400_BAD_REQUEST)
 
-        # Save the time log
-        HabitTimeLog.objects.create(habit=habit, time_spent=time_spent)
+        # Save the time log and fold it into the rollups atomically
+        with transaction.atomic():
+            # Dated with the user's local day, like completions and the rollover
+            log = HabitTimeLog.objects.create(habit=habit, date=user_today(request.user.pk), time_spent=time_spent)
+            record_time_logs([log])
 
         return Response({"message": f"Logged {time_spent} minutes for '{habit.name}'."}, status=status.HTTP_201_CREATED)
 
+class HabitBatchView(APIView):
+    """
+    Apply many habit creations, completions and time logs at once, e.g. an
+    offline client syncing on reconnect. Accepts a JSON list (or
+    {"operations": [...]}) or NDJSON; all-or-nothing.
+    """
+    permission_classes = [IsAuthenticated]
+    parser_classes = [JSONParser, NDJSONParser]
+
+    def post(self, request):
+        payload = request.data.get("operations") if isinstance(request.data, dict) else request.data
+        if not isinstance(payload, list) or not payload:
+            return Response({
+                "error": "Send a non-empty list of operations.",
+                "example": [{"op": "create", "ref": "r1", "name": "Read"}, {"op": "complete", "habit": "r1"}, {"op": "log_time", "habit": "r1", "time_spent": 20}],
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            result = apply_batch(request.user, payload)
+        except BatchError as exc:
+            return Response({"errors": exc.errors}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(result, status=status.HTTP_201_CREATED)
+
 class RegisterView(generics.CreateAPIView):
     queryset = User.objects.all()
     permission_classes = [AllowAny]
@@ -428,17 +629,18 @@ def create(self, request, *args, **kwargs):
 class ScaleHabitDifficultyView(APIView):
     permission_classes = [IsAuthenticated]
 
+    @cache_per_user()
     def get(self, request):
-        user_habits = Habit.objects.filter(user=request.user)
-        if not user_habits.exists():
+        user_habits = Habit.objects.filter(user=request.user).with_streaks()
+        if not user_habits:
             return Response({"message": "Track some habits first to get difficulty scaling suggestions!"})
 
         difficulty_suggestions = []
 
         for habit in user_habits:
-            if habit.progress >= 80 and habit.streak >= 14:  # Strong consistency
+            if habit.progress >= 80 and habit.current_streak >= 14:  # Strong consistency
                 difficulty_suggestions.append(f"You're mastering {habit.name}! Try increasing difficulty, like extending duration or frequency.")
-            elif habit.progress >= 50 and habit.streak >= 7:  # Moderate consistency
+            elif habit.progress >= 50 and habit.current_streak >= 7:  # Moderate consistency
                 difficulty_suggestions.append(f"You're progressing well in {habit.name}. Consider a small challenge, like adding intensity or variation.")
             else:  # Low consistency
                 difficulty_suggestions.append(f"Keep building consistency in {habit.name}. Focus on maintaining a steady routine first.")
@@ -453,58 +655,19 @@ class SuggestPersonalizedHabitView(APIView):
         if not user_habits.exists():
             return Response({"message": "Track some habits to get personalized suggestions!"})
 
-        personalized_suggestions = []
-        habit_names = [habit.name.lower() for habit in user_habits]  # Convert all habit names to lowercase
-
-        # Mapping of habit categories to related keywords
-        habit_categories = {
-            "Sleep & Relaxation": ["sleep", "bedtime", "relaxation", "rest"],
-            "Fitness & Exercise": ["exercise", "workout", "run", "yoga", "cardio", "strength training", "gym", "jog"],
-            "Mental Wellness": ["meditation", "mindfulness", "journaling", "gratitude", "reflection"],
-            "Social & Relationships": ["socializing", "friends", "family", "networking", "community"],
-            "Health & Hydration": ["hydration", "water", "caffeine", "diet", "nutrition", "meal"],
-            "Learning & Productivity": ["read", "study", "learn", "write", "skill-building"],
+        # Categories are stored on save (habits.categories); one row per distinct combination
+        matched_categories = {
+            category
+            for categories in user_habits.order_by().values_list("categories", flat=True).distinct()
+            for category in categories
         }
 
-        # Define suggestions for each category
-        category_suggestions = {
-            "Sleep & Relaxation": [
-                "Try a relaxing bedtime routine like stretching or reading.",
-                "Consider using a sleep tracker to monitor your rest patterns.",
-            ],
-            "Fitness & Exercise": [
-                "Consider adding strength training or yoga to balance your routine.",
-                "Try setting step-count goals for daily movement.",
-            ],
-            "Mental Wellness": [
-                "Since you focus on mindfulness, try deep breathing exercises.",
-                "Try tracking your mood daily along with your journal entries.",
-            ],
-            "Social & Relationships": [
-                "Schedule weekly check-ins with family or friends.",
-                "Try joining a local club or social group to build new connections.",
-            ],
-            "Health & Hydration": [
-                "Since you track hydration, consider monitoring your caffeine intake.",
-                "Explore meal prepping to improve your nutrition.",
-            ],
-            "Learning & Productivity": [
-                "Since you enjoy learning, try setting monthly book or course goals.",
-                "Experiment with the Pomodoro technique to improve focus.",
-            ],
-        }
-
-        # Check which categories the user's habits match
-        matched_categories = set()
-        for category, keywords in habit_categories.items():
-            for habit_name in habit_names:
-                if any(keyword in habit_name.split() for keyword in keywords):  # Splitting ensures full words are checked
-                    matched_categories.add(category)
-                    break  # Avoid checking further if already matched
-
-        # Add one suggestion per matched category
-        for category in matched_categories:
-            personalized_suggestions.append(category_suggestions[category][0])  # Pick the first suggestion
+        # Add one suggestion per matched category, in the data file's order
+        personalized_suggestions = [
+            CATEGORIES[category]["suggestions"][0]  # Pick the first suggestion
+            # Ignores categories removed from the data file since the habits were saved
+            for category in sorted(CATEGORIES.keys() & matched_categories, key=CATEGORY_ORDER.get)
+        ]
 
         if not personalized_suggestions:
             personalized_suggestions.append("Keep exploring new habits!")
@@ -518,28 +681,11 @@ class SuggestNewHabitView(APIView):
         habit = get_object_or_404(Habit, id=pk, user=request.user)
         suggestions = []
 
-        habit_name = habit.name.lower()  # Normalize to lowercase
-
-        # Keyword-based categories for flexible matching
-        habit_keywords = {
-            "hydration": ["water", "hydration", "drink", "fluid"],
-            "fitness": ["exercise", "workout", "gym", "run", "training", "cardio", "lifting"],
-            "reading": ["read", "books", "literature", "novel", "study"],
-            "mental_wellness": ["meditation", "mindfulness", "breathe", "relax", "calm", "reflect"],
-        }
-
-        # Mapping categories to habit suggestions
-        habit_suggestions = {
-            "hydration": "Since you stay hydrated, try tracking your daily caffeine intake.",
-            "fitness": "Try meal prepping to support your fitness goals.",
-            "reading": "You might enjoy listening to audiobooks or joining a book club.",
-            "mental_wellness": "You might benefit from journaling your daily thoughts.",
-        }
-
-        # Check which category the habit belongs to
-        for category, keywords in habit_keywords.items():
-            if any(keyword in habit_name for keyword in keywords):  # Match any keyword
-                suggestions.append(habit_suggestions[category])
+        # One suggestion per category the name matches (habits.categories), in the data file's order
+        for category in habit.categories:
+            next_habit = CATEGORIES.get(category, {}).get("next_habit")
+            if next_habit:
+                suggestions.append(next_habit)
 
         # If no matches, provide a general message
         if not suggestions:
@@ -583,146 +729,203 @@ class SuggestTrackingMethodsView(APIView):
         })
 class HabitFrequencyOverTimeView(APIView):
     permission_classes = [IsAuthenticated]
+    granularities = {
+        HabitTimeRollup.DAY: TruncDay,
+        HabitTimeRollup.WEEK: TruncWeek,
+        HabitTimeRollup.MONTH: TruncMonth,
+    }
+    max_days = 5 * 366
 
+    @cache_per_user()
     def get(self, request, pk):
-        days = int(request.query_params.get("days", 30))  # Default to last 30 days
+        """
+        Completions of a habit per day, week or month over the last ?days=
+        (default 30), from one grouped query over the completion history.
+        Empty buckets are reported as 0 so clients can chart the series as is.
+        """
+        try:
+            days = int(request.query_params.get("days", 30))
+        except ValueError:
+            return Response({"error": "days must be a number."}, status=status.HTTP_400_BAD_REQUEST)
+        if not (1 <= days <= self.max_days):
+            return Response({"error": f"days must be between 1 and {self.max_days}."}, status=status.HTTP_400_BAD_REQUEST)
+        granularity = request.query_params.get("granularity", HabitTimeRollup.DAY)
+        if granularity not in self.granularities:
+            return Response({"error": f"granularity must be one of: {', '.join(self.granularities)}."}, status=status.HTTP_400_BAD_REQUEST)
 
         try:
             habit = Habit.objects.get(id=pk, user=request.user)
         except Habit.DoesNotExist:
             return Response({"error": "Habit not found."}, status=404)
 
-        start_date = now().date() - timedelta(days=days)
-        completed_dates = list(Habit.objects.filter(
-            user=request.user, 
-            id=pk, 
-            completed=True, 
-            completed_at__gte=start_date
-        ).values_list("completed_at", flat=True))
+        end = user_today(request.user.pk)
+        start = end - timedelta(days=days)
+        counts = dict(
+            HabitCompletion.objects.filter(habit=habit, date__gte=start)
+            .annotate(bucket=self.granularities[granularity]("date"))
+            .values("bucket").annotate(count=Count("id"))
+            .order_by().values_list("bucket", "count")
+        )
 
-        # Fix: Use Counter to count occurrences
-        frequency_counter = Counter(completed_dates)
-        frequency_data = {str(date): count for date, count in frequency_counter.items()}
+        # Zero-fill in one pass over the bucket starts
+        frequency = {}
+        bucket = period_start(granularity, start)
+        while bucket <= end:
+            frequency[str(bucket)] = counts.get(bucket, 0)
+            bucket = next_period_start(granularity, bucket)
 
         return Response({
             "habit": habit.name,
             "period": f"Last {days} days",
-            "frequency": frequency_data
+            "from": str(start),
+            "to": str(end),
+            "granularity": granularity,
+            "total": sum(frequency.values()),
+            "frequency": frequency,
         })
     
-class GenerateHabitReportView(APIView):
+class GenerateHabitReportView(ConditionalGetMixin, APIView):
     permission_classes = [IsAuthenticated]
 
-    def get(self, request):
-        report_type = request.query_params.get("type", None)
+    def get_validator_queryset(self):
+        report_type = (self.request.query_params.get("type") or "").lower()
+        if report_type not in REPORT_TYPES:
+            return Habit.objects.none()
+        return report_queryset(self.request.user, report_type, user_today(self.request.user.pk))
+
+    def get_validator_extra(self):
+        return str(user_today(self.request.user.pk))  # The report period moves with the date
+
+    def get_report_type(self, request):
+        """ Return (report_type, None) or (None, error Response). """
+        report_type = request.query_params.get("type") or request.data.get("type")
 
         # Check if the report_type is not provided in the query
         if not report_type:
-            return Response({
+            return None, Response({
                 "error": "Please specify the report type. Use 'daily' or 'weekly' as the type.",
                 "example_url": "Example: /reports/generate/?type=daily or /reports/generate/?type=weekly"
             }, status=status.HTTP_400_BAD_REQUEST)
 
         report_type = report_type.lower()
-        if report_type not in ["daily", "weekly"]:
-            return Response({
+        if report_type not in REPORT_TYPES:
+            return None, Response({
                 "error": "Invalid report type. Use 'daily' or 'weekly'.",
                 "example_url": "Example: /reports/generate/?type=daily or /reports/generate/?type=weekly"
             }, status=400)
+        return report_type, None
 
-        today = now().date()
-        start_date = today if report_type == "daily" else today - timedelta(days=7)
-
-        # Filter habits based on completion date
-        habits = Habit.objects.filter(user=request.user, completed_at=today) if report_type == "daily" else Habit.objects.filter(user=request.user, completed_at__gte=start_date)
-
-        # Generate PDF
-        buffer = BytesIO()
-        pdf = canvas.Canvas(buffer)
-        pdf.setTitle(f"Habit Report - {report_type.capitalize()}")
-
-        # Header
-        pdf.setFont("Helvetica-Bold", 14)
-        pdf.drawString(100, 800, f"Habit Report ({report_type.capitalize()})")
-        pdf.setFont("Helvetica", 12)
-        pdf.drawString(100, 780, f"User: {request.user.username}")
-        pdf.drawString(100, 765, f"Period: {start_date} to {today}")
-
-        y_position = 740  # Initial Y position for listing habits
-
-        if not habits.exists():
-            pdf.setFont("Helvetica", 12)
-            pdf.drawString(100, y_position, "No habits found for this period. Keep going! 🚀")
-        else:
-            pdf.setFont("Helvetica-Bold", 12)
-            pdf.drawString(100, y_position, "Habit Progress:")
-            y_position -= 20
-
-            pdf.setFont("Helvetica", 11)
-            for habit in habits:
-                status_str = "✅ Completed" if habit.completed else "❌ Not Completed"
-                streak_str = f"🔥 Streak: {habit.streak} days" if habit.streak else "No streak yet"
-                progress = f"📊 Progress: {habit.progress}%" if hasattr(habit, "progress") else ""
-
-                pdf.drawString(100, y_position, f"- {habit.name}: {status_str}")
-                pdf.drawString(120, y_position - 15, f"{streak_str} {progress}")
-                y_position -= 40
-
-                # Prevent text from going off-page
-                if y_position < 50:
-                    pdf.showPage()  # Add a new page
-                    y_position = 800  # Reset position
-
-        pdf.save()
-        buffer.seek(0)
-
-        # Create downloadable file response
-        response = HttpResponse(buffer, content_type='application/pdf')
-        response['Content-Disposition'] = f'attachment; filename="habit_report_{report_type}.pdf"'
-        return response
-    
+    @conditional_get
+    @use_read_database
+    def get(self, request):
+        """ Download the report directly, rendering it in this request only if it isn't cached. """
+        report_type, error = self.get_report_type(request)
+        if error:
+            return error
+
+        path = get_report_file(request.user, report_type)
+        return FileResponse(open(path, "rb"), as_attachment=True, filename=f"habit_report_{report_type}.pdf", content_type="application/pdf")
+
+    def post(self, request):
+        """ Queue a report build and return a job to poll. """
+        report_type, error = self.get_report_type(request)
+        if error:
+            return error
+
+        job = enqueue_report(request.user, report_type)
+        return Response(report_job_data(request, job), status=status.HTTP_202_ACCEPTED)
+
+
+def report_job_data(request, job):
+    data = {
+        "job_id": str(job.pk),
+        "status": job.status,
+        "report_type": job.report_type,
+        "report_date": str(job.report_date),
+        "status_url": request.build_absolute_uri(reverse("report-job-status", args=[job.pk])),
+    }
+    if job.status == ReportJob.DONE:
+        data["download_url"] = request.build_absolute_uri(reverse("report-job-download", args=[job.pk]))
+    if job.status == ReportJob.FAILED:
+        data["error"] = job.error
+    return data
 
-class HabitProgressCalendarView(APIView):
+class ReportJobStatusView(APIView):
     permission_classes = [IsAuthenticated]
 
-    def get(self, request):
-        """Returns a structured calendar-like format of habit completion for a selected month and year."""
-        user = request.user
+    def get(self, request, job_id):
+        job = get_object_or_404(ReportJob, id=job_id, user=request.user)
+        return Response(report_job_data(request, job))
 
-        # Get query parameters (default to the current month & year)
-        try:
-            month = int(request.query_params.get("month", now().month))
-            year = int(request.query_params.get("year", now().year))
-        except ValueError:
-            return Response({"error": "Invalid month or year"}, status=400)
+class ReportJobDownloadView(APIView):
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, job_id):
+        job = get_object_or_404(ReportJob, id=job_id, user=request.user)
+        if job.status != ReportJob.DONE:
+            return Response({"error": "Report is not ready yet.", "status": job.status}, status=status.HTTP_409_CONFLICT)
 
-        # Ensure valid month range (1-12)
-        if not (1 <= month <= 12):
-            return Response({"error": "Month must be between 1 and 12"}, status=400)
+        path = report_path(job.cache_key)
+        if not path.exists():
+            return Response({"error": "Report file has expired. Please generate it again."}, status=status.HTTP_410_GONE)
+        return FileResponse(open(path, "rb"), as_attachment=True, filename=f"habit_report_{job.report_type}_{job.report_date}.pdf", content_type="application/pdf")
+    
 
-        # Get the number of days in the selected month
-        _, last_day = monthrange(year, month)
+class ExportView(APIView):
+    """ Stream every row of `model` for the user as CSV (default) or NDJSON. """
+    permission_classes = [IsAuthenticated]
+    renderer_classes = [CSVExportRenderer, NDJSONExportRenderer]
+    model = None
+    filename = None
 
-        # Start and end of the selected month
-        start_date = now().replace(year=year, month=month, day=1)
-        end_date = start_date.replace(day=last_day)
+    @use_read_database
+    def get(self, request):
+        since = request.query_params.get("since")
+        if since:
+            since = parse_datetime(since) or parse_date(since)
+            if since is None:
+                return Response({"error": "since must be an ISO date or datetime."}, status=status.HTTP_400_BAD_REQUEST)
+
+        fields, rows = export_queryset(self.model, request.user, since)
+        fmt = request.accepted_renderer.format
+        lines = csv_lines(fields, rows) if fmt == "csv" else ndjson_lines(fields, rows)
+        chunks = batched(lines)
+
+        compress = accepts_gzip(request.headers.get("Accept-Encoding", ""))
+        if compress:
+            chunks = gzipped(chunks)
+
+        response = StreamingHttpResponse(chunks, content_type=request.accepted_renderer.media_type)
+        response["Content-Disposition"] = f'attachment; filename="{self.filename}.{fmt}"'
+        patch_vary_headers(response, ("Accept", "Accept-Encoding"))  # Compressed or not, the body depends on both
+        if compress:
+            response["Content-Encoding"] = "gzip"
+        return response
 
-        # Get completed habits for the user in the selected month and year
-        habits = Habit.objects.filter(
-            user=user,
-            completed=True,
-            completed_at__range=[start_date, end_date]
-        )
+class HabitExportView(ExportView):
+    model = Habit
+    filename = "habits"
 
-        # Initialize a calendar-like structure
-        calendar_data = {str(day): [] for day in range(1, last_day + 1)}
+class TimeLogExportView(ExportView):
+    model = HabitTimeLog
+    filename = "time_logs"
 
-        for habit in habits:
-            day = str(habit.completed_at.day)  # Convert to string for JSON keys
-            calendar_data[day].append(habit.name)
 
-        return Response({
-            "month": start_date.strftime("%B"),  # Convert month number to name
-            "year": year,
-            "calendar": calendar_data
-        })
+class HabitProgressCalendarView(APIView):
+    permission_classes = [IsAuthenticated]
+
+    @cache_per_user()
+    @use_read_database
+    def get(self, request):
+        """
+        Habit completions laid out by day for a month (?month=&year=), or for a
+        range of months (?from=2025-01&to=2025-12) such as a year-in-review heatmap.
+        """
+        try:
+            first, last, ranged = calendar_range(request.query_params, user_today(request.user.pk))
+        except ValueError as exc:
+            return Response({"error": str(exc)}, status=400)
+
+        # One row per habit-month from the bitmap index (habits.calendars)
+        rows = calendar_rows(request.user, first, last)
+        return Response(calendar_payload(rows, first, last, ranged))
@@ -0,0 +1,336 @@
+"""
+Push delivery of habit events to user-registered webhooks, through a
+transactional outbox.
+
+Habit.save() and HabitTimeLog.save() (and the batch endpoint) call
+enqueue_events() inside the transaction of their write, adding one OutboxEvent
+row per subscribed WebhookEndpoint, so an event is queued exactly when the
+change commits. dispatch() drains the outbox: it leases due rows in batches
+(SKIP LOCKED on PostgreSQL, so several dispatchers can share the work), POSTs
+them concurrently with a small asyncio HTTP/1.1 client that keeps connections
+open per endpoint, caps the requests in flight per endpoint at its
+max_concurrency, and reschedules failures with exponential backoff.
+`manage.py dispatch_webhooks` runs it.
+
+Delivery is at least once: a receiver should de-duplicate on the
+X-Habit-Delivery header.
+
+Endpoints must be http(s) URLs whose host resolves only to public addresses:
+checked when one is registered, and again on every connect, which goes to the
+address just checked so a DNS change can't point it at an internal service.
+settings.WEBHOOK_ALLOW_PRIVATE_HOSTS lifts the address check.
+"""
+import asyncio
+import datetime
+import hashlib
+import hmac
+import ipaddress
+import json
+import socket
+import ssl
+from collections import Counter
+from datetime import timedelta
+from urllib.parse import urlsplit
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+from django.utils.timezone import now
+
+from .models import MEDAL_STREAKS, MEDALS, OutboxEvent, WebhookEndpoint
+
+HABIT_COMPLETED = "habit.completed"
+STREAK_MILESTONE = "habit.streak_milestone"
+GOAL_SET = "habit.goal_set"
+TIME_LOGGED = "habit.time_logged"
+EVENT_TYPES = [HABIT_COMPLETED, STREAK_MILESTONE, GOAL_SET, TIME_LOGGED]
+
+ENQUEUE_CHUNK_SIZE = 500
+BATCH_SIZE = 200  # Events leased per round trip to the database
+LEASE_SECONDS = 120  # A crashed dispatcher's events become due again after this
+MAX_ATTEMPTS = 8
+BACKOFF_SECONDS = 30  # Before the first retry; doubles with each further attempt
+MAX_BACKOFF_SECONDS = 6 * 3600
+REQUEST_TIMEOUT = 10  # Seconds per attempt, connecting included
+USER_AGENT = "habit-tracker-webhooks/1"
+URL_SCHEMES = ("http", "https")
+
+
+# Events
+
+def completion_event(habit, date):
+    return HABIT_COMPLETED, {"habit": habit.pk, "name": habit.name, "date": date.isoformat(), "streak": habit.streak}
+
+
+def habit_events(habit, new_completion):
+    """ The (event type, payload) pairs a save of `habit` produces, judged against its saved values. """
+    events = []
+    if new_completion:
+        events.append(completion_event(habit, new_completion))
+    previous = habit.saved_value("streak", 0) or 0
+    reached = [i for i, days in enumerate(MEDAL_STREAKS) if previous < days <= habit.streak]
+    if reached:
+        days, medal = MEDALS[reached[-1]]
+        events.append((STREAK_MILESTONE, {"habit": habit.pk, "name": habit.name, "streak": habit.streak, "milestone": days, "medal": medal}))
+    if habit.goal and habit.goal != habit.saved_value("goal"):
+        events.append((GOAL_SET, {"habit": habit.pk, "name": habit.name, "goal": habit.goal}))
+    return events
+
+
+def time_log_event(log):
+    day = log.date.date() if isinstance(log.date, datetime.datetime) else log.date  # The field defaults to now()
+    return TIME_LOGGED, {"habit": log.habit_id, "date": day.isoformat(), "time_spent": log.time_spent}
+
+
+def enqueue_events(user_id, events):
+    """
+    Queue (event type, payload) pairs for each of the user's active endpoints
+    subscribed to them. Call inside the transaction of the write they describe.
+    """
+    if user_id is None or not events:
+        return
+    rows = [
+        OutboxEvent(endpoint_id=endpoint_id, event=event, payload=payload)
+        for endpoint_id, subscribed in WebhookEndpoint.objects.filter(user_id=user_id, is_active=True).values_list("id", "events")
+        for event, payload in events
+        if not subscribed or event in subscribed
+    ]
+    OutboxEvent.objects.bulk_create(rows, batch_size=ENQUEUE_CHUNK_SIZE)
+
+
+# Endpoint addresses
+
+def split_url(url):
+    """ urlsplit() `url`, raising ValueError unless it is http(s) with a host. """
+    parts = urlsplit(url)
+    if parts.scheme not in URL_SCHEMES or not parts.hostname:
+        raise ValueError("Webhook URLs must be http:// or https:// with a host.")
+    return parts
+
+
+def public_addresses(host, infos):
+    """
+    The addresses in getaddrinfo() results `infos` for `host`. Raises
+    ValueError if any is loopback, private, link-local or otherwise not
+    globally routable.
+    """
+    addresses = list(dict.fromkeys(info[4][0] for info in infos))
+    if not settings.WEBHOOK_ALLOW_PRIVATE_HOSTS:
+        for address in addresses:
+            ip = ipaddress.ip_address(address.split("%")[0])  # Without an IPv6 zone
+            ip = getattr(ip, "ipv4_mapped", None) or ip
+            if not ip.is_global or ip.is_multicast:
+                raise ValueError(f"{host} resolves to {address}, which is not a public address.")
+    return addresses
+
+
+def check_endpoint_url(url):
+    """ Resolve the host of `url` now; ValueError unless it is an http(s) URL reaching public addresses only. """
+    parts = split_url(url)
+    try:
+        infos = socket.getaddrinfo(parts.hostname, parts.port or 80, type=socket.SOCK_STREAM)
+    except socket.gaierror as exc:
+        raise ValueError(f"Cannot resolve {parts.hostname}: {exc.strerror}.") from None
+    return public_addresses(parts.hostname, infos)
+
+
+# Delivery
+
+def claim_batch(limit=BATCH_SIZE):
+    """ Lease up to `limit` due events (with their endpoints) for LEASE_SECONDS. """
+    moment = now()
+    with transaction.atomic():
+        events = list(
+            OutboxEvent.objects.select_for_update(skip_locked=True, of=("self",)).select_related("endpoint")
+            .filter(status=OutboxEvent.PENDING, next_attempt_at__lte=moment)
+            .order_by("next_attempt_at", "id")[:limit]
+        )
+        OutboxEvent.objects.filter(id__in=[event.pk for event in events]).update(
+            next_attempt_at=moment + timedelta(seconds=LEASE_SECONDS),
+        )
+    return events
+
+
+def backoff(attempts):
+    """ Seconds before the next try after `attempts` failed ones. """
+    return min(BACKOFF_SECONDS * 2 ** (attempts - 1), MAX_BACKOFF_SECONDS)
+
+
+def record_outcomes(events, errors):
+    """
+    Store the result of one attempt per event (`errors` aligned with `events`,
+    None for a delivery). Returns a Counter of delivered/retried/failed.
+    """
+    moment = now()
+    outcomes = Counter()
+    delivered = [event.pk for event, error in zip(events, errors) if error is None]
+    with transaction.atomic():
+        if delivered:
+            OutboxEvent.objects.filter(id__in=delivered).update(
+                status=OutboxEvent.DELIVERED, attempts=F("attempts") + 1, delivered_at=moment, last_error="",
+            )
+            outcomes["delivered"] = len(delivered)
+        for event, error in zip(events, errors):
+            if error is None:
+                continue
+            attempts = event.attempts + 1
+            if attempts >= MAX_ATTEMPTS:
+                changes = {"status": OutboxEvent.FAILED}
+                outcomes["failed"] += 1
+            else:
+                changes = {"next_attempt_at": moment + timedelta(seconds=backoff(attempts))}
+                outcomes["retried"] += 1
+            OutboxEvent.objects.filter(pk=event.pk).update(attempts=attempts, last_error=error[:1000], **changes)
+    return outcomes
+
+
+def event_body(event):
+    return json.dumps({
+        "id": event.pk,
+        "event": event.event,
+        "created_at": event.created_at.isoformat(),
+        "data": event.payload,
+    }).encode()
+
+
+def signature(secret, body):
+    return "sha256=" + hmac.new(secret.encode(), body, hashlib.sha256).hexdigest()
+
+
+async def read_response(reader):
+    """ (status, keep_alive) of one HTTP/1.1 response, its body read and discarded. """
+    status_line = await reader.readline()
+    if not status_line:
+        raise ConnectionError("Connection closed before a response")
+    version, status = status_line.split()[:2]
+    status = int(status)
+    headers = {}
+    while (line := await reader.readline()) not in (b"\r\n", b"\n", b""):
+        name, _, value = line.decode("latin-1").partition(":")
+        headers[name.strip().lower()] = value.strip().lower()
+
+    keep_alive = version == b"HTTP/1.1" and headers.get("connection") != "close"
+    if status in (204, 304):
+        pass  # No body
+    elif headers.get("transfer-encoding") == "chunked":
+        while size := int((await reader.readline()).split(b";")[0], 16):
+            await reader.readexactly(size + 2)  # Chunk and its CRLF
+        while (await reader.readline()) not in (b"\r\n", b"\n", b""):
+            pass  # Trailers
+    elif "content-length" in headers:
+        await reader.readexactly(int(headers["content-length"]))
+    else:
+        await reader.read()  # Delimited by the server closing the connection
+        keep_alive = False
+    return status, keep_alive
+
+
+class ConnectionPool:
+    """
+    Keep-alive HTTP/1.1 connections to one endpoint, with at most `size`
+    requests in flight at once.
+    """
+
+    def __init__(self, url, size, timeout=REQUEST_TIMEOUT):
+        parts = urlsplit(url)
+        self.url = url
+        self.host = parts.hostname
+        self.netloc = parts.netloc
+        self.ssl = ssl.create_default_context() if parts.scheme == "https" else None
+        self.port = parts.port or (443 if self.ssl else 80)
+        self.path = (parts.path or "/") + (f"?{parts.query}" if parts.query else "")
+        self.timeout = timeout
+        self.semaphore = asyncio.Semaphore(size)
+        self.idle = []  # (reader, writer) pairs
+        self.opened = 0
+
+    async def post(self, headers, body):
+        """ POST `body` to the endpoint and return the response status. """
+        async with self.semaphore:
+            while self.idle:
+                reader, writer = self.idle.pop()
+                try:
+                    return await self.send(reader, writer, headers, body)
+                except (OSError, asyncio.IncompleteReadError, ValueError):
+                    writer.close()  # The server dropped the idle connection; try another
+            reader, writer = await asyncio.wait_for(self.connect(), self.timeout)
+            self.opened += 1
+            try:
+                return await self.send(reader, writer, headers, body)
+            except BaseException:
+                writer.close()
+                raise
+
+    async def connect(self):
+        """ Open a connection to the endpoint at an address checked just now (see public_addresses()). """
+        split_url(self.url)  # Endpoints saved before validation, or through the admin
+        infos = await asyncio.get_running_loop().getaddrinfo(self.host, self.port, type=socket.SOCK_STREAM)
+        address = public_addresses(self.host, infos)[0]
+        return await asyncio.open_connection(address, self.port, ssl=self.ssl, server_hostname=self.host if self.ssl else None)
+
+    async def send(self, reader, writer, headers, body):
+        lines = [f"POST {self.path} HTTP/1.1", f"Host: {self.netloc}", f"Content-Length: {len(body)}"]
+        lines += [f"{name}: {value}" for name, value in headers.items()]
+        writer.write(("\r\n".join(lines) + "\r\n\r\n").encode() + body)
+        await writer.drain()
+        status, keep_alive = await asyncio.wait_for(read_response(reader), self.timeout)
+        if keep_alive:
+            self.idle.append((reader, writer))
+        else:
+            writer.close()
+        return status
+
+    def close(self):
+        for _, writer in self.idle:
+            writer.close()
+        self.idle = []
+
+
+async def deliver(event, pool):
+    """ One delivery attempt; returns None on a 2xx response, else the error. """
+    body = event_body(event)
+    headers = {
+        "Content-Type": "application/json",
+        "User-Agent": USER_AGENT,
+        "X-Habit-Event": event.event,
+        "X-Habit-Delivery": str(event.pk),
+        "X-Habit-Signature": signature(event.endpoint.secret, body),
+    }
+    try:
+        status = await pool.post(headers, body)
+    except (OSError, asyncio.TimeoutError, asyncio.IncompleteReadError, ValueError) as exc:
+        return f"{type(exc).__name__}: {exc}"
+    return None if 200 <= status < 300 else f"HTTP {status}"
+
+
+def pool_for(pools, endpoint, timeout):
+    key = (endpoint.pk, endpoint.url, endpoint.max_concurrency)  # An edited endpoint gets a fresh pool
+    if key not in pools:
+        pools[key] = ConnectionPool(endpoint.url, endpoint.max_concurrency, timeout)
+    return pools[key]
+
+
+async def dispatch(once=False, batch_size=BATCH_SIZE, interval=1.0, timeout=REQUEST_TIMEOUT):
+    """
+    Deliver due events batch by batch, reusing each endpoint's connections
+    across batches. With `once`, return the delivered/retried/failed Counter
+    as soon as nothing is due; otherwise poll every `interval` seconds.
+    Run from sync code through async_to_sync, so the ORM calls stay on the
+    calling thread.
+    """
+    pools = {}
+    totals = Counter()
+    try:
+        while True:
+            events = await sync_to_async(claim_batch)(batch_size)
+            if events:
+                errors = await asyncio.gather(*(deliver(event, pool_for(pools, event.endpoint, timeout)) for event in events))
+                totals += await sync_to_async(record_outcomes)(events, errors)
+            elif once:
+                return totals
+            else:
+                await asyncio.sleep(interval)
+    finally:
+        for pool in pools.values():
+            pool.close()